@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 import os
+from importlib.util import find_spec
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -37,6 +40,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'core',
     'rest_framework',
     'rest_framework.authtoken',
@@ -46,6 +50,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.NPlusOneMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -79,18 +86,76 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# DB_POOL_SIZE > 0 shares a bounded pool of connections between the
+# threads of each process (core.backends.postgresql_pool); connections go
+# back to the pool after every request. Otherwise each thread keeps its own
+# connection for DB_CONN_MAX_AGE seconds. DB_CONN_HEALTH_CHECKS pings a
+# reused connection before handing it to a request.
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 0))
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': os.environ.get(
+            'DB_ENGINE',
+            'core.backends.postgresql_pool' if DB_POOL_SIZE
+            else 'django.db.backends.postgresql',
+        ),
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
-        'PORT': '5432'
+        'PORT': '5432',
+        'CONN_MAX_AGE': 0 if DB_POOL_SIZE else int(
+            os.environ.get('DB_CONN_MAX_AGE', 60)
+        ),
+        'CONN_HEALTH_CHECKS': os.environ.get('DB_CONN_HEALTH_CHECKS', '1') == '1',
+        'POOL_SIZE': DB_POOL_SIZE,
+        # Seconds a request waits for a free pooled connection
+        'POOL_TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        # Connections opened ahead of traffic by wait_for_db
+        'POOL_WARM': int(os.environ.get('DB_POOL_WARM', DB_POOL_SIZE)),
+    }
+}
+
+# A read replica, used for the reads of GET/HEAD/OPTIONS requests. It shares
+# the primary's credentials and database name unless overridden.
+if os.environ.get('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.environ['DB_REPLICA_HOST'],
+        'NAME': os.environ.get('DB_REPLICA_NAME', DATABASES['default']['NAME']),
+        'USER': os.environ.get('DB_REPLICA_USER', DATABASES['default']['USER']),
+        'PASSWORD': os.environ.get(
+            'DB_REPLICA_PASS', DATABASES['default']['PASSWORD'],
+        ),
+        # Tests run against the primary's test database.
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+# Seconds a client reads from the primary after a write, covering the lag.
+# API clients are pinned through the cache, so running with replicas needs a
+# shared CACHE_BACKEND (e.g. redis) for them to read their own writes.
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 10))
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
 
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
     }
 }
 
+# Seconds a cached recipe/tag/ingredient list response is kept
+RECIPE_CACHE_TIMEOUT = int(os.environ.get('RECIPE_CACHE_TIMEOUT', 300))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -111,6 +176,45 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing. PASSWORD_HASHER picks the algorithm of new hashes:
+# 'scrypt' (standard library), 'argon2' (needs argon2-cffi) or 'pbkdf2'.
+# The others stay listed so existing hashes still verify; they, and hashes
+# made with other work factors, are rehashed on the user's next login.
+_PASSWORD_HASHERS = {
+    'scrypt': 'user.hashers.ScryptPasswordHasher',
+    'argon2': 'user.hashers.TunedArgon2PasswordHasher',
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+}
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'scrypt')
+if PASSWORD_HASHER == 'argon2' and not find_spec('argon2'):
+    raise ImproperlyConfigured(
+        "PASSWORD_HASHER='argon2' needs argon2-cffi, which is not installed"
+    )
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PASSWORD_HASHER]] + [
+    path for name, path in _PASSWORD_HASHERS.items() if name != PASSWORD_HASHER
+] + ['django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher']
+PASSWORD_SCRYPT_WORK_FACTOR = int(os.environ.get('PASSWORD_SCRYPT_WORK_FACTOR', 2 ** 14))
+PASSWORD_SCRYPT_BLOCK_SIZE = int(os.environ.get('PASSWORD_SCRYPT_BLOCK_SIZE', 8))
+PASSWORD_SCRYPT_PARALLELISM = int(os.environ.get('PASSWORD_SCRYPT_PARALLELISM', 1))
+PASSWORD_ARGON2_TIME_COST = int(os.environ.get('PASSWORD_ARGON2_TIME_COST', 2))
+PASSWORD_ARGON2_MEMORY_COST = int(os.environ.get('PASSWORD_ARGON2_MEMORY_COST', 65536))
+PASSWORD_ARGON2_PARALLELISM = int(os.environ.get('PASSWORD_ARGON2_PARALLELISM', 2))
+
+AUTHENTICATION_BACKENDS = ['user.backends.PasswordPoolBackend']
+
+# Worker processes checking passwords at login; 0 checks them in the
+# request thread. At most PASSWORD_HASH_QUEUE checks wait per process, for
+# up to PASSWORD_HASH_TIMEOUT seconds, before logins are turned away.
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 32))
+PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 2))
+
+# Login attempts allowed per client address and per email ('<n>/<period>');
+# an empty value disables the limit.
+LOGIN_RATE_PER_IP = os.environ.get('LOGIN_RATE_PER_IP', '60/min') or None
+LOGIN_RATE_PER_EMAIL = os.environ.get('LOGIN_RATE_PER_EMAIL', '10/min') or None
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/3.2/topics/i18n/
 
@@ -131,9 +235,23 @@ USE_TZ = True
 STATIC_URL = '/static/static/'
 MEDIA_URL = '/static/media/'
 
+# Only MEDIA_ROOT/uploads/recipe/variants/ may be served publicly: the rest
+# holds the uploads as received, EXIF metadata included.
 MEDIA_ROOT = '/vol/web/media'
 STATIC_ROOT = '/vol/web/static'
 
+# Derive thumbnails and other sizes of uploaded recipe images on a worker
+# pool after the upload commits, instead of inside the request. Jobs still
+# queued when a process stops are lost; `manage.py process_pending_images`
+# picks them up again.
+IMAGE_PROCESSING_ASYNC = os.environ.get('IMAGE_PROCESSING_ASYNC', '1') == '1'
+IMAGE_PROCESSING_WORKERS = int(os.environ.get('IMAGE_PROCESSING_WORKERS', 2))
+
+# Largest recipe image accepted by the streaming upload handler, in bytes
+RECIPE_IMAGE_MAX_UPLOAD_SIZE = int(
+    os.environ.get('RECIPE_IMAGE_MAX_UPLOAD_SIZE', 10 * 1024 * 1024)
+)
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
@@ -145,9 +263,69 @@ AUTH_USER_MODEL = "core.User"
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication'
+        'user.authentication.CachedTokenAuthentication'
     ]
 }
+
+# Largest list accepted by the recipe bulk create/update endpoint
+RECIPE_BULK_MAX_ITEMS = int(os.environ.get('RECIPE_BULK_MAX_ITEMS', 1000))
+
+# Recipes read per server-side cursor fetch by the library export
+RECIPE_EXPORT_CHUNK_SIZE = int(os.environ.get('RECIPE_EXPORT_CHUNK_SIZE', 1000))
+
+# Token -> user cache used by CachedTokenAuthentication. Local entries are
+# per process, so other processes may honour a revoked token for up to
+# TOKEN_CACHE_LOCAL_TTL seconds. That bound needs a shared CACHE_BACKEND:
+# with the default local-memory cache the "shared" entries are per process
+# too, so they default to the local TTL.
+TOKEN_CACHE_LOCAL_TTL = int(os.environ.get('TOKEN_CACHE_LOCAL_TTL', 5))
+TOKEN_CACHE_TIMEOUT = int(os.environ.get(
+    'TOKEN_CACHE_TIMEOUT',
+    TOKEN_CACHE_LOCAL_TTL if 'locmem' in CACHES['default']['BACKEND'] else 300,
+))
+TOKEN_CACHE_LOCAL_SIZE = int(os.environ.get('TOKEN_CACHE_LOCAL_SIZE', 10000))
+# Pagination used for recipe lists when the client does not pick one:
+# None (unpaginated), 'cursor' or 'offset'.
+RECIPE_DEFAULT_PAGINATION = os.environ.get('RECIPE_DEFAULT_PAGINATION') or None
+
+# Text search configuration used for recipe search vectors and queries
+RECIPE_SEARCH_CONFIG = os.environ.get('RECIPE_SEARCH_CONFIG', 'english')
+
+# Tag/ingredient autocomplete. Each process keeps a sorted name index for
+# up to AUTOCOMPLETE_INDEX_SIZE (user, model) pairs; users with more than
+# AUTOCOMPLETE_INDEX_MAX_NAMES names are served from the database.
+AUTOCOMPLETE_INDEX_SIZE = int(os.environ.get('AUTOCOMPLETE_INDEX_SIZE', 1000))
+AUTOCOMPLETE_INDEX_TTL = int(os.environ.get('AUTOCOMPLETE_INDEX_TTL', 300))
+AUTOCOMPLETE_INDEX_MAX_NAMES = int(
+    os.environ.get('AUTOCOMPLETE_INDEX_MAX_NAMES', 50000)
+)
+AUTOCOMPLETE_DEFAULT_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+
+# Per-process cache of normalized tag/ingredient name -> shared name id
+CANONICAL_NAME_CACHE_SIZE = int(
+    os.environ.get('CANONICAL_NAME_CACHE_SIZE', 100000)
+)
+CANONICAL_NAME_CACHE_TTL = int(os.environ.get('CANONICAL_NAME_CACHE_TTL', 86400))
+
+# Bearer token required by /metrics; empty keeps the endpoint closed
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Repeated query detection: 'log' samples NPLUSONE_SAMPLE_RATE of requests
+# and logs queries run more than NPLUSONE_THRESHOLD times, 'raise' (used by
+# the test runner) fails on them, 'off' disables the check.
+NPLUSONE_MODE = os.environ.get('NPLUSONE_MODE', 'log')
+NPLUSONE_THRESHOLD = int(os.environ.get('NPLUSONE_THRESHOLD', 5))
+NPLUSONE_SAMPLE_RATE = float(os.environ.get('NPLUSONE_SAMPLE_RATE', 0.01))
+
+TEST_RUNNER = 'core.test_runner.NPlusOneDiscoverRunner'
+
+# Coroutine views for the hot read endpoints, switched on by app/asgi.py.
+# Their queries run on a pool of ASYNC_DB_THREADS threads, each holding at
+# most one connection per database; it defaults to the connection pool size.
+ASYNC_READ_VIEWS = os.environ.get('ASYNC_READ_VIEWS', '0') == '1'
+ASYNC_DB_THREADS = int(os.environ.get('ASYNC_DB_THREADS', DB_POOL_SIZE or 10))
+
 SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True,
 }
\ No newline at end of file
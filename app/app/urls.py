@@ -13,6 +13,8 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import os
+
 from drf_spectacular.views import (
     SpectacularAPIView,
     SpectacularSwaggerView,
@@ -21,6 +23,8 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from core.views import metrics_view
+from recipe.images import VARIANTS_DIR
 
 
 
@@ -31,8 +35,13 @@ urlpatterns = [
          SpectacularSwaggerView.as_view(url_name='api-schema'),name='api-docs'),
     path('api/user/', include('user.urls')),
     path('api/recipe/', include('recipe.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    # Only derived images are public; uploads keep their EXIF metadata.
+    urlpatterns += static(
+        settings.MEDIA_URL + VARIANTS_DIR,
+        document_root=os.path.join(settings.MEDIA_ROOT, VARIANTS_DIR),
+    )
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
\ No newline at end of file
@@ -0,0 +1,5 @@
+"""performance benchmarks for the recipe API
+
+Run them with `python manage.py benchmark`; see
+core/management/commands/benchmark.py for the options.
+"""
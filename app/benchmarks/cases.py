@@ -0,0 +1,144 @@
+"""benchmark cases driving the API through the test client"""
+import io
+import random
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tags
+from recipe.cache import bump_generation
+from benchmarks.datagen import PASSWORD
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TOKEN_URL = reverse('user:token')
+ME_URL = reverse('user:me')
+NESTED_INGREDIENTS = 50
+
+
+class Context:
+    """State shared by the cases of one run"""
+
+    def __init__(self, dataset):
+        self.rng = random.Random(dataset.spec.seed)
+        self.user = dataset.users[0]
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {dataset.tokens[self.user.id]}'
+        )
+        self.recipe_ids = list(
+            Recipe.objects.filter(user=self.user).order_by('id')
+            .values_list('id', flat=True)
+        )
+        self.tag_ids = list(
+            Tags.objects.filter(user=self.user).order_by('id')
+            .values_list('id', flat=True)
+        )
+        self.ingredient_names = list(
+            Ingredient.objects.filter(user=self.user).order_by('id')
+            .values_list('name', flat=True)
+        )
+
+    def recipe_url(self, suffix=''):
+        recipe_id = self.rng.choice(self.recipe_ids)
+        return f'{RECIPES_URL}{recipe_id}/{suffix}'
+
+
+@dataclass
+class Case:
+    """A request to time; prepare runs untimed before each iteration"""
+    name: str
+    run: Callable
+    prepare: Optional[Callable] = None
+    expected_status: int = 200
+
+
+def _cold_cache(ctx, iteration):
+    bump_generation(ctx.user.id)
+
+
+def _list(ctx, iteration):
+    return ctx.client.get(RECIPES_URL, {'pagination': 'cursor'})
+
+
+def _filtered_list(ctx, iteration):
+    tags = ctx.rng.sample(ctx.tag_ids, min(2, len(ctx.tag_ids)))
+    return ctx.client.get(RECIPES_URL, {
+        'pagination': 'cursor',
+        'tags': ','.join(map(str, tags)),
+    })
+
+
+def _search(ctx, iteration):
+    return ctx.client.get(RECIPES_URL, {'search': 'tomato basil'})
+
+
+def _retrieve(ctx, iteration):
+    return ctx.client.get(ctx.recipe_url())
+
+
+def _create_nested(ctx, iteration):
+    """Half of the ingredients exist already, half are new"""
+    known = ctx.rng.sample(
+        ctx.ingredient_names,
+        min(NESTED_INGREDIENTS // 2, len(ctx.ingredient_names)),
+    )
+    new = [
+        f'new ingredient {iteration}-{i}'
+        for i in range(NESTED_INGREDIENTS - len(known))
+    ]
+    return ctx.client.post(RECIPES_URL, {
+        'title': f'Benchmark recipe {iteration}',
+        'time_minutes': 30,
+        'price': '12.50',
+        'tags': [{'name': 'benchmark'}],
+        'ingredients': [{'name': name} for name in known + new],
+    }, format='json')
+
+
+def _update(ctx, iteration):
+    return ctx.client.patch(
+        ctx.recipe_url(), {'title': f'Updated {iteration}'}, format='json',
+    )
+
+
+def _upload_image(ctx, iteration):
+    """Upload a distinct 800x600 JPEG so no stored blob is reused"""
+    image = Image.new('RGB', (800, 600), (
+        iteration % 256, (iteration // 256) % 256, ctx.rng.randrange(256),
+    ))
+    data = io.BytesIO()
+    image.save(data, format='JPEG')
+    data.seek(0)
+    data.name = f'bench-{iteration}.jpg'
+    return ctx.client.post(
+        ctx.recipe_url('upload-image/'), {'image': data}, format='multipart',
+    )
+
+
+def _token_login(ctx, iteration):
+    return APIClient().post(
+        TOKEN_URL, {'email': ctx.user.email, 'password': PASSWORD},
+    )
+
+
+def _token_auth(ctx, iteration):
+    return ctx.client.get(ME_URL)
+
+
+CASES = {
+    case.name: case for case in (
+        Case('list', _list, prepare=_cold_cache),
+        Case('list_cached', _list),
+        Case('filtered_list', _filtered_list, prepare=_cold_cache),
+        Case('search', _search, prepare=_cold_cache),
+        Case('retrieve', _retrieve),
+        Case('create_nested', _create_nested, expected_status=201),
+        Case('update', _update),
+        Case('upload_image', _upload_image),
+        Case('token_login', _token_login),
+        Case('token_auth', _token_auth),
+    )
+}
@@ -0,0 +1,124 @@
+"""deterministic generation of large recipe datasets"""
+import random
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from rest_framework.authtoken.models import Token
+
+from core.models import CanonicalName, Ingredient, Recipe, Tags, normalize_name
+from recipe.search import update_search_vectors
+
+PASSWORD = 'benchpass123'
+WORDS = (
+    'tomato', 'basil', 'garlic', 'onion', 'lemon', 'chicken', 'rice',
+    'pepper', 'ginger', 'honey', 'butter', 'thyme', 'potato', 'carrot',
+    'salmon', 'tofu', 'noodle', 'curry', 'mint', 'cheese',
+)
+
+
+@dataclass
+class DatasetSpec:
+    """Size of a generated dataset; the seed makes it reproducible"""
+    users: int = 10
+    recipes: int = 200
+    tags: int = 20
+    ingredients: int = 100
+    tags_per_recipe: int = 3
+    ingredients_per_recipe: int = 8
+    seed: int = 42
+
+
+@dataclass
+class Dataset:
+    spec: DatasetSpec
+    users: list = field(default_factory=list)
+    tokens: dict = field(default_factory=dict)
+
+
+def _name(rng, index):
+    return f'{rng.choice(WORDS)} {rng.choice(WORDS)} {index}'
+
+
+def _attrs(model, user, names, canonical):
+    model.objects.bulk_create([
+        model(
+            user=user, name=name,
+            canonical_id=canonical[normalize_name(name)],
+        )
+        for name in names
+    ])
+    return list(
+        model.objects.filter(user=user).order_by('id')
+        .values_list('id', flat=True)
+    )
+
+
+def _intern(names):
+    CanonicalName.objects.bulk_create(
+        [CanonicalName(name=normalize_name(name)) for name in names],
+        ignore_conflicts=True,
+    )
+    return dict(
+        CanonicalName.objects.filter(
+            name__in={normalize_name(name) for name in names},
+        ).values_list('name', 'id')
+    )
+
+
+def generate(spec):
+    """Create spec.users users, each with its own recipes, tags and
+    ingredients, using bulk inserts. The same spec always produces the
+    same data.
+    """
+    rng = random.Random(spec.seed)
+    dataset = Dataset(spec)
+    password = make_password(PASSWORD)
+    tag_names = [f'tag {i}' for i in range(spec.tags)]
+    ingredient_names = [_name(rng, i) for i in range(spec.ingredients)]
+    canonical = _intern(tag_names + ingredient_names)
+    tag_through = Recipe.tags.through
+    ingredient_through = Recipe.ingredients.through
+
+    for u in range(spec.users):
+        user = get_user_model().objects.create(
+            email=f'bench{u}@example.com', name=f'Bench {u}',
+            password=password,
+        )
+        dataset.users.append(user)
+        dataset.tokens[user.id] = Token.objects.create(user=user).key
+        tag_ids = _attrs(Tags, user, tag_names, canonical)
+        ingredient_ids = _attrs(Ingredient, user, ingredient_names, canonical)
+
+        recipes = Recipe.objects.bulk_create([
+            Recipe(
+                user=user,
+                title=_name(rng, r),
+                description=' '.join(rng.choices(WORDS, k=12)),
+                time_minutes=rng.randint(5, 120),
+                price=Decimal(rng.randint(100, 5000)) / 100,
+            )
+            for r in range(spec.recipes)
+        ])
+        if recipes and recipes[0].id is None:
+            recipes = list(Recipe.objects.filter(user=user).order_by('id'))
+        tag_through.objects.bulk_create([
+            tag_through(recipe_id=recipe.id, tags_id=tag_id)
+            for recipe in recipes
+            for tag_id in rng.sample(
+                tag_ids, min(spec.tags_per_recipe, len(tag_ids)),
+            )
+        ])
+        ingredient_through.objects.bulk_create([
+            ingredient_through(
+                recipe_id=recipe.id, ingredient_id=ingredient_id,
+            )
+            for recipe in recipes
+            for ingredient_id in rng.sample(
+                ingredient_ids,
+                min(spec.ingredients_per_recipe, len(ingredient_ids)),
+            )
+        ])
+        update_search_vectors(Recipe.objects.filter(user=user).values('pk'))
+    return dataset
@@ -0,0 +1,295 @@
+"""concurrent HTTP load generation against the recipe API"""
+import http.client
+import io
+import json
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from time import perf_counter
+from urllib.parse import urlencode, urlsplit
+
+from PIL import Image
+
+from benchmarks.runner import percentile
+
+ACTIONS = ('browse', 'create', 'login', 'upload')
+DEFAULT_PROFILE = {'browse': 70, 'create': 15, 'login': 10, 'upload': 5}
+PASSWORD = 'loadpass123'
+TAG_NAMES = ('Dinner', 'Vegan', 'Quick', 'Dessert', 'Spicy')
+INGREDIENT_NAMES = ('Salt', 'Pepper', 'Garlic', 'Onion', 'Butter', 'Rice')
+
+
+class LoadTestError(Exception):
+    """A simulated client could not be set up"""
+
+
+def parse_profile(text):
+    """Parse `browse=70,create=15` into a weight per action"""
+    profile = {}
+    for part in text.split(','):
+        action, _sep, weight = part.partition('=')
+        action = action.strip()
+        if action not in ACTIONS:
+            raise ValueError(f'Unknown action {action!r}')
+        profile[action] = int(weight)
+    if not any(profile.values()):
+        raise ValueError('At least one action needs a positive weight')
+    return profile
+
+
+def _jpeg(rng, size=200):
+    image = Image.new('RGB', (size, size), tuple(
+        rng.randrange(256) for _ in range(3)
+    ))
+    data = io.BytesIO()
+    image.save(data, format='JPEG')
+    return data.getvalue()
+
+
+class Stats:
+    """Thread-safe log of (finished at, action, seconds, ok)"""
+
+    def __init__(self):
+        self.samples = []
+        self._lock = threading.Lock()
+
+    def add(self, action, seconds, ok):
+        with self._lock:
+            self.samples.append((time.monotonic(), action, seconds, ok))
+
+    def between(self, start, end):
+        with self._lock:
+            return [s for s in self.samples if start <= s[0] < end]
+
+
+def summarize(samples, seconds):
+    """Throughput, error rate and latency percentiles of samples"""
+    if not samples:
+        return {'requests': 0, 'rps': 0.0, 'error_rate': 0.0}
+    latencies = [s[2] * 1000 for s in samples]
+    errors = sum(1 for s in samples if not s[3])
+    return {
+        'requests': len(samples),
+        'rps': round(len(samples) / seconds, 1),
+        'error_rate': round(errors / len(samples), 4),
+        'p50_ms': round(percentile(latencies, 50), 1),
+        'p95_ms': round(percentile(latencies, 95), 1),
+        'p99_ms': round(percentile(latencies, 99), 1),
+    }
+
+
+class SimulatedClient:
+    """One API user issuing requests over a keep-alive connection"""
+
+    def __init__(self, base_url, email, rng):
+        parsed = urlsplit(base_url)
+        self.host = parsed.hostname
+        self.port = parsed.port
+        self.prefix = parsed.path.rstrip('/')
+        self.email = email
+        self.rng = rng
+        self.conn = None
+        self.token = None
+        self.recipe_ids = []
+        self.tag_ids = []
+
+    def request(self, method, path, body=None, content_type=None):
+        """Send a request, returning (status, parsed JSON or None)"""
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(
+                self.host, self.port, timeout=30,
+            )
+        headers = {}
+        if self.token:
+            headers['Authorization'] = f'Token {self.token}'
+        if isinstance(body, dict):
+            body = json.dumps(body)
+            content_type = 'application/json'
+        if content_type:
+            headers['Content-Type'] = content_type
+        try:
+            self.conn.request(method, self.prefix + path, body, headers)
+            response = self.conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            self.conn.close()
+            self.conn = None
+            raise
+        try:
+            return response.status, json.loads(data) if data else None
+        except ValueError:
+            return response.status, None
+
+    def setup(self):
+        """Sign up, log in and create a recipe to browse and upload to"""
+        status, _data = self.request('POST', '/api/user/create/', {
+            'email': self.email, 'password': PASSWORD, 'name': 'Load test',
+        })
+        if status != 201 or not self.login():
+            raise LoadTestError(f'Could not set up {self.email}')
+        if not self.create():
+            raise LoadTestError(f'Could not create a recipe as {self.email}')
+        status, data = self.request('GET', '/api/recipe/tags/')
+        results = data.get('results', []) if isinstance(data, dict) else data
+        self.tag_ids = [tag['id'] for tag in results or []]
+
+    def login(self):
+        """Obtain a token through CreateTokenView"""
+        token, self.token = self.token, None
+        status, data = self.request('POST', '/api/user/token/', {
+            'email': self.email, 'password': PASSWORD,
+        })
+        self.token = data.get('token') if status == 200 else token
+        return status == 200
+
+    def browse(self):
+        """List recipes filtered by one or two of the client's tags"""
+        params = {'pagination': 'cursor', 'page_size': 20}
+        if self.tag_ids:
+            params['tags'] = ','.join(map(str, self.rng.sample(
+                self.tag_ids, min(len(self.tag_ids), self.rng.randint(1, 2)),
+            )))
+        status, _data = self.request(
+            'GET', f'/api/recipe/recipes/?{urlencode(params)}',
+        )
+        return status == 200
+
+    def create(self):
+        """Create a recipe with a few tags and ingredients"""
+        status, data = self.request('POST', '/api/recipe/recipes/', {
+            'title': f'Load test recipe {uuid.uuid4().hex[:8]}',
+            'time_minutes': self.rng.randint(5, 90),
+            'price': f'{self.rng.randint(100, 3000) / 100:.2f}',
+            'tags': [
+                {'name': name} for name in self.rng.sample(TAG_NAMES, 2)
+            ],
+            'ingredients': [
+                {'name': name}
+                for name in self.rng.sample(INGREDIENT_NAMES, 3)
+            ],
+        })
+        if status == 201:
+            self.recipe_ids.append(data['id'])
+        return status == 201
+
+    def upload(self):
+        """Upload a JPEG to one of the client's recipes"""
+        boundary = uuid.uuid4().hex
+        body = b''.join((
+            f'--{boundary}\r\n'.encode(),
+            b'Content-Disposition: form-data; name="image"; '
+            b'filename="load.jpg"\r\n',
+            b'Content-Type: image/jpeg\r\n\r\n',
+            _jpeg(self.rng),
+            f'\r\n--{boundary}--\r\n'.encode(),
+        ))
+        recipe_id = self.rng.choice(self.recipe_ids)
+        status, _data = self.request(
+            'POST', f'/api/recipe/recipes/{recipe_id}/upload-image/', body,
+            content_type=f'multipart/form-data; boundary={boundary}',
+        )
+        return status == 200
+
+    def run(self, profile, stats, stop):
+        """Issue weighted random actions until stop is set"""
+        actions = list(profile)
+        weights = [profile[action] for action in actions]
+        while not stop.is_set():
+            action = self.rng.choices(actions, weights)[0]
+            start = perf_counter()
+            try:
+                ok = getattr(self, action)()
+            except (OSError, http.client.HTTPException):
+                ok = False
+            stats.add(action, perf_counter() - start, ok)
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+
+
+class LoadTest:
+    """Run stages of increasing concurrency against base_url.
+
+    Comparing throughput and latency between stages shows where the
+    service saturates: throughput stops growing while latency climbs.
+    """
+
+    def __init__(self, base_url, profile=None, seed=0, on_interval=None):
+        self.base_url = base_url
+        self.profile = profile or DEFAULT_PROFILE
+        self.seed = seed
+        self.on_interval = on_interval
+        self.clients = []
+        self.run_id = uuid.uuid4().hex[:8]
+
+    def _ensure_clients(self, count):
+        while len(self.clients) < count:
+            index = len(self.clients)
+            client = SimulatedClient(
+                self.base_url,
+                f'load-{self.run_id}-{index}@example.com',
+                random.Random(self.seed * 100003 + index),
+            )
+            client.setup()
+            self.clients.append(client)
+
+    def run_stage(self, clients, duration, interval):
+        """Drive `clients` concurrent clients for `duration` seconds"""
+        self._ensure_clients(clients)
+        stats = Stats()
+        stop = threading.Event()
+        threads = [
+            threading.Thread(
+                target=client.run, args=(self.profile, stats, stop),
+                daemon=True,
+            )
+            for client in self.clients[:clients]
+        ]
+        start = time.monotonic()
+        for thread in threads:
+            thread.start()
+
+        intervals = []
+        window_start = start
+        while window_start < start + duration:
+            window_end = min(window_start + interval, start + duration)
+            time.sleep(max(window_end - time.monotonic(), 0))
+            window = summarize(
+                stats.between(window_start, window_end),
+                window_end - window_start,
+            )
+            window['elapsed_s'] = round(window_end - start, 1)
+            intervals.append(window)
+            if self.on_interval:
+                self.on_interval(clients, window)
+            window_start = window_end
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        samples = stats.between(start, start + duration)
+        by_action = defaultdict(list)
+        for sample in samples:
+            by_action[sample[1]].append(sample)
+        return {
+            'clients': clients,
+            'summary': summarize(samples, duration),
+            'actions': {
+                action: summarize(action_samples, duration)
+                for action, action_samples in sorted(by_action.items())
+            },
+            'intervals': intervals,
+        }
+
+    def run(self, stages, duration, interval):
+        try:
+            return [
+                self.run_stage(clients, duration, interval)
+                for clients in stages
+            ]
+        finally:
+            for client in self.clients:
+                client.close()
@@ -0,0 +1,101 @@
+"""timing of benchmark cases and comparison of runs"""
+import math
+import platform
+import statistics
+import tracemalloc
+from contextlib import ExitStack
+from time import perf_counter
+
+import django
+from django.db import connection, connections
+
+from core.metrics import RequestMetrics
+
+
+class BenchmarkError(Exception):
+    """A benchmarked request did not return the expected status"""
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of values"""
+    ordered = sorted(values)
+    index = max(math.ceil(pct / 100 * len(ordered)) - 1, 0)
+    return ordered[index]
+
+
+def _measure(case, ctx, iteration):
+    """Run one iteration, returning (seconds, queries, db seconds)"""
+    if case.prepare:
+        case.prepare(ctx, iteration)
+    counter = RequestMetrics()
+    with ExitStack() as stack:
+        for conn in connections.all():
+            stack.enter_context(conn.execute_wrapper(counter))
+        start = perf_counter()
+        response = case.run(ctx, iteration)
+        elapsed = perf_counter() - start
+    if response.status_code != case.expected_status:
+        raise BenchmarkError(
+            f'{case.name}: expected {case.expected_status}, '
+            f'got {response.status_code}'
+        )
+    return elapsed, counter.queries, counter.db_time
+
+
+def _peak_memory(case, ctx, iteration):
+    """Peak Python allocations of one iteration, traced separately so that
+    tracing does not slow down the timed runs
+    """
+    if case.prepare:
+        case.prepare(ctx, iteration)
+    tracemalloc.start()
+    try:
+        case.run(ctx, iteration)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_case(case, ctx, iterations, warmup=0):
+    """Time case and return its summary"""
+    for i in range(warmup):
+        _measure(case, ctx, i)
+    samples = [
+        _measure(case, ctx, warmup + i) for i in range(iterations)
+    ]
+    timings = [s[0] * 1000 for s in samples]
+    return {
+        'iterations': iterations,
+        'mean_ms': round(statistics.mean(timings), 3),
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p90_ms': round(percentile(timings, 90), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'max_ms': round(max(timings), 3),
+        'queries': max(s[1] for s in samples),
+        'db_ms': round(statistics.mean(s[2] * 1000 for s in samples), 3),
+        'peak_kib': round(
+            _peak_memory(case, ctx, warmup + iterations) / 1024, 1,
+        ),
+    }
+
+
+def environment():
+    """Describe where the benchmarks ran"""
+    return {
+        'database': connection.vendor,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'machine': platform.machine(),
+    }
+
+
+def compare(baseline, current, metrics=('p50_ms', 'p99_ms', 'queries')):
+    """Yield (case, metric, before, after, change %) for shared cases"""
+    for name, result in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        for metric in metrics:
+            old, new = before[metric], result[metric]
+            change = (new - old) / old * 100 if old else 0.0
+            yield name, metric, old, new, round(change, 1)
@@ -0,0 +1,87 @@
+"""
+Tests for the benchmark suite
+"""
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from benchmarks import cases, datagen, runner
+from core.models import Recipe
+
+SMALL = datagen.DatasetSpec(
+    users=2, recipes=5, tags=4, ingredients=10,
+    tags_per_recipe=2, ingredients_per_recipe=3, seed=7,
+)
+
+
+class DatagenTests(TestCase):
+    """Test generating datasets"""
+
+    def test_generate_sizes(self):
+        """Test the dataset matches its spec"""
+        dataset = datagen.generate(SMALL)
+
+        self.assertEqual(len(dataset.users), 2)
+        recipe = Recipe.objects.filter(user=dataset.users[0]).first()
+        self.assertEqual(recipe.tags.count(), 2)
+        self.assertEqual(recipe.ingredients.count(), 3)
+        self.assertEqual(Recipe.objects.count(), 10)
+
+    def test_generate_deterministic(self):
+        """Test the same seed produces the same recipes"""
+        def snapshot():
+            dataset = datagen.generate(SMALL)
+            return [
+                (r.title, r.price, sorted(t.name for t in r.tags.all()))
+                for user in dataset.users
+                for r in Recipe.objects.filter(user=user).order_by('id')
+            ]
+
+        first = snapshot()
+        get_user_model().objects.all().delete()
+
+        self.assertEqual(snapshot(), first)
+
+
+class RunCaseTests(TestCase):
+    """Test timing every benchmark case"""
+
+    @override_settings(IMAGE_PROCESSING_ASYNC=False, LOGIN_RATE_PER_IP=None,
+                       LOGIN_RATE_PER_EMAIL=None)
+    def test_all_cases_run(self):
+        """Test each case succeeds and reports its statistics"""
+        ctx = cases.Context(datagen.generate(SMALL))
+        with tempfile.TemporaryDirectory() as media_root, \
+                override_settings(MEDIA_ROOT=media_root):
+            for case in cases.CASES.values():
+                result = runner.run_case(case, ctx, iterations=2)
+                self.assertEqual(result['iterations'], 2)
+                self.assertLessEqual(result['p50_ms'], result['max_ms'])
+                self.assertGreater(result['peak_kib'], 0)
+
+
+class CompareTests(SimpleTestCase):
+    """Test statistics helpers"""
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles"""
+        values = list(range(1, 101))
+        self.assertEqual(runner.percentile(values, 50), 50)
+        self.assertEqual(runner.percentile(values, 99), 99)
+        self.assertEqual(runner.percentile([3.0], 99), 3.0)
+
+    def test_compare(self):
+        """Test changes are reported for cases present in both runs"""
+        before = {'results': {
+            'list': {'p50_ms': 10, 'p99_ms': 20, 'queries': 4},
+        }}
+        after = {'results': {
+            'list': {'p50_ms': 5, 'p99_ms': 20, 'queries': 4},
+            'retrieve': {'p50_ms': 1, 'p99_ms': 2, 'queries': 3},
+        }}
+
+        rows = list(runner.compare(before, after))
+
+        self.assertEqual(rows[0], ('list', 'p50_ms', 10, 5, -50.0))
+        self.assertEqual(len(rows), 3)
@@ -0,0 +1,83 @@
+"""
+Tests for the load generator
+"""
+import tempfile
+
+from django.db import connection
+from django.test import LiveServerTestCase, SimpleTestCase, override_settings
+
+from benchmarks import loadtest
+
+ACTIONS = ('browse', 'create', 'login', 'upload')
+
+
+class ParseProfileTests(SimpleTestCase):
+    """Test parsing action mixes"""
+
+    def test_parse_profile(self):
+        """Test weights are read per action"""
+        profile = loadtest.parse_profile('browse=3, create=1')
+
+        self.assertEqual(profile, {'browse': 3, 'create': 1})
+
+    def test_parse_profile_unknown_action(self):
+        """Test an unknown action is rejected"""
+        with self.assertRaises(ValueError):
+            loadtest.parse_profile('browse=3,delete=1')
+
+    def test_parse_profile_all_zero(self):
+        """Test a mix without any weight is rejected"""
+        with self.assertRaises(ValueError):
+            loadtest.parse_profile('browse=0')
+
+
+class SummarizeTests(SimpleTestCase):
+    """Test summarizing samples"""
+
+    def test_summarize(self):
+        """Test throughput, error rate and percentiles"""
+        samples = [
+            (0, 'browse', n / 1000, n != 100) for n in range(1, 101)
+        ]
+
+        summary = loadtest.summarize(samples, seconds=2)
+
+        self.assertEqual(summary['requests'], 100)
+        self.assertEqual(summary['rps'], 50.0)
+        self.assertEqual(summary['error_rate'], 0.01)
+        self.assertEqual(summary['p50_ms'], 50.0)
+        self.assertEqual(summary['p99_ms'], 99.0)
+
+    def test_summarize_empty(self):
+        """Test a window without requests"""
+        summary = loadtest.summarize([], seconds=1)
+
+        self.assertEqual(summary['requests'], 0)
+        self.assertEqual(summary['rps'], 0.0)
+
+
+class LoadTestRunTests(LiveServerTestCase):
+    """Test driving a live server"""
+
+    @override_settings(IMAGE_PROCESSING_ASYNC=False, LOGIN_RATE_PER_IP=None,
+                       LOGIN_RATE_PER_EMAIL=None)
+    def test_run_stage(self):
+        """Test a short stage issues successful requests of each action"""
+        # SQLite locks the whole database for each concurrent writer.
+        clients = 1 if connection.vendor == 'sqlite' else 2
+        test = loadtest.LoadTest(
+            self.live_server_url, {action: 1 for action in ACTIONS},
+        )
+
+        with tempfile.TemporaryDirectory() as media_root, \
+                override_settings(MEDIA_ROOT=media_root):
+            stages = test.run([clients], duration=1, interval=0.5)
+
+        self.assertEqual(len(test.clients), clients)
+        summary = stages[0]['summary']
+        self.assertGreater(summary['requests'], 0)
+        self.assertLess(summary['error_rate'], 0.1)
+        self.assertEqual(len(stages[0]['intervals']), 2)
+        for action, action_summary in stages[0]['actions'].items():
+            self.assertIn(action, ACTIONS)
+            self.assertLess(action_summary['error_rate'], 1, action)
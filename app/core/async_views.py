@@ -0,0 +1,93 @@
+"""coroutine entry points for the hot read endpoints under ASGI
+
+Django serves a sync view under ASGI through `sync_to_async` with
+thread_sensitive=True, which funnels every such request of a process
+through one shared thread. The wrapped views below instead run safe
+methods on a pool of ASYNC_DB_THREADS threads, each holding at most one
+database connection, while the event loop keeps waiting on clients.
+"""
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from core.dbpool import check_connections
+
+SAFE_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+
+_executor = None
+
+
+def get_executor():
+    """Return the database thread pool, creating it on first use"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.ASYNC_DB_THREADS,
+            thread_name_prefix='async-db',
+        )
+    return _executor
+
+
+def _run_job(func, args, kwargs):
+    # Pool threads outlive requests, so apply the connection age and
+    # health rules a request boundary would.
+    close_old_connections()
+    check_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_db(func, *args, **kwargs):
+    """Await func(*args, **kwargs) run on the database thread pool.
+
+    The caller's context travels along, so the request's metrics and
+    N+1 tracking see the queries.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        get_executor(),
+        functools.partial(context.run, _run_job, func, args, kwargs),
+    )
+
+
+def _render(view, request, *args, **kwargs):
+    response = view(request, *args, **kwargs)
+    if callable(getattr(response, 'render', None)):
+        # Render on the pool too; Django's own render call is then a no-op.
+        response.render()
+    return response
+
+
+def async_read_view(view):
+    """Return a coroutine version of a sync view when ASYNC_READ_VIEWS is on.
+
+    Safe methods run on the database thread pool; writes keep Django's
+    default of one thread-sensitive executor.
+    """
+    if not settings.ASYNC_READ_VIEWS:
+        return view
+    sync_view = sync_to_async(view)
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method in SAFE_METHODS:
+            return await run_db(_render, view, request, *args, **kwargs)
+        return await sync_view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def async_read_patterns(patterns, names):
+    """Wrap the callbacks of the URL patterns named in names"""
+    for pattern in patterns:
+        if pattern.name in names:
+            pattern.callback = async_read_view(pattern.callback)
+    return patterns
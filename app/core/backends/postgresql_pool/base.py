@@ -0,0 +1,60 @@
+"""PostgreSQL backend sharing a bounded pool of connections per process"""
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.db.backends.postgresql import base
+from psycopg2 import extensions
+
+from core import dbpool
+
+
+def _usable(conn):
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except base.Database.Error:
+        return False
+    return True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """Takes connections from the alias' pool and hands them back on close.
+
+    Set CONN_MAX_AGE to 0 so a connection goes back at the end of each
+    request rather than staying with its thread.
+    """
+
+    @property
+    def pooled(self):
+        # Test database creation connects to the maintenance database
+        # under its own alias; that connection is not pooled.
+        return self.alias != NO_DB_ALIAS
+
+    @property
+    def pool(self):
+        return dbpool.get_pool(
+            self.alias, self.settings_dict, self._open_connection, _usable,
+        )
+
+    def _open_connection(self):
+        return super().get_new_connection(self.get_connection_params())
+
+    def get_new_connection(self, conn_params):
+        if not self.pooled:
+            return super().get_new_connection(conn_params)
+        try:
+            return self.pool.acquire()
+        except dbpool.PoolTimeout as exc:
+            raise base.Database.OperationalError(str(exc)) from exc
+
+    def _close(self):
+        if self.connection is None or not self.pooled:
+            return super()._close()
+        conn = self.connection
+        reusable = not conn.closed
+        if reusable and (
+            conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE
+        ):
+            try:
+                conn.rollback()
+            except base.Database.Error:
+                reusable = False
+        self.pool.release(conn, reusable=reusable)
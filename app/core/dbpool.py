@@ -0,0 +1,239 @@
+"""database connection reuse: health checks and a bounded process-wide pool
+
+Persistent connections (CONN_MAX_AGE) stay with the thread that opened
+them. With CONN_HEALTH_CHECKS a reused connection is pinged when a request
+starts and replaced if the server dropped it.
+
+The pooled backend (core.backends.postgresql_pool) instead hands its
+connection back when Django closes it at the end of a request, so a
+threaded or ASGI server shares at most POOL_SIZE connections between any
+number of threads; callers wait up to POOL_TIMEOUT seconds for one.
+"""
+import threading
+from collections import deque
+from time import monotonic, perf_counter
+
+from django.core.signals import request_started
+from django.db import connections
+from django.dispatch import receiver
+
+from core.metrics import LATENCY_BUCKETS, Histogram, histogram_lines
+
+
+class PoolTimeout(Exception):
+    """No pooled connection became free in time"""
+
+
+class ConnectionPool:
+    """Thread-safe pool of at most `size` DB-API connections.
+
+    `connect` opens a new connection; `check`, when given, tells whether an
+    idle connection still works before it is handed out again.
+    """
+
+    def __init__(self, connect, size, timeout, check=None):
+        self.connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.check = check
+        self.in_use = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.discarded = 0
+        self.wait_time = Histogram(LATENCY_BUCKETS)
+        self._idle = deque()
+        self._cond = threading.Condition()
+
+    @property
+    def idle(self):
+        return len(self._idle)
+
+    def acquire(self):
+        """Return a connection, waiting for a free slot when all are taken"""
+        start = perf_counter()
+        deadline = monotonic() + self.timeout
+        conn = None
+        with self._cond:
+            if not self._idle and self.in_use >= self.size:
+                self.waits += 1
+            while not self._idle and self.in_use >= self.size:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(
+                        f'No database connection free after {self.timeout}s '
+                        f'({self.size} in use)'
+                    )
+                self._cond.wait(remaining)
+            if self._idle:
+                # Most recently used first, so surplus connections go stale
+                # at the other end instead of all staying half-warm.
+                conn = self._idle.pop()
+            self.in_use += 1
+            self.wait_time.observe(perf_counter() - start)
+
+        if (conn is not None and self.check is not None
+                and not self.check(conn)):
+            self._discard(conn)
+            conn = None
+        if conn is None:
+            try:
+                conn = self.connect()
+            except BaseException:
+                self._free_slot()
+                raise
+        return conn
+
+    def release(self, conn, reusable=True):
+        """Return conn to the pool, or close it when it is not reusable"""
+        if not reusable:
+            self._discard(conn)
+            self._free_slot()
+            return
+        with self._cond:
+            self.in_use -= 1
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def _free_slot(self):
+        with self._cond:
+            self.in_use -= 1
+            self._cond.notify()
+
+    def _discard(self, conn):
+        with self._cond:
+            self.discarded += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def warm(self, count):
+        """Open connections until `count` are idle or the pool is full"""
+        with self._cond:
+            missing = max(min(
+                count - len(self._idle),
+                self.size - self.in_use - len(self._idle),
+            ), 0)
+            # Hold the slots while connecting outside the lock.
+            self.in_use += missing
+        opened = []
+        try:
+            for _ in range(missing):
+                opened.append(self.connect())
+        finally:
+            with self._cond:
+                self.in_use -= missing
+                self._idle.extend(opened)
+                self._cond.notify_all()
+        return len(opened)
+
+    def close_idle(self):
+        """Close every idle connection"""
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+        for conn in idle:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, settings_dict, connect, check):
+    """Return the pool of a database alias, creating it on first use"""
+    pool = _pools.get(alias)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(alias)
+            if pool is None:
+                pool = _pools[alias] = ConnectionPool(
+                    connect,
+                    size=settings_dict['POOL_SIZE'],
+                    timeout=settings_dict.get('POOL_TIMEOUT', 10),
+                    check=(
+                        check if settings_dict.get('CONN_HEALTH_CHECKS')
+                        else None
+                    ),
+                )
+    return pool
+
+
+def close_pools():
+    """Close idle pooled connections, e.g. before dropping a database"""
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close_idle()
+
+
+def warm(alias):
+    """Open POOL_WARM connections of a pooled alias; return how many opened.
+
+    The pool is per process, so this has to run in the serving process.
+    """
+    connection = connections[alias]
+    count = connection.settings_dict.get('POOL_WARM', 0)
+    if not count or not hasattr(connection, 'pool'):
+        return 0
+    return connection.pool.warm(count)
+
+
+@receiver(request_started)
+def check_connections(**kwargs):
+    """Replace reused connections the server has dropped.
+
+    Runs after Django's close_old_connections, which only drops
+    connections that already raised an error or outlived CONN_MAX_AGE.
+    """
+    for connection in connections.all():
+        if (
+            connection.connection is not None
+            and connection.settings_dict.get('CONN_HEALTH_CHECKS')
+            and not connection.in_atomic_block
+            and not connection.is_usable()
+        ):
+            connection.close()
+
+
+def render():
+    """Return pool usage in the Prometheus text format"""
+    with _pools_lock:
+        pools = sorted(_pools.items())
+    lines = []
+    gauges = (
+        ('db_pool_size', 'Largest number of pooled connections',
+         lambda pool: pool.size),
+        ('db_pool_connections_in_use', 'Pooled connections handed out',
+         lambda pool: pool.in_use),
+        ('db_pool_connections_idle', 'Open pooled connections not in use',
+         lambda pool: pool.idle),
+    )
+    counters = (
+        ('db_pool_waits_total', 'Acquires that had to wait for a connection',
+         lambda pool: pool.waits),
+        ('db_pool_timeouts_total', 'Acquires that gave up waiting',
+         lambda pool: pool.timeouts),
+        ('db_pool_discarded_total', 'Connections closed as broken',
+         lambda pool: pool.discarded),
+    )
+    for kind, metrics in (('gauge', gauges), ('counter', counters)):
+        for name, help_text, value in metrics:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for alias, pool in pools:
+                lines.append(f'{name}{{alias="{alias}"}} {value(pool)}')
+    name = 'db_pool_wait_seconds'
+    lines.append(f'# HELP {name} Time spent acquiring a pooled connection')
+    lines.append(f'# TYPE {name} histogram')
+    for alias, pool in pools:
+        with pool._cond:
+            histogram = pool.wait_time
+            snapshot = (list(histogram.counts), histogram.sum, histogram.count)
+        lines.extend(histogram_lines(
+            name, f'alias="{alias}"', LATENCY_BUCKETS, *snapshot,
+        ))
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,104 @@
+import json
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from benchmarks import cases, datagen, runner
+
+
+class Command(BaseCommand):
+    """Django command to benchmark the recipe API on a seeded test database."""
+
+    def add_arguments(self, parser):
+        spec = datagen.DatasetSpec()
+        parser.add_argument('--users', type=int, default=spec.users)
+        parser.add_argument('--recipes', type=int, default=spec.recipes,
+                            help='Recipes per user')
+        parser.add_argument('--tags', type=int, default=spec.tags,
+                            help='Tags per user')
+        parser.add_argument('--ingredients', type=int,
+                            default=spec.ingredients,
+                            help='Ingredients per user')
+        parser.add_argument('--seed', type=int, default=spec.seed)
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument(
+            '--cases', default=','.join(cases.CASES),
+            help='Comma separated cases to run',
+        )
+        parser.add_argument('--output', help='Write the results as JSON')
+        parser.add_argument(
+            '--compare', help='JSON results of an earlier run to compare with',
+        )
+
+    def handle(self, *args, **options):
+        names = [name for name in options['cases'].split(',') if name]
+        unknown = set(names) - set(cases.CASES)
+        if unknown:
+            raise CommandError(f"Unknown cases: {', '.join(sorted(unknown))}")
+        spec = datagen.DatasetSpec(
+            users=options['users'],
+            recipes=options['recipes'],
+            tags=options['tags'],
+            ingredients=options['ingredients'],
+            seed=options['seed'],
+        )
+
+        # Benchmarks write to a throwaway test database, never the real one.
+        test_runner = DiscoverRunner(verbosity=0, interactive=False)
+        test_runner.setup_test_environment()
+        old_config = test_runner.setup_databases()
+        try:
+            with tempfile.TemporaryDirectory() as media_root, \
+                    override_settings(MEDIA_ROOT=media_root,
+                                      IMAGE_PROCESSING_ASYNC=False,
+                                      LOGIN_RATE_PER_IP=None,
+                                      LOGIN_RATE_PER_EMAIL=None):
+                report = self.run_benchmarks(spec, names, options)
+        finally:
+            test_runner.teardown_databases(old_config)
+            test_runner.teardown_test_environment()
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+            for row in runner.compare(baseline, report):
+                self.stdout.write(
+                    '{:<16} {:<8} {:>10} -> {:>10} ({:+}%)'.format(*row)
+                )
+
+    def run_benchmarks(self, spec, names, options):
+        start = time.monotonic()
+        dataset = datagen.generate(spec)
+        self.stdout.write(
+            f'Seeded {spec.users} users x {spec.recipes} recipes in '
+            f'{time.monotonic() - start:.1f}s'
+        )
+        ctx = cases.Context(dataset)
+        results = {}
+        self.stdout.write(
+            f"{'case':<16}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}"
+            f"{'queries':>9}{'peak KiB':>10}"
+        )
+        for name in names:
+            result = runner.run_case(
+                cases.CASES[name], ctx,
+                iterations=options['iterations'], warmup=options['warmup'],
+            )
+            results[name] = result
+            self.stdout.write(
+                f"{name:<16}{result['p50_ms']:>10}{result['p90_ms']:>10}"
+                f"{result['p99_ms']:>10}{result['queries']:>9}"
+                f"{result['peak_kib']:>10}"
+            )
+        return {
+            'environment': runner.environment(),
+            'dataset': vars(spec),
+            'results': results,
+        }
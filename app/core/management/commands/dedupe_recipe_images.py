@@ -0,0 +1,56 @@
+from django.core.files import File
+from django.core.management.base import BaseCommand
+
+from core.models import Recipe
+from recipe.images import (
+    delete_variants,
+    schedule_processing,
+    store_image_blob,
+)
+
+
+class Command(BaseCommand):
+    """Django command to move recipe images into the deduplicated store."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help='Recipes fetched from the database at a time',
+        )
+
+    def handle(self, *args, **options):
+        storage = Recipe._meta.get_field('image').storage
+        recipes = Recipe.objects.filter(
+            image_blob__isnull=True,
+        ).exclude(image='').exclude(image__isnull=True)
+
+        moved = missing = 0
+        for recipe in recipes.iterator(chunk_size=options['chunk_size']):
+            old_name = recipe.image.name
+            if not storage.exists(old_name):
+                self.stdout.write(
+                    self.style.WARNING(f'Missing image {old_name}, skipping')
+                )
+                missing += 1
+                continue
+
+            with storage.open(old_name, 'rb') as f:
+                blob = store_image_blob(File(f, name=old_name))
+            if recipe.image_variants:
+                delete_variants(recipe)
+            recipe.image = blob.name
+            recipe.image_blob = blob
+            recipe.image_status = Recipe.IMAGE_PENDING
+            recipe.image_variants = {}
+            recipe.save(update_fields=[
+                'image', 'image_blob', 'image_status', 'image_variants',
+                'updated_at',
+            ])
+            if old_name != blob.name:
+                storage.delete(old_name)
+            schedule_processing(recipe)
+            moved += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Moved {moved} images into the blob store, {missing} missing'
+        ))
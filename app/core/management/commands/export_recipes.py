@@ -0,0 +1,36 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe import export
+
+
+class Command(BaseCommand):
+    """Django command to export a user's recipes as NDJSON or CSV."""
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='Email of the user to export')
+        parser.add_argument(
+            '--output', choices=list(export.FORMATS), default=export.NDJSON,
+        )
+        parser.add_argument(
+            '--file', help='Write to this path instead of standard output',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Recipes fetched from the database at a time',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No user with email {options['email']}")
+
+        rows = export.iter_recipe_rows(user, chunk_size=options['chunk_size'])
+        chunks = export.render(rows, options['output'])
+        if options['file']:
+            with open(options['file'], 'w', newline='') as f:
+                f.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
@@ -0,0 +1,68 @@
+import os
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe import export, importer
+
+
+class Command(BaseCommand):
+    """Django command to import recipes from NDJSON or CSV files."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'email', help='Email of the user owning the recipes',
+        )
+        parser.add_argument('path', help='NDJSON or CSV file to import')
+        parser.add_argument(
+            '--input', choices=list(export.FORMATS),
+            help='Input format, guessed from the extension by default',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--no-copy', action='store_true',
+            help='Use bulk_create even when PostgreSQL COPY is available',
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Ignore the saved checkpoint and import from the start',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No user with email {options['email']}")
+
+        path = os.path.abspath(options['path'])
+        input_format = options['input'] or importer.detect_format(path)
+        recipe_importer = importer.RecipeImporter(
+            user,
+            source=path,
+            batch_size=options['batch_size'],
+            use_copy=False if options['no_copy'] else None,
+        )
+        checkpoint = recipe_importer.checkpoint
+        if options['restart']:
+            checkpoint.position = checkpoint.rows = 0
+            checkpoint.save()
+        elif checkpoint.position:
+            self.stdout.write(
+                f'Resuming after {checkpoint.rows} imported rows'
+            )
+
+        start = time.monotonic()
+        already = checkpoint.rows
+        rows = importer.read_rows(path, input_format, checkpoint.position)
+        for total in recipe_importer.run(rows):
+            elapsed = time.monotonic() - start
+            rate = (total - already) / elapsed if elapsed else 0
+            self.stdout.write(f'Imported {total} rows ({rate:.0f} rows/s)')
+
+        for position, errors in recipe_importer.errors:
+            self.stderr.write(f'Skipped row at {position}: {errors}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Import finished: {checkpoint.rows} rows imported, '
+            f'{len(recipe_importer.errors)} skipped'
+        ))
@@ -0,0 +1,147 @@
+import json
+import tempfile
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.db import connections
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from benchmarks import loadtest
+
+
+class QuietHandler(WSGIRequestHandler):
+    """Request handler that does not log every request"""
+
+    def log_message(self, *args):
+        pass
+
+
+class Command(BaseCommand):
+    """Django command to drive the API with concurrent simulated clients."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            help='Base URL of a running server (WSGI or ASGI) to load; '
+                 'by default the WSGI app is served in-process on a '
+                 'throwaway test database',
+        )
+        parser.add_argument(
+            '--clients', default='1,5,10,20',
+            help='Comma separated concurrency of each stage',
+        )
+        parser.add_argument('--duration', type=float, default=30,
+                            help='Seconds per stage')
+        parser.add_argument('--interval', type=float, default=5,
+                            help='Seconds between progress reports')
+        parser.add_argument(
+            '--profile',
+            default=','.join(
+                f'{action}={weight}'
+                for action, weight in loadtest.DEFAULT_PROFILE.items()
+            ),
+            help='Comma separated action=weight mix',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the results as JSON')
+
+    def handle(self, *args, **options):
+        try:
+            stages = [int(n) for n in options['clients'].split(',') if n]
+            profile = loadtest.parse_profile(options['profile'])
+        except ValueError as exc:
+            raise CommandError(exc)
+        if not stages or min(stages) < 1:
+            raise CommandError('--clients needs positive client counts')
+
+        if options['url']:
+            results = self.run_load(options['url'], stages, profile, options)
+        else:
+            results = self.run_in_process(stages, profile, options)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({
+                    'profile': profile,
+                    'duration_s': options['duration'],
+                    'stages': results,
+                }, f, indent=2)
+
+    def run_in_process(self, stages, profile, options):
+        # The load writes to a throwaway test database, never the real one.
+        test_runner = DiscoverRunner(verbosity=0, interactive=False)
+        test_runner.setup_test_environment()
+        with tempfile.TemporaryDirectory() as tmp:
+            for connection in connections.all():
+                if connection.vendor == 'sqlite':
+                    # An in-memory test database is private to one thread.
+                    connection.settings_dict['TEST']['NAME'] = (
+                        f'{tmp}/{connection.alias}.sqlite3'
+                    )
+            old_config = test_runner.setup_databases()
+            server = None
+            try:
+                with override_settings(
+                        ALLOWED_HOSTS=['127.0.0.1'], DEBUG=False,
+                        MEDIA_ROOT=tmp, IMAGE_PROCESSING_ASYNC=False,
+                        # Every simulated client shares one address.
+                        LOGIN_RATE_PER_IP=None, LOGIN_RATE_PER_EMAIL=None):
+                    from app.wsgi import application
+                    server = ThreadedWSGIServer(
+                        ('127.0.0.1', 0), QuietHandler,
+                        allow_reuse_address=False,
+                    )
+                    server.daemon_threads = True
+                    server.set_app(application)
+                    threading.Thread(
+                        target=server.serve_forever, daemon=True,
+                    ).start()
+                    url = f'http://127.0.0.1:{server.server_address[1]}'
+                    return self.run_load(url, stages, profile, options)
+            finally:
+                if server is not None:
+                    server.shutdown()
+                    server.server_close()
+                connections.close_all()
+                test_runner.teardown_databases(old_config)
+                test_runner.teardown_test_environment()
+
+    def run_load(self, url, stages, profile, options):
+        def report(clients, window):
+            self.stdout.write(self.format_row(
+                clients, f"{window['elapsed_s']}s", window,
+            ))
+
+        self.stdout.write(f'Loading {url} with {profile}')
+        self.stdout.write(
+            f"{'clients':>8}{'window':>10}{'requests':>10}{'rps':>9}"
+            f"{'errors':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+        )
+        test = loadtest.LoadTest(
+            url, profile, seed=options['seed'], on_interval=report,
+        )
+        try:
+            results = test.run(
+                stages, options['duration'], options['interval'],
+            )
+        except loadtest.LoadTestError as exc:
+            raise CommandError(exc)
+
+        self.stdout.write('Totals per stage:')
+        for stage in results:
+            self.stdout.write(self.format_row(
+                stage['clients'], 'total', stage['summary'],
+            ))
+            for action, summary in stage['actions'].items():
+                self.stdout.write(self.format_row('', action, summary))
+        return results
+
+    def format_row(self, clients, label, summary):
+        return (
+            f"{clients:>8}{label:>10}{summary['requests']:>10}"
+            f"{summary['rps']:>9}{summary['error_rate']:>9.2%}"
+            f"{summary.get('p50_ms', '-'):>9}{summary.get('p95_ms', '-'):>9}"
+            f"{summary.get('p99_ms', '-'):>9}"
+        )
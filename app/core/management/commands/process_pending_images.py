@@ -0,0 +1,43 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import Recipe
+from recipe.images import process_recipe_image
+
+
+class Command(BaseCommand):
+    """Django command to process recipe images left pending.
+
+    Images queued on the in-process worker pool are lost when the process
+    stops before it gets to them; run this after a restart or deploy. The
+    API serves no image for a recipe until its image is processed.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=int, default=10,
+            help='Only recipes pending for at least this many minutes',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(minutes=options['older_than'])
+        # Images uploaded before processing existed have no status at all.
+        pks = list(Recipe.objects.filter(
+            Q(image_status=Recipe.IMAGE_PENDING) | Q(image_status=''),
+            updated_at__lte=cutoff,
+        ).exclude(image='').exclude(image__isnull=True).order_by(
+            'pk',
+        ).values_list('pk', flat=True))
+
+        for pk in pks:
+            process_recipe_image(pk)
+
+        failed = Recipe.objects.filter(
+            pk__in=pks, image_status=Recipe.IMAGE_FAILED,
+        ).count()
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {len(pks)} pending images, {failed} failed'
+        ))
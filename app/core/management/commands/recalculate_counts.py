@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from recipe.counts import COUNTED_FIELDS, recalculate_counts
+
+
+class Command(BaseCommand):
+    """Django command to repair tag and ingredient recipe counts."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=10000,
+            help='Rows checked per UPDATE statement',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        for field_name, model in COUNTED_FIELDS:
+            pks = list(
+                model.objects.order_by('pk').values_list('pk', flat=True)
+            )
+            fixed = 0
+            for start in range(0, len(pks), chunk_size):
+                fixed += recalculate_counts(
+                    field_name, model, pks[start:start + chunk_size],
+                )
+            self.stdout.write(self.style.SUCCESS(
+                f'{field_name}: checked {len(pks)}, '
+                f'fixed {fixed}'
+            ))
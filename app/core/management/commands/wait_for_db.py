@@ -2,11 +2,20 @@ from django.core.management.base import BaseCommand
 import time
 
 from psycopg2 import OperationalError as Psycopg2Error
+from django.db import connections
 from django.db.utils import OperationalError
 
+from core import dbpool
+
 
 class Command(BaseCommand):
-    """Django command to wait for database."""
+    """Django command to wait for database.
+
+    With a pooled database it then opens POOL_WARM connections. Pools are
+    per process, so call it from the serving process (for example a
+    gunicorn post_worker_init hook) to have the first requests skip the
+    connect handshake.
+    """
 
     def handle(self, *args, **options):
         self.stdout.write('Waiting for database...')
@@ -21,3 +30,8 @@ class Command(BaseCommand):
 
         self.stdout.write(self.style.SUCCESS('Databse is available'))
 
+        # Hand the connection used by the check back to the pool first.
+        connections['default'].close()
+        warmed = dbpool.warm('default')
+        if warmed:
+            self.stdout.write(f'Opened {warmed} pooled connections')
@@ -0,0 +1,155 @@
+"""in-process request metrics rendered in the Prometheus text format
+
+Each process aggregates its own requests, so with several workers every
+scrape sees the worker that answered it.
+"""
+import bisect
+import threading
+from contextvars import ContextVar
+from time import perf_counter
+
+# Upper bounds of the histogram buckets; +Inf is implied
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+# (metric name, help, buckets)
+HISTOGRAMS = (
+    ('http_request_duration_seconds', 'Request latency', LATENCY_BUCKETS),
+    ('http_request_db_queries', 'Database queries per request', QUERY_BUCKETS),
+    ('http_request_db_duration_seconds', 'Database time per request',
+     LATENCY_BUCKETS),
+    ('http_request_serializer_duration_seconds',
+     'Serializer time per request', LATENCY_BUCKETS),
+    ('http_response_size_bytes', 'Response body size', SIZE_BUCKETS),
+)
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Measurements of one request, filled in while it is handled"""
+    __slots__ = ('queries', 'db_time', 'serializer_time', '_serializing')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self._serializing = False
+
+    def __call__(self, execute, sql, params, many, context):
+        """Database execute wrapper counting queries and their time"""
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += perf_counter() - start
+            self.queries += 1
+
+
+def start_request():
+    """Begin collecting metrics for the current request"""
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+class Histogram:
+    """Bucket counts, sum and count of observed values"""
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def histogram_lines(name, labels, buckets, counts, total, count):
+    """Return the Prometheus sample lines of one histogram series"""
+    lines = []
+    cumulative = 0
+    for bound, bucket_count in zip(buckets + ('+Inf',), counts):
+        cumulative += bucket_count
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_sum{{{labels}}} {total}')
+    lines.append(f'{name}_count{{{labels}}} {count}')
+    return lines
+
+
+class Registry:
+    """Histograms per (view, method, status class)"""
+
+    def __init__(self):
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def record(self, labels, values):
+        """Observe one request; values are ordered like HISTOGRAMS"""
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [
+                    Histogram(buckets) for _name, _help, buckets in HISTOGRAMS
+                ]
+            for histogram, value in zip(series, values):
+                if value is not None:
+                    histogram.observe(value)
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        """Return every histogram in the Prometheus text format"""
+        with self._lock:
+            snapshot = [
+                (labels, [
+                    (list(h.counts), h.sum, h.count) for h in series
+                ])
+                for labels, series in sorted(self._series.items())
+            ]
+
+        lines = []
+        for i, (name, help_text, buckets) in enumerate(HISTOGRAMS):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            for (view, method, status), series in snapshot:
+                counts, total, count = series[i]
+                if not count:
+                    continue
+                labels = f'view="{view}",method="{method}",status="{status}"'
+                lines.extend(histogram_lines(
+                    name, labels, buckets, counts, total, count,
+                ))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class TimedSerializerMixin:
+    """Add the time spent building `serializer.data` to request metrics"""
+
+    @property
+    def data(self):
+        metrics = _current.get()
+        if metrics is None or metrics._serializing:
+            return super().data
+        metrics._serializing = True
+        start = perf_counter()
+        try:
+            return super().data
+        finally:
+            metrics.serializer_time += perf_counter() - start
+            metrics._serializing = False
@@ -0,0 +1,165 @@
+"""request instrumentation middleware"""
+import asyncio
+import random
+from time import perf_counter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from core import metrics, nplusone, replicas
+from core.querywrappers import execute_wrapper
+
+KNOWN_METHODS = frozenset(
+    ('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS')
+)
+SAFE_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+
+
+class HybridMiddleware:
+    """Middleware serving WSGI and ASGI stacks without a thread hop.
+
+    Like Django's MiddlewareMixin, an instance whose get_response is a
+    coroutine function is itself marked as one and handles requests in
+    `__acall__`.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        return self.handle(request)
+
+
+class MetricsMiddleware(HybridMiddleware):
+    """Record latency, query count and time, serializer time and response
+    size of every request, labelled by the resolved route name.
+    """
+
+    def handle(self, request):
+        start = perf_counter()
+        request_metrics, token = metrics.start_request()
+        try:
+            with execute_wrapper(request_metrics):
+                response = self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        self.record(request, response, request_metrics, start)
+        return response
+
+    async def __acall__(self, request):
+        start = perf_counter()
+        request_metrics, token = metrics.start_request()
+        try:
+            with execute_wrapper(request_metrics):
+                response = await self.get_response(request)
+        finally:
+            metrics.end_request(token)
+        self.record(request, response, request_metrics, start)
+        return response
+
+    def record(self, request, response, request_metrics, start):
+        match = request.resolver_match
+        method = request.method if request.method in KNOWN_METHODS else 'other'
+        size = None if response.streaming else len(response.content)
+        metrics.registry.record(
+            (
+                match.view_name if match else 'unresolved',
+                method,
+                f'{response.status_code // 100}xx',
+            ),
+            (
+                perf_counter() - start,
+                request_metrics.queries,
+                request_metrics.db_time,
+                request_metrics.serializer_time,
+                size,
+            ),
+        )
+
+
+class NPlusOneMiddleware(HybridMiddleware):
+    """Flag queries repeated within one request.
+
+    In `raise` mode (tests) every request is checked and a repeat raises;
+    in `log` mode a NPLUSONE_SAMPLE_RATE share of requests is checked and
+    repeats are logged.
+    """
+
+    def sampled(self):
+        mode = settings.NPLUSONE_MODE
+        return mode != nplusone.OFF and (
+            mode != nplusone.LOG
+            or random.random() < settings.NPLUSONE_SAMPLE_RATE
+        )
+
+    def handle(self, request):
+        if not self.sampled():
+            return self.get_response(request)
+        label = f'{request.method} {request.path}'
+        with nplusone.detect_repeated_queries(label):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+        label = f'{request.method} {request.path}'
+        with nplusone.detect_repeated_queries(label):
+            return await self.get_response(request)
+
+
+class ReplicaRoutingMiddleware(HybridMiddleware):
+    """Read from replicas on safe-method requests.
+
+    A successful unsafe request pins its client to the primary for
+    REPLICA_STICKY_SECONDS, so it reads its own writes.
+    """
+
+    def handle(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        token = replicas.start_reads(self.reads(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            replicas.end_reads(token)
+        if request.method not in SAFE_METHODS:
+            self.pin(request, response)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return await self.get_response(request)
+        token = replicas.start_reads(self.reads(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            replicas.end_reads(token)
+        if request.method not in SAFE_METHODS:
+            await sync_to_async(self.pin)(request, response)
+        return response
+
+    def reads(self, request):
+        if request.method not in SAFE_METHODS:
+            return None
+        return replicas.ReplicaReads(
+            replicas.request_token(request),
+            pinned=True if replicas.PIN_COOKIE in request.COOKIES else None,
+        )
+
+    def pin(self, request, response):
+        if response.status_code >= 400:
+            return
+        response.set_cookie(
+            replicas.PIN_COOKIE, '1',
+            max_age=settings.REPLICA_STICKY_SECONDS,
+            httponly=True, samesite='Lax',
+        )
+        token_key = replicas.request_token(request)
+        if token_key:
+            replicas.pin(token_key)
@@ -0,0 +1,57 @@
+# Generated by Django 3.2.25 on 2026-10-18 10:00
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicates(apps, schema_editor):
+    """Fold per-user duplicate names into the oldest row"""
+    Recipe = apps.get_model('core', 'Recipe')
+    for model_name, field_name in (('Tags', 'tags'), ('Ingredient', 'ingredients')):
+        model = apps.get_model('core', model_name)
+        through = getattr(Recipe, field_name).through
+        target = through._meta.get_field(model_name.lower()).attname
+        duplicates = (
+            model.objects.values('user_id', 'name')
+            .annotate(keep_id=Min('id'), total=Count('id'))
+            .filter(total__gt=1)
+        )
+        for duplicate in duplicates:
+            extra_ids = list(
+                model.objects.filter(
+                    user_id=duplicate['user_id'],
+                    name=duplicate['name'],
+                ).exclude(id=duplicate['keep_id']).values_list('id', flat=True)
+            )
+            linked = set(
+                through.objects.filter(
+                    **{target: duplicate['keep_id']}
+                ).values_list('recipe_id', flat=True)
+            )
+            for row in through.objects.filter(**{f'{target}__in': extra_ids}):
+                if row.recipe_id in linked:
+                    row.delete()
+                    continue
+                setattr(row, target, duplicate['keep_id'])
+                row.save()
+                linked.add(row.recipe_id)
+            model.objects.filter(id__in=extra_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_recipe_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='tags',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='unique_tag_name_per_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='unique_ingredient_name_per_user'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 3.2.25 on 2026-10-18 11:00
+
+from django.db import migrations, models
+
+# The M2M through tables are auto-created, so their reverse
+# (target, recipe) indexes are managed here rather than in model state.
+THROUGH_INDEXES = (
+    ('tags', 'tags', 'recipe_tags_reverse_idx'),
+    ('ingredients', 'ingredient', 'recipe_ingredients_reverse_idx'),
+)
+
+
+def _through_indexes(apps):
+    Recipe = apps.get_model('core', 'Recipe')
+    for field_name, target, index_name in THROUGH_INDEXES:
+        through = Recipe._meta.get_field(field_name).remote_field.through
+        yield through, models.Index(fields=[target, 'recipe'], name=index_name)
+
+
+def add_through_indexes(apps, schema_editor):
+    for through, index in _through_indexes(apps):
+        schema_editor.add_index(through, index)
+
+
+def remove_through_indexes(apps, schema_editor):
+    for through, index in _through_indexes(apps):
+        schema_editor.remove_index(through, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_unique_tag_ingredient_name'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'id'], name='recipe_user_id_idx'),
+        ),
+        migrations.RunPython(add_through_indexes, remove_through_indexes),
+    ]
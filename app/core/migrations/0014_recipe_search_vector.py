@@ -0,0 +1,81 @@
+# Generated by Django 3.2.25 on 2026-10-18 16:00
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+# GIN and trigram indexes only exist on PostgreSQL, so they are managed here
+# rather than in model state and other backends fall back to LIKE filters.
+SEARCH_INDEXES = (
+    GinIndex(fields=['search_vector'], name='recipe_search_vector_idx'),
+    GinIndex(
+        fields=['title'],
+        name='recipe_title_trgm_idx',
+        opclasses=['gin_trgm_ops'],
+    ),
+)
+BACKFILL_CHUNK_SIZE = 10000
+
+
+def _names(Recipe, field_name):
+    field = Recipe._meta.get_field(field_name)
+    names = field.remote_field.through.objects.filter(
+        recipe_id=OuterRef('pk'),
+    ).values('recipe_id').annotate(
+        names=StringAgg(f'{field.m2m_reverse_field_name()}__name', ' '),
+    ).values('names')
+    return Coalesce(Subquery(names), Value(''))
+
+
+def add_search(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Recipe = apps.get_model('core', 'Recipe')
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for index in SEARCH_INDEXES:
+        schema_editor.add_index(Recipe, index)
+
+    config = settings.RECIPE_SEARCH_CONFIG
+    document = (
+        SearchVector('title', weight='A', config=config) +
+        SearchVector(
+            _names(Recipe, 'tags'), _names(Recipe, 'ingredients'),
+            weight='B', config=config,
+        ) +
+        SearchVector('description', weight='C', config=config)
+    )
+    ids = list(Recipe.objects.order_by('id').values_list('id', flat=True))
+    for start in range(0, len(ids), BACKFILL_CHUNK_SIZE):
+        chunk = ids[start:start + BACKFILL_CHUNK_SIZE]
+        Recipe.objects.filter(id__gte=chunk[0], id__lte=chunk[-1]).update(
+            search_vector=document,
+        )
+
+
+def remove_search(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Recipe = apps.get_model('core', 'Recipe')
+    for index in SEARCH_INDEXES:
+        schema_editor.remove_index(Recipe, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_importcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(add_search, remove_search),
+    ]
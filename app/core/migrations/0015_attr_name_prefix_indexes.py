@@ -0,0 +1,42 @@
+# Generated by Django 3.2.25 on 2026-10-18 17:00
+
+from django.db import migrations
+
+# Autocomplete filters on user_id and UPPER(name) LIKE 'PREFIX%'. Expression
+# indexes with an operator class cannot be declared in model state on this
+# Django version, so they are created with SQL on PostgreSQL only.
+PREFIX_INDEXES = (
+    ('core_tags', 'tags_user_name_prefix_idx'),
+    ('core_ingredient', 'ingredient_user_name_prefix_idx'),
+)
+
+
+def add_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    quote = schema_editor.quote_name
+    for table, index_name in PREFIX_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX {quote(index_name)} ON {quote(table)} '
+            f'("user_id", UPPER("name"::text) text_pattern_ops)'
+        )
+
+
+def remove_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for _table, index_name in PREFIX_INDEXES:
+        schema_editor.execute(
+            f'DROP INDEX IF EXISTS {schema_editor.quote_name(index_name)}'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_prefix_indexes, remove_prefix_indexes),
+    ]
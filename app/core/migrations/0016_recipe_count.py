@@ -0,0 +1,128 @@
+# Generated by Django 3.2.25 on 2026-10-18 18:00
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+# (m2m field on Recipe, counted model)
+COUNTED_FIELDS = (('tags', 'Tags'), ('ingredients', 'Ingredient'))
+
+# Counts are kept by triggers on the through tables so that bulk inserts,
+# COPY and cascade deletes, which send no m2m signals, are covered too.
+# PostgreSQL uses statement-level triggers that apply one grouped UPDATE
+# per statement.
+POSTGRES_FUNCTION = """
+CREATE OR REPLACE FUNCTION {name}() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE {table} AS t SET recipe_count = t.recipe_count + d.n
+        FROM (
+            SELECT {column}, COUNT(*) AS n FROM new_links GROUP BY {column}
+        ) AS d
+        WHERE t.id = d.{column};
+    ELSE
+        UPDATE {table} AS t SET recipe_count = t.recipe_count - d.n
+        FROM (
+            SELECT {column}, COUNT(*) AS n FROM old_links GROUP BY {column}
+        ) AS d
+        WHERE t.id = d.{column};
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+POSTGRES_TRIGGERS = (
+    'CREATE TRIGGER {name}_insert AFTER INSERT ON {through} '
+    'REFERENCING NEW TABLE AS new_links '
+    'FOR EACH STATEMENT EXECUTE PROCEDURE {name}()',
+    'CREATE TRIGGER {name}_delete AFTER DELETE ON {through} '
+    'REFERENCING OLD TABLE AS old_links '
+    'FOR EACH STATEMENT EXECUTE PROCEDURE {name}()',
+)
+SQLITE_TRIGGERS = (
+    'CREATE TRIGGER {name}_insert AFTER INSERT ON {through} BEGIN '
+    'UPDATE {table} SET recipe_count = recipe_count + 1 '
+    'WHERE id = NEW.{column}; END',
+    'CREATE TRIGGER {name}_delete AFTER DELETE ON {through} BEGIN '
+    'UPDATE {table} SET recipe_count = recipe_count - 1 '
+    'WHERE id = OLD.{column}; END',
+)
+
+
+def _counted(apps):
+    Recipe = apps.get_model('core', 'Recipe')
+    for field_name, model_name in COUNTED_FIELDS:
+        field = Recipe._meta.get_field(field_name)
+        through = field.remote_field.through
+        model = apps.get_model('core', model_name)
+        column = f'{field.m2m_reverse_field_name()}_id'
+        yield model, through, column, {
+            'name': f'{through._meta.db_table}_count',
+            'through': through._meta.db_table,
+            'table': model._meta.db_table,
+            'column': column,
+        }
+
+
+def add_count_triggers(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for model, through, column, names in _counted(apps):
+        links = through.objects.filter(**{column: OuterRef('pk')}).values(
+            column,
+        ).annotate(n=Count('id')).values('n')
+        model.objects.update(
+            recipe_count=Coalesce(Subquery(links), Value(0)),
+        )
+
+        if vendor == 'postgresql':
+            schema_editor.execute(POSTGRES_FUNCTION.format(**names))
+            triggers = POSTGRES_TRIGGERS
+        elif vendor == 'sqlite':
+            triggers = SQLITE_TRIGGERS
+        else:
+            continue
+        for sql in triggers:
+            schema_editor.execute(sql.format(**names))
+
+
+def remove_count_triggers(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for _model, _through, _column, names in _counted(apps):
+        if vendor == 'postgresql':
+            schema_editor.execute(
+                'DROP FUNCTION IF EXISTS {name}() CASCADE'.format(**names)
+            )
+        elif vendor == 'sqlite':
+            for suffix in ('insert', 'delete'):
+                schema_editor.execute(
+                    f"DROP TRIGGER IF EXISTS {names['name']}_{suffix}"
+                )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_attr_name_prefix_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tags',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='tags',
+            index=models.Index(fields=['user', 'recipe_count'], name='tags_user_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', 'recipe_count'], name='ingredient_user_count_idx'),
+        ),
+        migrations.RunPython(add_count_triggers, remove_count_triggers),
+    ]
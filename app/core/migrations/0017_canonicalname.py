@@ -0,0 +1,132 @@
+# Generated by Django 3.2.25 on 2026-10-18 19:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Min, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from importlib import import_module
+
+recipe_count = import_module('core.migrations.0016_recipe_count')
+
+BATCH_SIZE = 5000
+
+
+# SQLite rebuilds a table to add or alter a column, which breaks triggers
+# that refer to it, so the count triggers are dropped until 0018 is done.
+def drop_sqlite_count_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        recipe_count.remove_count_triggers(apps, schema_editor)
+
+
+def create_sqlite_count_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        recipe_count.add_count_triggers(apps, schema_editor)
+
+
+def normalize_name(name):
+    return ' '.join(name.split()).casefold()
+
+
+def _intern(CanonicalName, names):
+    CanonicalName.objects.bulk_create(
+        [CanonicalName(name=name) for name in names],
+        ignore_conflicts=True,
+    )
+    return dict(
+        CanonicalName.objects.filter(name__in=names).values_list('name', 'id')
+    )
+
+
+def _link_canonical(CanonicalName, model):
+    batch = []
+    for obj in model.objects.only('id', 'name').iterator(chunk_size=BATCH_SIZE):
+        batch.append(obj)
+        if len(batch) >= BATCH_SIZE:
+            _save_canonical(CanonicalName, model, batch)
+            batch = []
+    if batch:
+        _save_canonical(CanonicalName, model, batch)
+
+
+def _save_canonical(CanonicalName, model, batch):
+    ids = _intern(CanonicalName, {normalize_name(obj.name) for obj in batch})
+    for obj in batch:
+        obj.canonical_id = ids[normalize_name(obj.name)]
+    model.objects.bulk_update(batch, ['canonical'])
+
+
+def _fold_duplicates(model, through, target):
+    """Merge rows of a user sharing a canonical name into the oldest one"""
+    duplicates = (
+        model.objects.values('user_id', 'canonical_id')
+        .annotate(keep_id=Min('id'), total=Count('id'))
+        .filter(total__gt=1)
+    )
+    kept = []
+    for duplicate in duplicates:
+        keep_id = duplicate['keep_id']
+        extra_ids = list(
+            model.objects.filter(
+                user_id=duplicate['user_id'],
+                canonical_id=duplicate['canonical_id'],
+            ).exclude(id=keep_id).values_list('id', flat=True)
+        )
+        linked = through.objects.filter(**{target: keep_id}).values('recipe_id')
+        through.objects.filter(
+            **{f'{target}__in': extra_ids}, recipe_id__in=linked,
+        ).delete()
+        through.objects.filter(**{f'{target}__in': extra_ids}).update(
+            **{target: keep_id}
+        )
+        model.objects.filter(id__in=extra_ids).delete()
+        kept.append(keep_id)
+
+    # Moved links are UPDATEs, which the count triggers do not see.
+    links = through.objects.filter(**{target: OuterRef('pk')}).values(
+        target,
+    ).annotate(n=Count('id')).values('n')
+    model.objects.filter(id__in=kept).update(
+        recipe_count=Coalesce(Subquery(links), Value(0)),
+    )
+
+
+def fold_names(apps, schema_editor):
+    CanonicalName = apps.get_model('core', 'CanonicalName')
+    Recipe = apps.get_model('core', 'Recipe')
+    for model_name, field_name in (('Tags', 'tags'), ('Ingredient', 'ingredients')):
+        model = apps.get_model('core', model_name)
+        field = Recipe._meta.get_field(field_name)
+        target = f'{field.m2m_reverse_field_name()}_id'
+        _link_canonical(CanonicalName, model)
+        _fold_duplicates(model, field.remote_field.through, target)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_recipe_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            drop_sqlite_count_triggers, create_sqlite_count_triggers,
+        ),
+        migrations.CreateModel(
+            name='CanonicalName',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='tags',
+            name='canonical',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='core.canonicalname'),
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='canonical',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='core.canonicalname'),
+        ),
+        migrations.RunPython(fold_names, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 3.2.25 on 2026-10-18 19:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+from importlib import import_module
+
+canonicalname = import_module('core.migrations.0017_canonicalname')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_canonicalname'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tags',
+            name='canonical',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='core.canonicalname'),
+        ),
+        migrations.AlterField(
+            model_name='ingredient',
+            name='canonical',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='core.canonicalname'),
+        ),
+        migrations.RemoveConstraint(
+            model_name='tags',
+            name='unique_tag_name_per_user',
+        ),
+        migrations.RemoveConstraint(
+            model_name='ingredient',
+            name='unique_ingredient_name_per_user',
+        ),
+        migrations.AddConstraint(
+            model_name='tags',
+            constraint=models.UniqueConstraint(fields=('user', 'canonical'), name='unique_tag_canonical_per_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('user', 'canonical'), name='unique_ingredient_canonical_per_user'),
+        ),
+        migrations.RunPython(
+            canonicalname.create_sqlite_count_triggers,
+            canonicalname.drop_sqlite_count_triggers,
+        ),
+    ]
@@ -1,6 +1,7 @@
 
 from django.db import models
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import(
     AbstractBaseUser,
     BaseUserManager,
@@ -15,6 +16,20 @@ def recipe_image_file_path(instance, filename):
 
     return os.path.join('uploads/recipe/', filename)
 
+
+def image_blob_file_path(content_hash, filename):
+    """Generate the content-addressed path of a recipe image blob"""
+    ext = os.path.splitext(filename)[1].lower()
+    return os.path.join(
+        'uploads/recipe/blobs/', content_hash[:2], f'{content_hash}{ext}'
+    )
+
+
+def normalize_name(name):
+    """Fold case and whitespace so equivalent tag/ingredient names match"""
+    return ' '.join(name.split()).casefold()
+
+
 class UserManager(BaseUserManager):
     
     def create_user(self, email, password=None, **extra_fields):
@@ -50,6 +65,15 @@ class User(AbstractBaseUser, PermissionsMixin):
     
 class Recipe(models.Model):
     """Recipe object"""
+    IMAGE_PENDING = 'pending'
+    IMAGE_READY = 'ready'
+    IMAGE_FAILED = 'failed'
+    IMAGE_STATUS_CHOICES = [
+        (IMAGE_PENDING, 'Pending'),
+        (IMAGE_READY, 'Ready'),
+        (IMAGE_FAILED, 'Failed'),
+    ]
+
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -62,7 +86,27 @@ class Recipe(models.Model):
     tags = models.ManyToManyField('Tags')
     ingredients = models.ManyToManyField('Ingredient')
     image = models.ImageField(null = True, upload_to=recipe_image_file_path)
-
+    image_status = models.CharField(
+        max_length=10, choices=IMAGE_STATUS_CHOICES, blank=True,
+    )
+    image_variants = models.JSONField(default=dict, blank=True)
+    image_blob = models.ForeignKey(
+        'ImageBlob',
+        null=True,
+        blank=True,
+        on_delete=models.PROTECT,
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id'], name='recipe_user_id_idx'),
+            models.Index(
+                fields=['user', 'updated_at'],
+                name='recipe_user_updated_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.title
@@ -71,6 +115,29 @@ class Tags(models.Model):
     """Tag for filtering recipes"""
     name  = models.CharField(max_length=255)
     user = models.ForeignKey(settings.AUTH_USER_MODEL,on_delete=models.CASCADE,)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Number of linked recipes, maintained by database triggers
+    recipe_count = models.PositiveIntegerField(default=0, editable=False)
+    canonical = models.ForeignKey(
+        'CanonicalName',
+        on_delete=models.PROTECT,
+        related_name='+',
+        editable=False,
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'canonical'],
+                name='unique_tag_canonical_per_user',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'recipe_count'],
+                name='tags_user_count_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -80,7 +147,71 @@ class Ingredient(models.Model):
     """Ingredient for recipes"""
     name = models.CharField(max_length=255)
     user = models.ForeignKey(settings.AUTH_USER_MODEL,on_delete=models.CASCADE,)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Number of linked recipes, maintained by database triggers
+    recipe_count = models.PositiveIntegerField(default=0, editable=False)
+    canonical = models.ForeignKey(
+        'CanonicalName',
+        on_delete=models.PROTECT,
+        related_name='+',
+        editable=False,
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'canonical'],
+                name='unique_ingredient_canonical_per_user',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', 'recipe_count'],
+                name='ingredient_user_count_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
-    
\ No newline at end of file
+
+
+class CanonicalName(models.Model):
+    """Normalized tag/ingredient name shared by every user"""
+    name = models.CharField(max_length=255, unique=True)
+
+    def __str__(self):
+        return self.name
+
+
+class ImageBlob(models.Model):
+    """Uploaded image stored once per distinct content"""
+    sha256 = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
+class ImportCheckpoint(models.Model):
+    """Resume position of a recipe import, saved with each batch"""
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+    )
+    source = models.CharField(max_length=1024)
+    position = models.BigIntegerField(default=0)
+    rows = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'source'],
+                name='unique_import_checkpoint',
+            ),
+        ]
+
+    def __str__(self):
+        return self.source
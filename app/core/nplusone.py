@@ -0,0 +1,96 @@
+"""detection of repeated queries (N+1 patterns) within one unit of work"""
+import functools
+import logging
+import os
+import re
+import traceback
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from core.querywrappers import execute_wrapper
+
+logger = logging.getLogger(__name__)
+
+RAISE = 'raise'
+LOG = 'log'
+OFF = 'off'
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+# Runs after %s became ?; one placeholder folds like many.
+_PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_SPACE = re.compile(r'\s+')
+_PROJECT_ROOT = str(settings.BASE_DIR)
+
+
+class NPlusOneError(AssertionError):
+    """Raised in tests when a query repeats more often than allowed"""
+
+
+@functools.lru_cache(maxsize=4096)
+def fingerprint(sql):
+    """Return sql with literals and placeholder lists folded to `?`"""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _PLACEHOLDER_LIST.sub('(...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def _project_stack():
+    """Format the calling frames that belong to this project"""
+    here = os.path.abspath(__file__)
+    frames = [
+        frame for frame in traceback.extract_stack()[:-2]
+        if frame.filename.startswith(_PROJECT_ROOT)
+        and os.path.abspath(frame.filename) != here
+    ]
+    return ''.join(traceback.format_list(frames))
+
+
+class QueryPatternTracker:
+    """Execute wrapper counting fingerprints and flagging repeats.
+
+    A fingerprint is flagged once, when it runs more than `threshold`
+    times; `mode` decides whether that raises or logs.
+    """
+
+    def __init__(self, label, threshold, mode):
+        self.label = label
+        self.threshold = threshold
+        self.mode = mode
+        self.counts = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        key = fingerprint(sql)
+        count = self.counts.get(key, 0) + 1
+        self.counts[key] = count
+        if count == self.threshold + 1:
+            self.report(key, count)
+        return execute(sql, params, many, context)
+
+    def report(self, key, count):
+        message = (
+            f'{self.label}: query repeated more than {self.threshold} '
+            f'times (possible N+1):\n  {key}\n{_project_stack()}'
+        )
+        if self.mode == RAISE:
+            raise NPlusOneError(message)
+        logger.warning(message)
+
+
+@contextmanager
+def detect_repeated_queries(label, threshold=None, mode=None):
+    """Track repeated queries on every connection within the block,
+    including queries run for it on other threads
+    """
+    mode = mode or settings.NPLUSONE_MODE
+    if mode == OFF:
+        yield None
+        return
+    if threshold is None:
+        threshold = settings.NPLUSONE_THRESHOLD
+    tracker = QueryPatternTracker(label, threshold, mode)
+    with execute_wrapper(tracker):
+        yield tracker
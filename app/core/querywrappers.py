@@ -0,0 +1,41 @@
+"""database execute wrappers scoped to a context instead of a connection
+
+Django's `connection.execute_wrapper()` applies to one connection object,
+and connections are per thread. Wrappers registered here follow the
+current context instead, so queries run by `sync_to_async` or by the
+async views' database threads on behalf of a request are still seen by
+that request's metrics and N+1 tracking.
+"""
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+_wrappers = ContextVar('execute_wrappers', default=())
+
+
+def dispatch(execute, sql, params, many, context):
+    """Connection execute wrapper running the current context's wrappers"""
+    wrappers = _wrappers.get()
+    # Like Django, the first registered wrapper is the outermost one.
+    for wrapper in reversed(wrappers):
+        execute = functools.partial(wrapper, execute)
+    return execute(sql, params, many, context)
+
+
+@contextmanager
+def execute_wrapper(wrapper):
+    """Apply wrapper to queries on any connection within this context"""
+    token = _wrappers.set(_wrappers.get() + (wrapper,))
+    try:
+        yield wrapper
+    finally:
+        _wrappers.reset(token)
+
+
+@receiver(connection_created)
+def install_dispatch(sender, connection, **kwargs):
+    if dispatch not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, dispatch)
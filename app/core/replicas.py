@@ -0,0 +1,100 @@
+"""routing of read queries to database replicas
+
+ReplicaRoutingMiddleware marks requests with a safe method as replica
+readers; ReplicaRouter then sends their reads to one of the aliases in
+DATABASE_REPLICAS. Everything else (writes, unsafe requests, commands,
+background workers) stays on the primary.
+
+Replicas lag behind the primary, so a client that just wrote is pinned
+to the primary for REPLICA_STICKY_SECONDS: by a cookie for browsers and
+by a cache entry keyed on its auth token for API clients. The cache entry
+only pins across processes when CACHE_BACKEND is a shared cache; with the
+default local-memory cache an API client's next read may land on another
+process and see a replica from before its write.
+"""
+import hashlib
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.authtoken.models import Token
+
+PIN_COOKIE = 'db_primary'
+
+_reads = ContextVar('replica_reads', default=None)
+
+
+def _pin_key(token_key):
+    digest = hashlib.sha256(token_key.encode()).hexdigest()
+    return f'db:pin:{digest}'
+
+
+def request_token(request):
+    """Return the auth token a request carries, if any"""
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    scheme, _sep, key = header.partition(' ')
+    return key.strip() if scheme.lower() == 'token' and key.strip() else None
+
+
+def pin(token_key):
+    """Send reads made with token_key to the primary for a while"""
+    cache.set(_pin_key(token_key), True, settings.REPLICA_STICKY_SECONDS)
+
+
+class ReplicaReads:
+    """Replica routing decision of one request.
+
+    Whether the client is pinned is looked up on the first read, so
+    requests that never read skip the cache.
+    """
+    __slots__ = ('token_key', '_pinned')
+
+    def __init__(self, token_key=None, pinned=None):
+        self.token_key = token_key
+        self._pinned = pinned
+
+    @property
+    def pinned(self):
+        if self._pinned is None:
+            self._pinned = bool(
+                self.token_key and cache.get(_pin_key(self.token_key))
+            )
+        return self._pinned
+
+
+def start_reads(reads):
+    return _reads.set(reads)
+
+
+def end_reads(token):
+    _reads.reset(token)
+
+
+class ReplicaRouter:
+    """Send reads of replica-reading requests to a replica"""
+
+    def db_for_read(self, model, **hints):
+        reads = _reads.get()
+        replicas = settings.DATABASE_REPLICAS
+        if (
+            reads is None
+            or not replicas
+            # Tokens are read right after they are created at login.
+            or model is Token
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+            or reads.pinned
+        ):
+            return None
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
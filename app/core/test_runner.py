@@ -0,0 +1,31 @@
+"""test runner enabling repeated query detection"""
+from django.db import connections
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from core.dbpool import close_pools
+from core.nplusone import RAISE
+
+
+class NPlusOneDiscoverRunner(DiscoverRunner):
+    """Run tests with requests failing on N+1 query patterns"""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._nplusone = override_settings(NPLUSONE_MODE=RAISE)
+        self._nplusone.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._nplusone.disable()
+        super().teardown_test_environment(**kwargs)
+
+    def setup_databases(self, **kwargs):
+        # Connections kept open by server or worker threads would block
+        # dropping the test databases, so none outlive a request.
+        for connection in connections.all():
+            connection.settings_dict['CONN_MAX_AGE'] = 0
+        return super().setup_databases(**kwargs)
+
+    def teardown_databases(self, old_config, **kwargs):
+        close_pools()
+        super().teardown_databases(old_config, **kwargs)
@@ -0,0 +1,90 @@
+"""
+Tests for the coroutine read views
+"""
+import asyncio
+import json
+import threading
+from decimal import Decimal
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, TransactionTestCase, override_settings
+from rest_framework.authtoken.models import Token
+
+from core import async_views, metrics
+from core.models import Recipe
+from core.querywrappers import execute_wrapper
+from recipe.views import RecipeViewSet
+
+
+@override_settings(ASYNC_READ_VIEWS=True)
+class AsyncReadViewTests(TransactionTestCase):
+    """Test serving reads from the database thread pool"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'async@example.com', 'testpass123',
+        )
+        self.token = Token.objects.create(user=self.user)
+        Recipe.objects.create(
+            user=self.user, title='Async soup',
+            time_minutes=5, price=Decimal('2.00'),
+        )
+        self.factory = RequestFactory()
+        self.view = async_views.async_read_view(
+            RecipeViewSet.as_view({'get': 'list', 'post': 'create'})
+        )
+
+    def test_wrapped_view_is_coroutine(self):
+        """Test the wrapper keeps the view's attributes"""
+        self.assertTrue(asyncio.iscoroutinefunction(self.view))
+        self.assertIs(self.view.cls, RecipeViewSet)
+
+    @override_settings(ASYNC_READ_VIEWS=False)
+    def test_disabled_returns_sync_view(self):
+        """Test views stay synchronous unless async reads are on"""
+        view = RecipeViewSet.as_view({'get': 'list'})
+
+        self.assertIs(async_views.async_read_view(view), view)
+
+    def test_list_rendered_on_pool(self):
+        """Test a GET runs and renders on a database thread"""
+        request = self.factory.get(
+            '/api/recipe/recipes/',
+            HTTP_AUTHORIZATION=f'Token {self.token.key}',
+        )
+
+        response = async_to_sync(self.view)(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_rendered)
+        titles = [r['title'] for r in json.loads(response.content)]
+        self.assertEqual(titles, ['Async soup'])
+
+    def test_unauthenticated_rejected(self):
+        """Test token authentication still applies"""
+        request = self.factory.get('/api/recipe/recipes/')
+
+        response = async_to_sync(self.view)(request)
+
+        self.assertEqual(response.status_code, 401)
+
+    def test_run_db_carries_request_context(self):
+        """Test queries on the pool count towards the caller's metrics"""
+        def query():
+            list(Recipe.objects.all())
+            return threading.current_thread().name
+
+        async def handle():
+            request_metrics, token = metrics.start_request()
+            try:
+                with execute_wrapper(request_metrics):
+                    thread = await async_views.run_db(query)
+            finally:
+                metrics.end_request(token)
+            return request_metrics, thread
+
+        request_metrics, thread = async_to_sync(handle)()
+
+        self.assertTrue(thread.startswith('async-db'))
+        self.assertEqual(request_metrics.queries, 1)
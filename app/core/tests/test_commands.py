@@ -3,8 +3,20 @@ from psycopg2 import OperationalError as Psycopg2OpError
 from django.db.utils import OperationalError
 
 
+from decimal import Decimal
+import io
+import json
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
 from django.core.management import call_command
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase
+from PIL import Image
+
+from core.models import ImageBlob, ImportCheckpoint, Recipe, Tags
+from recipe.images import delete_variants
 
 @patch('core.management.commands.wait_for_db.Command.check')
 class CommandTests(SimpleTestCase):
@@ -31,3 +43,187 @@ class CommandTests(SimpleTestCase):
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=['default'])
 
+    @patch('core.dbpool.warm', return_value=3)
+    def test_wait_for_db_warms_pool(self, patched_warm, patched_check):
+        """Test the connection pool is warmed once the database is up."""
+        patched_check.return_value = True
+        out = io.StringIO()
+
+        call_command('wait_for_db', stdout=out)
+
+        patched_warm.assert_called_once_with('default')
+        self.assertIn('Opened 3 pooled connections', out.getvalue())
+
+
+class DedupeRecipeImagesCommandTests(TestCase):
+    """Test moving existing recipe images into the blob store."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123',
+        )
+
+    def _recipe_with_image(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (10, 10), 'purple').save(buffer, format='JPEG')
+        recipe = Recipe.objects.create(
+            user=self.user, title='Recipe', time_minutes=5,
+            price=Decimal('5.00'),
+        )
+        recipe.image.save('photo.jpg', ContentFile(buffer.getvalue()))
+        return recipe
+
+    def test_dedupe_recipe_images(self):
+        """Test identical legacy images end up in a single blob."""
+        r1 = self._recipe_with_image()
+        r2 = self._recipe_with_image()
+        old_names = [r1.image.name, r2.image.name]
+        storage = r1.image.storage
+
+        call_command('dedupe_recipe_images', stdout=io.StringIO())
+
+        r1.refresh_from_db()
+        r2.refresh_from_db()
+        self.addCleanup(storage.delete, r1.image.name)
+        self.assertEqual(r1.image_blob_id, r2.image_blob_id)
+        self.assertEqual(ImageBlob.objects.get().refcount, 2)
+        for name in old_names:
+            self.assertFalse(storage.exists(name))
+
+
+class ImportRecipesCommandTests(TestCase):
+    """Test importing recipes from files."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'importer@example.com', 'testpass123',
+        )
+
+    def _write(self, suffix, content):
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def _ndjson(self, count):
+        return ''.join(
+            json.dumps({
+                'title': f'Recipe {i}',
+                'time_minutes': 10,
+                'price': '2.50',
+                'tags': [{'name': 'Dinner'}],
+                'ingredients': [{'name': 'Salt'}, {'name': f'Spice {i}'}],
+            }) + '\n'
+            for i in range(count)
+        )
+
+    def test_import_ndjson(self):
+        """Test importing recipes with nested tags and ingredients."""
+        path = self._write('.ndjson', self._ndjson(5))
+
+        call_command(
+            'import_recipes', self.user.email, path, '--batch-size', '2',
+            '--no-copy', stdout=io.StringIO(),
+        )
+
+        recipes = Recipe.objects.filter(user=self.user)
+        self.assertEqual(recipes.count(), 5)
+        self.assertEqual(recipes.get(title='Recipe 3').ingredients.count(), 2)
+        self.assertEqual(ImportCheckpoint.objects.get().rows, 5)
+
+    def test_import_csv_skips_invalid_rows(self):
+        """Test invalid CSV rows are reported and the rest imported."""
+        path = self._write('.csv', (
+            'title,time_minutes,price,tags,ingredients\n'
+            'Soup,20,3.00,Dinner|Vegan,Water\n'
+            'Broken,not-a-number,3.00,,\n'
+        ))
+        stderr = io.StringIO()
+
+        call_command(
+            'import_recipes', self.user.email, path, '--no-copy',
+            stdout=io.StringIO(), stderr=stderr,
+        )
+
+        recipe = Recipe.objects.get(user=self.user)
+        self.assertEqual(recipe.tags.count(), 2)
+        self.assertIn('time_minutes', stderr.getvalue())
+
+    def test_import_resumes_from_checkpoint(self):
+        """Test a second run only imports rows after the checkpoint."""
+        path = self._write('.ndjson', self._ndjson(3))
+        call_command(
+            'import_recipes', self.user.email, path, '--no-copy',
+            stdout=io.StringIO(),
+        )
+        with open(path, 'a') as f:
+            f.write(json.dumps({
+                'title': 'Late recipe', 'time_minutes': 5, 'price': '1.00',
+            }) + '\n')
+
+        call_command(
+            'import_recipes', self.user.email, path, '--no-copy',
+            stdout=io.StringIO(),
+        )
+
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 4)
+        self.assertEqual(ImportCheckpoint.objects.get().rows, 4)
+
+
+class RecalculateCountsCommandTests(TestCase):
+    """Test repairing tag and ingredient recipe counts."""
+
+    def test_recalculate_counts_fixes_drift(self):
+        """Test drifted counts are rewritten from the recipe links"""
+        user = get_user_model().objects.create_user(
+            'counts@example.com', 'testpass123',
+        )
+        tag = Tags.objects.create(user=user, name='Vegan')
+        recipe = Recipe.objects.create(
+            user=user, title='Salad', time_minutes=5, price=Decimal('3.00'),
+        )
+        recipe.tags.add(tag)
+        Tags.objects.filter(pk=tag.pk).update(recipe_count=7)
+        out = io.StringIO()
+
+        call_command('recalculate_counts', stdout=out)
+
+        tag.refresh_from_db()
+        self.assertEqual(tag.recipe_count, 1)
+        self.assertIn('tags: checked 1, fixed 1', out.getvalue())
+
+
+class ProcessPendingImagesCommandTests(TestCase):
+    """Test processing recipe images left pending by a restart."""
+
+    def _recipe_with_image(self, user, image_status):
+        buffer = io.BytesIO()
+        Image.new('RGB', (10, 10), 'purple').save(buffer, format='JPEG')
+        recipe = Recipe.objects.create(
+            user=user, title='Recipe', time_minutes=5, price=Decimal('5.00'),
+            image_status=image_status,
+        )
+        recipe.image.save('photo.jpg', ContentFile(buffer.getvalue()))
+        self.addCleanup(recipe.image.delete, save=False)
+        return recipe
+
+    def test_process_pending_images(self):
+        """Test pending and unprocessed recipe images are marked ready"""
+        user = get_user_model().objects.create_user(
+            'pending@example.com', 'testpass123',
+        )
+        recipes = [
+            self._recipe_with_image(user, Recipe.IMAGE_PENDING),
+            self._recipe_with_image(user, ''),
+        ]
+        out = io.StringIO()
+
+        call_command('process_pending_images', '--older-than=0', stdout=out)
+
+        for recipe in recipes:
+            recipe.refresh_from_db()
+            self.addCleanup(delete_variants, recipe)
+            self.assertEqual(recipe.image_status, Recipe.IMAGE_READY)
+            self.assertIn('original', recipe.image_variants)
+        self.assertIn('Processed 2 pending images, 0 failed', out.getvalue())
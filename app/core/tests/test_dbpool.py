@@ -0,0 +1,124 @@
+"""
+Tests for database connection pooling
+"""
+import threading
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from core import dbpool
+
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Test handing out and taking back connections"""
+
+    def setUp(self):
+        self.opened = []
+
+    def connect(self):
+        conn = FakeConnection(len(self.opened))
+        self.opened.append(conn)
+        return conn
+
+    def test_released_connection_reused(self):
+        """Test a released connection is handed out again"""
+        pool = dbpool.ConnectionPool(self.connect, size=2, timeout=1)
+
+        conn = pool.acquire()
+        pool.release(conn)
+
+        self.assertIs(pool.acquire(), conn)
+        self.assertEqual(len(self.opened), 1)
+        self.assertEqual(pool.in_use, 1)
+
+    def test_full_pool_times_out(self):
+        """Test acquiring beyond the size waits and then gives up"""
+        pool = dbpool.ConnectionPool(self.connect, size=1, timeout=0.05)
+        pool.acquire()
+
+        with self.assertRaises(dbpool.PoolTimeout):
+            pool.acquire()
+
+        self.assertEqual(pool.waits, 1)
+        self.assertEqual(pool.timeouts, 1)
+
+    def test_waiter_gets_released_connection(self):
+        """Test a waiting thread takes over a connection once released"""
+        pool = dbpool.ConnectionPool(self.connect, size=1, timeout=5)
+        conn = pool.acquire()
+        acquired = []
+        waiter = threading.Thread(
+            target=lambda: acquired.append(pool.acquire()),
+        )
+        waiter.start()
+
+        pool.release(conn)
+        waiter.join(5)
+
+        self.assertEqual(acquired, [conn])
+        self.assertEqual(len(self.opened), 1)
+
+    def test_broken_connection_replaced(self):
+        """Test idle connections failing the check are closed and replaced"""
+        pool = dbpool.ConnectionPool(
+            self.connect, size=1, timeout=1, check=lambda conn: False,
+        )
+        conn = pool.acquire()
+        pool.release(conn)
+
+        replacement = pool.acquire()
+
+        self.assertTrue(conn.closed)
+        self.assertIsNot(replacement, conn)
+        self.assertEqual(pool.discarded, 1)
+
+    def test_unreusable_release_frees_slot(self):
+        """Test releasing a broken connection closes it and frees its slot"""
+        pool = dbpool.ConnectionPool(self.connect, size=1, timeout=0.05)
+        conn = pool.acquire()
+
+        pool.release(conn, reusable=False)
+
+        self.assertTrue(conn.closed)
+        self.assertEqual((pool.in_use, pool.idle), (0, 0))
+        pool.acquire()
+
+    def test_failed_connect_frees_slot(self):
+        """Test a connect error does not leak a slot"""
+        def connect():
+            raise OSError('refused')
+        pool = dbpool.ConnectionPool(connect, size=1, timeout=0.05)
+
+        with self.assertRaises(OSError):
+            pool.acquire()
+
+        self.assertEqual(pool.in_use, 0)
+
+    def test_warm(self):
+        """Test warming opens idle connections up to the pool size"""
+        pool = dbpool.ConnectionPool(self.connect, size=3, timeout=1)
+        pool.acquire()
+
+        self.assertEqual(pool.warm(5), 2)
+        self.assertEqual((pool.in_use, pool.idle), (1, 2))
+
+    def test_render(self):
+        """Test pool usage is exposed per alias"""
+        pool = dbpool.ConnectionPool(self.connect, size=4, timeout=1)
+        pool.acquire()
+
+        with patch.dict(dbpool._pools, {'default': pool}, clear=True):
+            text = dbpool.render()
+
+        self.assertIn('db_pool_size{alias="default"} 4', text)
+        self.assertIn('db_pool_connections_in_use{alias="default"} 1', text)
+        self.assertIn('db_pool_wait_seconds_count{alias="default"} 1', text)
@@ -0,0 +1,110 @@
+"""
+Tests for request metrics
+"""
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import metrics
+
+METRICS_URL = reverse('metrics')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class RegistryTests(TestCase):
+    """Test aggregating and rendering histograms"""
+
+    def test_render_cumulative_buckets(self):
+        """Test buckets are cumulative and carry sum and count"""
+        registry = metrics.Registry()
+        labels = ('recipe:recipe-list', 'GET', '2xx')
+        registry.record(labels, (0.003, 2, 0.001, None, 150))
+        registry.record(labels, (0.3, 5, 0.2, None, 50))
+
+        text = registry.render()
+
+        self.assertIn(
+            'http_request_duration_seconds_bucket{view="recipe:recipe-list",'
+            'method="GET",status="2xx",le="0.005"} 1',
+            text,
+        )
+        self.assertIn(
+            'http_request_duration_seconds_bucket{view="recipe:recipe-list",'
+            'method="GET",status="2xx",le="+Inf"} 2',
+            text,
+        )
+        self.assertIn(
+            'http_request_db_queries_sum{view="recipe:recipe-list",'
+            'method="GET",status="2xx"} 7',
+            text,
+        )
+        self.assertNotIn(
+            'http_request_serializer_duration_seconds_count', text,
+        )
+
+
+@override_settings(METRICS_TOKEN='secret')
+class MetricsMiddlewareTests(TestCase):
+    """Test requests are recorded and exposed on /metrics"""
+
+    def setUp(self):
+        metrics.registry.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'metrics@example.com', 'testpass123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def scrape(self):
+        return self.client.get(
+            METRICS_URL, HTTP_AUTHORIZATION='Bearer secret',
+        ).content.decode()
+
+    def test_request_recorded_by_route_name(self):
+        """Test a request is recorded under its view name with DB time"""
+        self.client.get(RECIPES_URL)
+
+        text = self.scrape()
+
+        labels = 'view="recipe:recipe-list",method="GET",status="2xx"'
+        self.assertIn(
+            f'http_request_duration_seconds_count{{{labels}}} 1', text,
+        )
+        self.assertIn(f'http_request_db_queries_count{{{labels}}} 1', text)
+        self.assertIn(
+            f'http_request_serializer_duration_seconds_count{{{labels}}} 1',
+            text,
+        )
+        self.assertIn(f'http_response_size_bytes_count{{{labels}}} 1', text)
+
+    def test_token_cache_counters_exposed(self):
+        """Test the token cache hit and miss counters are scraped"""
+        text = self.scrape()
+
+        for name in ('local_hits', 'shared_hits', 'misses'):
+            self.assertIn(f'# TYPE token_cache_{name}_total counter', text)
+
+    def test_unresolved_requests_grouped(self):
+        """Test unknown URLs share one label instead of their path"""
+        self.client.get('/no/such/path/')
+
+        text = self.scrape()
+
+        self.assertIn('view="unresolved",method="GET",status="4xx"', text)
+        self.assertNotIn('/no/such/path/', text)
+
+    def test_metrics_token_required(self):
+        """Test /metrics checks the bearer token when one is configured"""
+        res = self.client.get(METRICS_URL)
+        self.assertEqual(res.status_code, 403)
+
+        res = self.client.get(METRICS_URL, HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(res.status_code, 200)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_metrics_closed_without_token(self):
+        """Test /metrics refuses scrapers while no token is configured"""
+        res = self.client.get(METRICS_URL, HTTP_AUTHORIZATION='Bearer ')
+
+        self.assertEqual(res.status_code, 403)
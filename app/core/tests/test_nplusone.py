@@ -0,0 +1,87 @@
+"""
+Tests for repeated query detection
+"""
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import nplusone
+from core.models import Recipe, Tags
+from recipe.serializers import RecipeSerializer
+
+
+class FingerprintTests(SimpleTestCase):
+    """Test normalizing SQL into fingerprints"""
+
+    def test_literals_folded(self):
+        """Test string and number literals do not change the fingerprint"""
+        first = "SELECT * FROM t WHERE a = 'x' AND b = 12"
+        second = "SELECT * FROM t  WHERE a = 'y''z' AND b = 3"
+        self.assertEqual(
+            nplusone.fingerprint(first), nplusone.fingerprint(second),
+        )
+
+    def test_placeholder_lists_folded(self):
+        """Test IN lists of any length share a fingerprint"""
+        self.assertEqual(
+            nplusone.fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s)'),
+            nplusone.fingerprint('SELECT * FROM t WHERE id IN (%s)'),
+        )
+
+
+class DetectRepeatedQueriesTests(TestCase):
+    """Test flagging N+1 query patterns"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'nplusone@example.com', 'testpass123',
+        )
+        tag = Tags.objects.create(user=self.user, name='Vegan')
+        for i in range(4):
+            recipe = Recipe.objects.create(
+                user=self.user, title=f'Recipe {i}',
+                time_minutes=5, price=Decimal('2.00'),
+            )
+            recipe.tags.add(tag)
+
+    def _serialize(self, queryset):
+        return RecipeSerializer(queryset, many=True).data
+
+    def test_nested_serializer_without_prefetch_raises(self):
+        """Test nested relations loaded per recipe are reported"""
+        with self.assertRaises(nplusone.NPlusOneError) as cm:
+            with nplusone.detect_repeated_queries(
+                'serialize', threshold=2, mode=nplusone.RAISE,
+            ):
+                self._serialize(Recipe.objects.all())
+
+        self.assertIn('core_tags', str(cm.exception))
+        self.assertIn('test_nplusone.py', str(cm.exception))
+
+    def test_prefetched_serializer_passes(self):
+        """Test prefetching keeps every query unique"""
+        queryset = Recipe.objects.prefetch_related('tags', 'ingredients')
+        with nplusone.detect_repeated_queries(
+            'serialize', threshold=2, mode=nplusone.RAISE,
+        ):
+            self._serialize(queryset)
+
+    def test_log_mode_logs(self):
+        """Test repeats are logged instead of raised in log mode"""
+        with self.assertLogs('core.nplusone', level='WARNING'):
+            with nplusone.detect_repeated_queries(
+                'serialize', threshold=2, mode=nplusone.LOG,
+            ):
+                self._serialize(Recipe.objects.all())
+
+    @override_settings(NPLUSONE_MODE=nplusone.RAISE, NPLUSONE_THRESHOLD=0)
+    def test_requests_checked(self):
+        """Test the middleware checks queries run by a request"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        with self.assertRaises(nplusone.NPlusOneError):
+            client.get(reverse('recipe:recipe-list'))
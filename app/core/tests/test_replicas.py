@@ -0,0 +1,172 @@
+"""
+Tests for read replica routing
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections
+from django.test import (
+    SimpleTestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import replicas
+from core.models import Recipe
+
+RECIPES_URL = reverse('recipe:recipe-list')
+# Not 'replica', which DB_REPLICA_HOST may already define as a mirror.
+REPLICA = 'lagging_replica'
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTests(SimpleTestCase):
+    """Test picking a database for reads"""
+
+    def setUp(self):
+        self.router = replicas.ReplicaRouter()
+
+    def read_db(self, reads, model=Recipe):
+        token = replicas.start_reads(reads)
+        try:
+            return self.router.db_for_read(model)
+        finally:
+            replicas.end_reads(token)
+
+    def test_safe_request_reads_replica(self):
+        """Test reads of a replica-reading request go to a replica"""
+        reads = replicas.ReplicaReads(pinned=False)
+
+        self.assertEqual(self.read_db(reads), 'replica')
+
+    def test_outside_request_reads_primary(self):
+        """Test reads outside replica-reading requests stay on the primary"""
+        self.assertIsNone(self.read_db(None))
+
+    def test_pinned_client_reads_primary(self):
+        """Test a client that just wrote reads from the primary"""
+        self.assertIsNone(self.read_db(replicas.ReplicaReads(pinned=True)))
+
+    def test_tokens_read_from_primary(self):
+        """Test token lookups never wait for replication"""
+        reads = replicas.ReplicaReads(pinned=False)
+
+        self.assertIsNone(self.read_db(reads, model=Token))
+
+    def test_writes_go_to_primary(self):
+        """Test writes are routed to the primary"""
+        self.assertEqual(self.router.db_for_write(Recipe), 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        """Test reads stay on the primary without replicas"""
+        self.assertIsNone(self.read_db(replicas.ReplicaReads(pinned=False)))
+
+
+def _add_replica_database():
+    """Create a separate SQLite database standing in for a replica"""
+    settings.DATABASES[REPLICA] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    }
+    connections.ensure_defaults(REPLICA)
+    connections.prepare_test_settings(REPLICA)
+    # Migrating relates rows cached from the primary to the new database.
+    with override_settings(DATABASE_REPLICAS=[REPLICA]):
+        connections[REPLICA].creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False,
+        )
+
+
+def _remove_replica_database():
+    connections[REPLICA].creation.destroy_test_db(':memory:', verbosity=0)
+    del connections[REPLICA]
+    del settings.DATABASES[REPLICA]
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class ReplicaRoutingRequestTests(TransactionTestCase):
+    """Test requests against a primary and a separate replica database"""
+    # Not TestCase: reads inside a transaction stay on the primary.
+
+    @classmethod
+    def setUpClass(cls):
+        # The alias only exists once created here, so it is not declared
+        # on the class where the runner would check it up front.
+        _add_replica_database()
+        cls.databases = {'default', REPLICA}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        _remove_replica_database()
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            'replica@example.com', 'testpass123',
+        )
+        self.token = Token.objects.create(user=self.user)
+        # The replica has the user but lags behind on recipes.
+        get_user_model().objects.using(REPLICA).create(
+            id=self.user.id,
+            email=self.user.email,
+            password=self.user.password,
+        )
+        Recipe.objects.create(
+            user=self.user, title='Primary soup',
+            time_minutes=5, price=Decimal('2.00'),
+        )
+        Recipe.objects.using(REPLICA).create(
+            user_id=self.user.id, title='Replica soup',
+            time_minutes=5, price=Decimal('2.00'),
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def titles(self, res):
+        return [recipe['title'] for recipe in res.data]
+
+    def test_get_reads_replica(self):
+        """Test a GET is answered from the replica"""
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(self.titles(res), ['Replica soup'])
+
+    def test_write_pins_client_to_primary(self):
+        """Test a client reads its own write after a POST"""
+        res = self.client.post(RECIPES_URL, {
+            'title': 'New soup', 'time_minutes': 5, 'price': '3.00',
+        }, format='json')
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(Recipe.objects.filter(title='New soup').count(), 1)
+        self.assertFalse(
+            Recipe.objects.using(REPLICA).filter(title='New soup').exists()
+        )
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertIn('New soup', self.titles(res))
+
+    def test_pin_cookie_reads_primary(self):
+        """Test a browser carrying the pin cookie reads from the primary"""
+        self.client.cookies[replicas.PIN_COOKIE] = '1'
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(self.titles(res), ['Primary soup'])
+
+    def test_failed_write_does_not_pin(self):
+        """Test a rejected write leaves reads on the replica"""
+        res = self.client.post(RECIPES_URL, {'title': ''}, format='json')
+        self.assertEqual(res.status_code, 400)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(self.titles(res), ['Replica soup'])
@@ -0,0 +1,29 @@
+"""views for operating the service"""
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+
+from core import dbpool
+from core.metrics import registry
+from user import authentication
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+@require_GET
+def metrics_view(request):
+    """Expose request, connection pool and token cache metrics of this
+    process for Prometheus.
+
+    Scrapers must send METRICS_TOKEN as a bearer token; without a token
+    configured the endpoint refuses every request.
+    """
+    token = settings.METRICS_TOKEN
+    given = request.META.get('HTTP_AUTHORIZATION', '')
+    if not token or not constant_time_compare(given, f'Bearer {token}'):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        registry.render() + dbpool.render() + authentication.render(),
+        content_type=PROMETHEUS_CONTENT_TYPE,
+    )
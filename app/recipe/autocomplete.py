@@ -0,0 +1,83 @@
+"""prefix autocomplete for tag and ingredient names"""
+import bisect
+import heapq
+
+from django.conf import settings
+from django.db.models import F
+
+from recipe.cache import get_generation
+from user.authentication import LRUCache
+
+# Sorts after every character, closing the range of keys sharing a prefix
+_MAX_CHAR = chr(0x10FFFF)
+
+_indexes = LRUCache(
+    settings.AUTOCOMPLETE_INDEX_SIZE, settings.AUTOCOMPLETE_INDEX_TTL,
+)
+
+
+class PrefixIndex:
+    """Sorted array of one user's names, searched by binary search"""
+
+    def __init__(self, rows):
+        self.entries = sorted(
+            (name.casefold(), -usage, name, pk) for pk, name, usage in rows
+        )
+        self.keys = [entry[0] for entry in self.entries]
+
+    def search(self, prefix, limit):
+        """Return the limit most used names starting with prefix"""
+        prefix = prefix.casefold()
+        start = bisect.bisect_left(self.keys, prefix)
+        end = bisect.bisect_left(self.keys, prefix + _MAX_CHAR, start)
+        matches = heapq.nsmallest(
+            limit, self.entries[start:end], key=lambda e: (e[1], e[0]),
+        )
+        return [
+            {'id': pk, 'name': name, 'usage': -usage}
+            for _key, usage, name, pk in matches
+        ]
+
+
+def _usage(model, user_id):
+    return model.objects.filter(user_id=user_id).annotate(
+        usage=F('recipe_count'),
+    )
+
+
+def get_index(model, user_id):
+    """Return the user's prefix index for model, or None if it is too big.
+
+    Indexes are kept per process and rebuilt with one query once the
+    user's cache generation moves, which every tag, ingredient and recipe
+    link write does.
+    """
+    key = (model._meta.label, user_id)
+    generation = get_generation(user_id)
+    cached = _indexes.get(key)
+    if cached is not None and cached[0] == generation:
+        return cached[1]
+
+    limit = settings.AUTOCOMPLETE_INDEX_MAX_NAMES
+    rows = list(
+        _usage(model, user_id).values_list('id', 'name', 'usage')[:limit + 1]
+    )
+    index = PrefixIndex(rows) if len(rows) <= limit else None
+    _indexes.set(key, (generation, index))
+    return index
+
+
+def autocomplete(model, user_id, prefix, limit):
+    """Return up to limit of the user's names starting with prefix.
+
+    Names are matched case-insensitively and ordered by the number of
+    recipes using them. Users with more names than fit the in-memory index
+    are answered from the (user, UPPER(name)) prefix index instead.
+    """
+    index = get_index(model, user_id)
+    if index is not None:
+        return index.search(prefix, limit)
+    return list(
+        _usage(model, user_id).filter(name__istartswith=prefix)
+        .order_by('-usage', 'name').values('id', 'name', 'usage')[:limit]
+    )
@@ -0,0 +1,91 @@
+"""conditional GET (ETag / Last-Modified) support for recipe APIs"""
+import hashlib
+
+from django.db.models import Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from recipe.cache import get_generation
+
+
+def make_etag(*parts):
+    """Return a strong ETag for the given version parts"""
+    digest = hashlib.md5(':'.join(str(p) for p in parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def not_modified_response(request, etag, last_modified=None):
+    """Return a 304 response if the request's validators still match"""
+    # HTTP dates have whole-second precision
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    return get_conditional_response(
+        request._request, etag=etag, last_modified=timestamp,
+    )
+
+
+def set_validators(response, etag, last_modified=None):
+    """Add the ETag and Last-Modified headers to a response"""
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    return response
+
+
+class ConditionalListMixin:
+    """Answer unchanged list requests with 304 Not Modified.
+
+    Validators come from one Max(updated_at) aggregate over the filtered
+    queryset, so the unchanged path never serializes anything. The ETag also
+    covers the user's cache generation, which every write bumps, so it
+    changes on deletions while Last-Modified does not; lists therefore only
+    honour If-None-Match.
+    """
+
+    def get_list_validators(self, request):
+        """Return (etag, last_modified) for the list being requested"""
+        queryset = self.filter_queryset(self.get_queryset())
+        last_modified = queryset.prefetch_related(None).order_by().aggregate(
+            last_modified=Max('updated_at'),
+        )['last_modified']
+        etag = make_etag(
+            self.basename,
+            request.user.id,
+            get_generation(request.user.id),
+            request.get_full_path(),
+            last_modified and last_modified.isoformat(),
+        )
+        return etag, last_modified
+
+    def list(self, request, *args, **kwargs):
+        etag, last_modified = self.get_list_validators(request)
+        response = not_modified_response(request, etag)
+        if response is None:
+            response = super().list(request, *args, **kwargs)
+        return set_validators(response, etag, last_modified)
+
+
+class ConditionalRetrieveMixin:
+    """Answer unchanged retrieve requests with 304 Not Modified"""
+
+    def get_object_validators(self, request, pk):
+        """Return (etag, last_modified) for one object, or None if missing"""
+        try:
+            updated_at = self.get_queryset().prefetch_related(None).filter(
+                pk=pk,
+            ).values_list('updated_at', flat=True).first()
+        except ValueError:
+            return None
+        if updated_at is None:
+            return None
+        etag = make_etag(self.basename, pk, updated_at.isoformat())
+        return etag, updated_at
+
+    def retrieve(self, request, *args, **kwargs):
+        validators = self.get_object_validators(request, kwargs.get('pk'))
+        if validators is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        response = not_modified_response(request, *validators)
+        if response is None:
+            response = super().retrieve(request, *args, **kwargs)
+        return set_validators(response, *validators)
@@ -0,0 +1,25 @@
+"""recipe_count bookkeeping for tags and ingredients"""
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from core.models import Recipe, Tags, Ingredient
+
+COUNTED_FIELDS = (('tags', Tags), ('ingredients', Ingredient))
+
+
+def link_count(field_name):
+    """Number of recipes linked to the outer tag or ingredient"""
+    field = Recipe._meta.get_field(field_name)
+    target = f'{field.m2m_reverse_field_name()}_id'
+    links = field.remote_field.through.objects.filter(
+        **{target: OuterRef('pk')}
+    ).values(target).annotate(n=Count('id')).values('n')
+    return Coalesce(Subquery(links), Value(0))
+
+
+def recalculate_counts(field_name, model, pks):
+    """Rewrite recipe_count where it drifted, returning the rows fixed"""
+    count = link_count(field_name)
+    return model.objects.filter(pk__in=pks).annotate(
+        actual=count,
+    ).exclude(recipe_count=F('actual')).update(recipe_count=count)
@@ -0,0 +1,97 @@
+"""streaming export of a user's recipe library"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch, prefetch_related_objects
+
+from core.models import Recipe, Tags, Ingredient
+
+NDJSON = 'ndjson'
+CSV = 'csv'
+FORMATS = {
+    NDJSON: 'application/x-ndjson',
+    CSV: 'text/csv',
+}
+FIELDS = [
+    'id', 'title', 'description', 'time_minutes', 'price', 'link',
+    'tags', 'ingredients',
+]
+# Separates tag and ingredient names inside a CSV cell
+CSV_LIST_SEPARATOR = '|'
+
+
+def _rows(batch):
+    """Yield export rows for a batch of recipes, prefetching in bulk"""
+    prefetch_related_objects(
+        batch,
+        Prefetch('tags', queryset=Tags.objects.only('id', 'name')),
+        Prefetch(
+            'ingredients', queryset=Ingredient.objects.only('id', 'name'),
+        ),
+    )
+    for recipe in batch:
+        yield {
+            'id': recipe.id,
+            'title': recipe.title,
+            'description': recipe.description,
+            'time_minutes': recipe.time_minutes,
+            'price': recipe.price,
+            'link': recipe.link,
+            'tags': [{'id': t.id, 'name': t.name} for t in recipe.tags.all()],
+            'ingredients': [
+                {'id': i.id, 'name': i.name} for i in recipe.ingredients.all()
+            ],
+        }
+
+
+def iter_recipe_rows(user, chunk_size=1000):
+    """Yield every recipe of a user as a dict, oldest first.
+
+    Recipes are read through a server-side cursor and their tags and
+    ingredients are prefetched one chunk at a time, so memory use depends on
+    chunk_size rather than on the size of the library.
+    """
+    queryset = Recipe.objects.filter(user=user).order_by('id').only(
+        'id', 'title', 'description', 'time_minutes', 'price', 'link',
+    )
+    batch = []
+    for recipe in queryset.iterator(chunk_size=chunk_size):
+        batch.append(recipe)
+        if len(batch) >= chunk_size:
+            yield from _rows(batch)
+            batch = []
+    if batch:
+        yield from _rows(batch)
+
+
+def render_ndjson(rows):
+    """Yield one JSON document per line"""
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+class _Echo:
+    """File-like object handing back what csv.writer writes to it"""
+
+    def write(self, value):
+        return value
+
+
+def render_csv(rows):
+    """Yield CSV lines, joining tag and ingredient names in one cell"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(FIELDS)
+    for row in rows:
+        for field_name in ('tags', 'ingredients'):
+            row[field_name] = CSV_LIST_SEPARATOR.join(
+                item['name'] for item in row[field_name]
+            )
+        yield writer.writerow([row[field] for field in FIELDS])
+
+
+def render(rows, output):
+    """Return an iterator of text chunks in the given output format"""
+    if output == CSV:
+        return render_csv(rows)
+    return render_ndjson(rows)
@@ -0,0 +1,301 @@
+"""storage and background processing of uploaded recipe images"""
+import hashlib
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.db.models.fields.files import FieldFile
+from PIL import Image, ImageOps, JpegImagePlugin
+
+from core.models import ImageBlob, Recipe, image_blob_file_path
+from recipe.uploads import StoredUploadedFile
+
+logger = logging.getLogger(__name__)
+
+# name -> (max width/height, Pillow format, file extension)
+VARIANTS = {
+    'thumbnail': (150, 'JPEG', '.jpg'),
+    'thumbnail_webp': (150, 'WEBP', '.webp'),
+    'medium': (800, 'JPEG', '.jpg'),
+    'medium_webp': (800, 'WEBP', '.webp'),
+}
+
+# image_variants key of the EXIF-stripped copy of an original
+ORIGINAL = 'original'
+
+# Storage directory of the derived images, the only ones served publicly
+VARIANTS_DIR = 'uploads/recipe/variants/'
+
+_executor = None
+
+
+def get_executor():
+    """Return the shared worker pool, creating it on first use"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_PROCESSING_WORKERS,
+            thread_name_prefix='recipe-image',
+        )
+    return _executor
+
+
+def variant_path(image_name, variant):
+    """Return the storage path of a derived image"""
+    stem, ext = os.path.splitext(os.path.basename(image_name))
+    if variant != ORIGINAL:
+        ext = VARIANTS[variant][2]
+    return os.path.join(VARIANTS_DIR, f'{stem}_{variant}{ext}')
+
+
+def _encode(image, size, image_format):
+    """Return the image scaled to fit size, encoded without metadata"""
+    variant = image.copy()
+    variant.thumbnail((size, size), Image.LANCZOS)
+    if image_format == 'JPEG' and variant.mode != 'RGB':
+        variant = variant.convert('RGB')
+    buffer = io.BytesIO()
+    variant.save(buffer, format=image_format, quality=85)
+    return buffer.getvalue()
+
+
+def _can_encode(image_format):
+    """Return whether Pillow was built with an encoder for the format"""
+    Image.init()
+    return image_format in Image.SAVE
+
+
+def _original_options(source):
+    """Return save options re-encoding the original at its own quality"""
+    options = {}
+    if source.info.get('icc_profile'):
+        options['icc_profile'] = source.info['icc_profile']
+    if source.format == 'JPEG':
+        options['qtables'] = source.quantization
+        options['subsampling'] = JpegImagePlugin.get_sampling(source)
+    return options
+
+
+def _write(storage, name, content):
+    """Write content at name, replacing any old file; return the stored name"""
+    if storage.exists(name):
+        storage.delete(name)
+    return storage.save(name, ContentFile(content))
+
+
+def process_recipe_image(recipe_id):
+    """Strip EXIF from a recipe image and write its derived sizes"""
+    recipe = Recipe.objects.filter(pk=recipe_id).first()
+    if recipe is None or not recipe.image:
+        return
+
+    storage = recipe.image.storage
+    name = recipe.image.name
+    try:
+        with storage.open(name, 'rb') as f:
+            source = Image.open(f)
+            image_format = source.format
+            has_exif = bool(source.getexif())
+            options = _original_options(source)
+            image = ImageOps.exif_transpose(source)
+            image.load()
+        image.info = {}
+
+        # Serve a copy without EXIF, keeping its quantization so it loses
+        # next to nothing. The upload itself stays as stored and is never
+        # served: it may be a blob shared with other recipes and named after
+        # its content hash.
+        if has_exif:
+            buffer = io.BytesIO()
+            original = image
+            if image_format == 'JPEG' and original.mode != 'RGB':
+                original = original.convert('RGB')
+            original.save(buffer, format=image_format, **options)
+            content = buffer.getvalue()
+        else:
+            with storage.open(name, 'rb') as f:
+                content = f.read()
+        variants = {
+            ORIGINAL: _write(storage, variant_path(name, ORIGINAL), content),
+        }
+        for variant, (size, variant_format, _ext) in VARIANTS.items():
+            # Pillow may be built without WebP support (e.g. on alpine).
+            if not _can_encode(variant_format):
+                continue
+            variants[variant] = _write(
+                storage,
+                variant_path(name, variant),
+                _encode(image, size, variant_format),
+            )
+    except Exception:
+        # Anything left uncaught would keep the recipe pending for good.
+        logger.exception('Processing image for recipe %s failed', recipe_id)
+        recipe.image_status = Recipe.IMAGE_FAILED
+        recipe.image_variants = {}
+    else:
+        recipe.image_status = Recipe.IMAGE_READY
+        recipe.image_variants = variants
+
+    # The image may have been replaced while this one was processed.
+    if Recipe.objects.filter(pk=recipe_id, image=name).exists():
+        recipe.save(
+            update_fields=['image_status', 'image_variants', 'updated_at'],
+        )
+
+
+def _run_in_worker(recipe_id):
+    try:
+        process_recipe_image(recipe_id)
+    except Exception:
+        logger.exception('Processing image for recipe %s failed', recipe_id)
+    finally:
+        close_old_connections()
+
+
+def delete_variants(recipe):
+    """Remove the derived images of a recipe from storage"""
+    storage = recipe.image.storage
+    for path in recipe.image_variants.values():
+        storage.delete(path)
+
+
+def served_image(recipe):
+    """Return the EXIF-stripped copy of the recipe's image, once ready"""
+    if recipe.image_status != Recipe.IMAGE_READY:
+        return None
+    path = recipe.image_variants.get(ORIGINAL)
+    if path is None:
+        return None
+    return FieldFile(recipe, recipe.image.field, path)
+
+
+def variant_urls(recipe, request=None):
+    """Return the URLs of a recipe's derived images once they are ready"""
+    if recipe.image_status != Recipe.IMAGE_READY:
+        return {}
+    storage = recipe.image.storage
+    urls = {}
+    for variant, path in recipe.image_variants.items():
+        url = storage.url(path)
+        urls[variant] = request.build_absolute_uri(url) if request else url
+    return urls
+
+
+def reuse_ready_variants(recipe):
+    """Copy the variants of another recipe sharing the image, if any"""
+    variants = Recipe.objects.filter(
+        image=recipe.image.name,
+        image_status=Recipe.IMAGE_READY,
+    ).exclude(pk=recipe.pk).values_list('image_variants', flat=True).first()
+    if variants is None:
+        return False
+
+    recipe.image_status = Recipe.IMAGE_READY
+    recipe.image_variants = variants
+    recipe.save(update_fields=['image_status', 'image_variants', 'updated_at'])
+    return True
+
+
+def schedule_processing(recipe):
+    """Queue a recipe image for processing once the upload commits.
+
+    With IMAGE_PROCESSING_ASYNC off the image is processed inline, which
+    the test suite relies on.
+    """
+    if recipe.image_blob_id and reuse_ready_variants(recipe):
+        return
+    if not settings.IMAGE_PROCESSING_ASYNC:
+        process_recipe_image(recipe.id)
+        recipe.refresh_from_db(fields=['image_status', 'image_variants'])
+        return
+
+    recipe_id = recipe.id
+    transaction.on_commit(
+        lambda: get_executor().submit(_run_in_worker, recipe_id)
+    )
+
+
+def _content_hash(upload):
+    content_hash = getattr(upload, 'content_hash', None)
+    if content_hash:
+        return content_hash
+    hasher = hashlib.sha256()
+    for chunk in upload.chunks():
+        hasher.update(chunk)
+    upload.seek(0)
+    return hasher.hexdigest()
+
+
+def _place(storage, upload, name):
+    """Put the upload's content at name, moving streamed uploads"""
+    if isinstance(upload, StoredUploadedFile):
+        path = storage.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(storage.path(upload.storage_name), path)
+        upload.storage_name = None
+        return name
+    if storage.exists(name):
+        storage.delete(name)
+    return storage.save(name, upload)
+
+
+def store_image_blob(upload):
+    """Return the blob holding the upload's content and take a reference.
+
+    The first upload of some content becomes its blob; later uploads of the
+    same content are discarded and share that blob instead.
+    """
+    storage = Recipe._meta.get_field('image').storage
+    content_hash = _content_hash(upload)
+    with transaction.atomic():
+        blob, created = ImageBlob.objects.select_for_update().get_or_create(
+            sha256=content_hash,
+            defaults={
+                'name': image_blob_file_path(content_hash, upload.name),
+                'size': upload.size,
+            },
+        )
+        if created or not storage.exists(blob.name):
+            name = _place(storage, upload, blob.name)
+            if name != blob.name:
+                blob.name = name
+                blob.save(update_fields=['name'])
+        ImageBlob.objects.filter(pk=blob.pk).update(refcount=F('refcount') + 1)
+
+    if isinstance(upload, StoredUploadedFile) and upload.storage_name:
+        storage.delete(upload.storage_name)
+        upload.storage_name = None
+    return blob
+
+
+def _delete_blob_files(name):
+    storage = Recipe._meta.get_field('image').storage
+    storage.delete(name)
+    for variant in (ORIGINAL, *VARIANTS):
+        storage.delete(variant_path(name, variant))
+
+
+def release_image_blob(blob_id):
+    """Drop a reference to a blob, deleting it and its files at zero"""
+    with transaction.atomic():
+        blob = ImageBlob.objects.select_for_update().filter(pk=blob_id).first()
+        if blob is None:
+            return
+
+        remaining = blob.refcount - 1
+        if remaining <= 0:
+            # Repair a drifted refcount rather than delete a blob in use.
+            remaining = Recipe.objects.filter(image_blob=blob).count()
+        if remaining > 0:
+            blob.refcount = remaining
+            blob.save(update_fields=['refcount'])
+            return
+
+        name = blob.name
+        blob.delete()
+        transaction.on_commit(lambda: _delete_blob_files(name))
@@ -0,0 +1,188 @@
+"""batched, resumable import of recipes from NDJSON or CSV files"""
+import csv
+import io
+import json
+from itertools import islice
+from types import SimpleNamespace
+
+from django.db import connection, transaction
+
+from core.models import ImportCheckpoint, Recipe
+from recipe.export import CSV, CSV_LIST_SEPARATOR, NDJSON
+from recipe.serializers import RecipeSerializer
+from recipe.search import update_search_vectors
+from recipe.signals import invalidate_user
+
+
+def detect_format(path):
+    """Guess the input format from the file extension"""
+    return CSV if path.lower().endswith('.csv') else NDJSON
+
+
+def read_ndjson(path, position=0):
+    """Yield (resume position, row) pairs, the position being a byte offset"""
+    with open(path, 'rb') as f:
+        f.seek(position)
+        while True:
+            line = f.readline()
+            if not line:
+                return
+            if line.strip():
+                yield f.tell(), json.loads(line)
+
+
+def _split_names(value):
+    return [
+        {'name': name} for name in (value or '').split(CSV_LIST_SEPARATOR)
+        if name
+    ]
+
+
+def read_csv(path, position=0):
+    """Yield (resume position, row) pairs, the position being a row count"""
+    with open(path, newline='') as f:
+        for number, row in enumerate(csv.DictReader(f), start=1):
+            if number <= position:
+                continue
+            row.pop('id', None)
+            for field_name in ('tags', 'ingredients'):
+                row[field_name] = _split_names(row.get(field_name))
+            yield number, row
+
+
+def read_rows(path, input_format, position=0):
+    if input_format == CSV:
+        return read_csv(path, position)
+    return read_ndjson(path, position)
+
+
+def batched(rows, size):
+    """Group an iterable into lists of at most size items"""
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _copy_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return '"%s"' % str(value).replace('"', '""')
+
+
+def copy_objects(model, objs):
+    """Insert unsaved objects with PostgreSQL COPY"""
+    fields = [
+        f for f in model._meta.concrete_fields
+        if not (f.primary_key and objs[0].pk is None)
+    ]
+    buffer = io.StringIO()
+    for obj in objs:
+        buffer.write(','.join(
+            _copy_value(f.get_db_prep_save(f.pre_save(obj, True), connection))
+            for f in fields
+        ))
+        buffer.write('\n')
+    buffer.seek(0)
+
+    columns = ', '.join(connection.ops.quote_name(f.column) for f in fields)
+    with connection.cursor() as cursor:
+        cursor.cursor.copy_expert(
+            f'COPY {connection.ops.quote_name(model._meta.db_table)} '
+            f'({columns}) FROM STDIN WITH (FORMAT csv)',
+            buffer,
+        )
+
+
+class RecipeImporter:
+    """Validate rows like the API and write them in batches.
+
+    Each batch is committed together with the import checkpoint, so a
+    crashed import resumes after the last committed batch.
+    """
+
+    def __init__(self, user, source, batch_size=1000, use_copy=None):
+        self.user = user
+        self.source = source
+        self.batch_size = batch_size
+        if use_copy is None:
+            use_copy = connection.vendor == 'postgresql'
+        self.use_copy = use_copy
+        self.list_serializer = RecipeSerializer(
+            many=True, context={'request': SimpleNamespace(user=user)},
+        )
+        self.checkpoint, _created = ImportCheckpoint.objects.get_or_create(
+            user=user, source=source,
+        )
+        self.errors = []
+
+    def validate(self, rows):
+        """Yield (position, validated data), collecting invalid rows"""
+        for position, row in rows:
+            serializer = RecipeSerializer(data=row)
+            if serializer.is_valid():
+                yield position, dict(serializer.validated_data, user=self.user)
+            else:
+                self.errors.append((position, serializer.errors))
+
+    def _copy_batch(self, validated):
+        """Write a batch with COPY, reserving ids from the sequence first"""
+        nested = {'tags', 'ingredients'}
+        recipes = [
+            Recipe(**{k: v for k, v in data.items() if k not in nested})
+            for data in validated
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT nextval(pg_get_serial_sequence(%s, 'id')) "
+                "FROM generate_series(1, %s)",
+                [Recipe._meta.db_table, len(recipes)],
+            )
+            for recipe, (recipe_id,) in zip(recipes, cursor.fetchall()):
+                recipe.id = recipe_id
+        copy_objects(Recipe, recipes)
+
+        child = self.list_serializer.child
+        for field_name in ('tags', 'ingredients'):
+            field = Recipe._meta.get_field(field_name)
+            through = field.remote_field.through
+            target = f'{field.m2m_reverse_field_name()}_id'
+            items = [
+                item for data in validated for item in data.get(field_name, [])
+            ]
+            objs = child._bulk_get_or_create(field.related_model, items)
+            links = [
+                through(recipe_id=recipe.id, **{target: obj_id})
+                for recipe, data in zip(recipes, validated)
+                for obj_id in dict.fromkeys(
+                    objs[item['name']].id for item in data.get(field_name, [])
+                )
+            ]
+            if links:
+                copy_objects(through, links)
+        invalidate_user(self.user.id)
+        update_search_vectors([recipe.id for recipe in recipes])
+
+    def write(self, batch):
+        """Write one batch of (position, data) and advance the checkpoint"""
+        validated = [data for _position, data in batch]
+        with transaction.atomic():
+            if self.use_copy:
+                self._copy_batch(validated)
+            else:
+                self.list_serializer.create(validated)
+            self.checkpoint.position = batch[-1][0]
+            self.checkpoint.rows += len(validated)
+            self.checkpoint.save(
+                update_fields=['position', 'rows', 'updated_at'],
+            )
+
+    def run(self, rows):
+        """Import the rows, yielding the running total after each batch"""
+        for batch in batched(self.validate(rows), self.batch_size):
+            self.write(batch)
+            yield self.checkpoint.rows
@@ -0,0 +1,54 @@
+"""interning of tag and ingredient names into the shared dictionary"""
+from django.conf import settings
+from django.db import transaction
+
+from core.models import CanonicalName, normalize_name
+from user.authentication import LRUCache
+
+# normalized name -> CanonicalName id. Entries are never deleted, so the
+# only staleness to avoid is caching ids from a rolled back transaction.
+_interned = LRUCache(
+    settings.CANONICAL_NAME_CACHE_SIZE, settings.CANONICAL_NAME_CACHE_TTL,
+)
+
+
+def _remember(ids):
+    for name, pk in ids.items():
+        _interned.set(name, pk)
+
+
+def intern_names(names):
+    """Return {normalized name: CanonicalName id} for names.
+
+    Names seen before are answered from the process cache; the rest cost
+    one SELECT and, for names nobody has used yet, one INSERT and a
+    re-read. Ids are cached only once the transaction commits.
+    """
+    ids = {}
+    missing = []
+    for name in {normalize_name(name) for name in names}:
+        pk = _interned.get(name)
+        if pk is None:
+            missing.append(name)
+        else:
+            ids[name] = pk
+    if not missing:
+        return ids
+
+    found = dict(
+        CanonicalName.objects.filter(name__in=missing)
+        .values_list('name', 'id')
+    )
+    new = [name for name in missing if name not in found]
+    if new:
+        CanonicalName.objects.bulk_create(
+            [CanonicalName(name=name) for name in new],
+            ignore_conflicts=True,
+        )
+        found.update(
+            CanonicalName.objects.filter(name__in=new)
+            .values_list('name', 'id')
+        )
+    transaction.on_commit(lambda: _remember(found))
+    ids.update(found)
+    return ids
@@ -0,0 +1,123 @@
+"""pagination for recipe APIs"""
+from django.conf import settings
+from rest_framework.pagination import (
+    BasePagination,
+    CursorPagination,
+    LimitOffsetPagination,
+)
+
+CURSOR = 'cursor'
+OFFSET = 'offset'
+# `?ordering=popular` sorts tags and ingredients by how many recipes use them
+POPULAR = 'popular'
+POPULAR_ORDERING = ('-recipe_count', '-name')
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Keyset pagination over the recipe ordering, no COUNT(*) issued"""
+    ordering = '-id'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+
+class AttrCursorPagination(RecipeCursorPagination):
+    """Keyset pagination over the tag/ingredient ordering"""
+    ordering = '-name'
+
+
+class RecipeOffsetPagination(LimitOffsetPagination):
+    """Offset pagination, used by default in the browsable API"""
+    default_limit = 100
+    max_limit = 1000
+
+
+class SwitchablePagination(BasePagination):
+    """Pick offset or cursor pagination from the request.
+
+    `?pagination=cursor|offset` selects a mode explicitly, a `cursor` param
+    implies cursor mode and `limit`/`offset` imply offset mode. Otherwise the
+    browsable API uses offset mode and other clients fall back to
+    `settings.RECIPE_DEFAULT_PAGINATION`, where None leaves lists unpaginated.
+    Ranked search results have no keyset to page on, so requests carrying
+    `search_param` always use offset mode.
+    """
+    cursor_class = RecipeCursorPagination
+    offset_class = RecipeOffsetPagination
+    search_param = None
+
+    def __init__(self):
+        self.paginator = None
+
+    @property
+    def display_page_controls(self):
+        return getattr(self.paginator, 'display_page_controls', False)
+
+    def get_mode(self, request):
+        """Return the pagination mode requested by the client"""
+        params = request.query_params
+        if self.search_param and params.get(self.search_param, '').strip():
+            return OFFSET
+        mode = params.get('pagination')
+        if mode in (CURSOR, OFFSET):
+            return mode
+        if CURSOR in params:
+            return CURSOR
+        if 'limit' in params or OFFSET in params:
+            return OFFSET
+        renderer = getattr(request, 'accepted_renderer', None)
+        if renderer is not None and renderer.format == 'api':
+            return OFFSET
+        return getattr(settings, 'RECIPE_DEFAULT_PAGINATION', None)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        mode = self.get_mode(request)
+        if mode == CURSOR:
+            self.paginator = self.cursor_class()
+        elif mode == OFFSET:
+            self.paginator = self.offset_class()
+        else:
+            self.paginator = None
+            return None
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def to_html(self):
+        return self.paginator.to_html()
+
+    def get_results(self, data):
+        return self.paginator.get_results(data)
+
+    def get_schema_fields(self, view):
+        return []
+
+    def get_schema_operation_parameters(self, view):
+        return (
+            self.cursor_class().get_schema_operation_parameters(view) +
+            self.offset_class().get_schema_operation_parameters(view)
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return self.cursor_class().get_paginated_response_schema(schema)
+
+
+class RecipePagination(SwitchablePagination):
+    """Pagination for recipes"""
+    search_param = 'search'
+
+
+class AttrPagination(SwitchablePagination):
+    """Pagination for tags and ingredients.
+
+    Popular ordering pages by offset: recipe counts tie heavily, leaving a
+    cursor no unique key to page on.
+    """
+    cursor_class = AttrCursorPagination
+
+    def get_mode(self, request):
+        mode = super().get_mode(request)
+        if mode == CURSOR and request.query_params.get('ordering') == POPULAR:
+            return OFFSET
+        return mode
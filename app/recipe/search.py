@@ -0,0 +1,96 @@
+"""full-text search over recipe titles, descriptions, tags and ingredients"""
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    TrigramSimilarity,
+)
+from django.db import connection
+from django.db.models import Exists, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from core.models import Recipe
+
+# Fields whose text is part of a recipe's search document
+TEXT_FIELDS = {'title', 'description'}
+NESTED_FIELDS = ('tags', 'ingredients')
+
+
+def search_supported():
+    """Return whether the database has tsvector and trigram support"""
+    return connection.vendor == 'postgresql'
+
+
+def _links(field_name):
+    field = Recipe._meta.get_field(field_name)
+    return field.remote_field.through.objects, field.m2m_reverse_field_name()
+
+
+def _names(field_name):
+    """Space separated names linked to the outer recipe through field_name"""
+    links, target = _links(field_name)
+    names = links.filter(recipe_id=OuterRef('pk')).values(
+        'recipe_id',
+    ).annotate(names=StringAgg(f'{target}__name', ' ')).values('names')
+    return Coalesce(Subquery(names), Value(''))
+
+
+def search_document():
+    """Weighted document: title (A), tag/ingredient names (B), body (C)"""
+    config = settings.RECIPE_SEARCH_CONFIG
+    return (
+        SearchVector('title', weight='A', config=config) +
+        SearchVector(*map(_names, NESTED_FIELDS), weight='B', config=config) +
+        SearchVector('description', weight='C', config=config)
+    )
+
+
+def update_search_vectors(recipe_ids):
+    """Recompute the stored search vector of the given recipes.
+
+    recipe_ids may be a list or a values('pk') queryset. The document is
+    built by one UPDATE with correlated subqueries, so no rows are loaded.
+    """
+    if not search_supported():
+        return
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        search_vector=search_document(),
+    )
+
+
+def _like_filter(queryset, term):
+    """Match every word of term with LIKE, for backends without tsvector"""
+    for word in term.split():
+        condition = Q(title__icontains=word) | Q(description__icontains=word)
+        for field_name in NESTED_FIELDS:
+            links, target = _links(field_name)
+            condition |= Exists(links.filter(
+                recipe_id=OuterRef('pk'),
+                **{f'{target}__name__icontains': word}
+            ))
+        queryset = queryset.filter(condition)
+    return queryset.order_by('-id')
+
+
+def search_recipes(queryset, term):
+    """Filter queryset to recipes matching term, best matches first.
+
+    On PostgreSQL recipes match the stored search vector (GIN index) or
+    have a title similar to term (trigram index), which tolerates typos.
+    They are ordered by SearchRank, then title similarity. Other backends
+    degrade to case-insensitive substring matching, newest first.
+    """
+    if not search_supported():
+        return _like_filter(queryset, term)
+
+    query = SearchQuery(
+        term, config=settings.RECIPE_SEARCH_CONFIG, search_type='websearch',
+    )
+    return queryset.annotate(
+        rank=SearchRank(F('search_vector'), query),
+        similarity=TrigramSimilarity('title', term),
+    ).filter(
+        Q(search_vector=query) | Q(title__trigram_similar=term)
+    ).order_by('-rank', '-similarity', '-id')
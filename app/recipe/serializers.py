@@ -1,24 +1,148 @@
 """serializers for recipe APIs"""
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.translation import gettext as _
 from rest_framework import serializers
 from core import models
-class IngredientSerializer(serializers.ModelSerializer):
+from core.metrics import TimedSerializerMixin
+from recipe.images import (
+    release_image_blob,
+    served_image,
+    store_image_blob,
+    variant_urls,
+)
+from recipe.names import intern_names
+from recipe.search import update_search_vectors
+from recipe.signals import invalidate_user
+
+
+class AttrListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    """List serializer for tags and ingredients"""
+
+
+class UserAttrSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """Base serializer for user owned recipe attributes"""
+
+    def validate_name(self, value):
+        """Reject renaming to a name the user already has"""
+        if self.instance is not None:
+            duplicate = self.Meta.model.objects.filter(
+                user=self.instance.user,
+                canonical__name=models.normalize_name(value),
+            ).exclude(pk=self.instance.pk)
+            if duplicate.exists():
+                msg = _('An item with this name already exists')
+                raise serializers.ValidationError(msg, code='unique')
+        return value
+
+
+class IngredientSerializer(UserAttrSerializer):
     """Serializer for ingredient objects"""
 
     class Meta:
         model = models.Ingredient
         fields = ['id', 'name']
         read_only_fields = ['id']
+        list_serializer_class = AttrListSerializer
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(UserAttrSerializer):
     """Serializer for tag objects"""
 
     class Meta:
         model = models.Tags
         fields = ['id', 'name']
         read_only_fields = ['id']
+        list_serializer_class = AttrListSerializer
+
+
+class AutocompleteSerializer(serializers.Serializer):
+    """Serializer for autocomplete suggestions"""
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    usage = serializers.IntegerField(
+        help_text='Number of recipes using the name',
+    )
+
 
+class RecipeListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    """Write many recipes in one transaction with batched queries"""
+    NESTED_FIELDS = (('tags', models.Tags), ('ingredients', models.Ingredient))
 
-class RecipeSerializer(serializers.ModelSerializer):
+    def _link_nested(self, recipes, validated_data, replace=False):
+        """Attach the nested tags and ingredients of every recipe in bulk"""
+        for field_name, model in self.NESTED_FIELDS:
+            field = models.Recipe._meta.get_field(field_name)
+            through = field.remote_field.through
+            target = f'{field.m2m_reverse_field_name()}_id'
+            given = [
+                (recipe, data[field_name])
+                for recipe, data in zip(recipes, validated_data)
+                if data.get(field_name) is not None
+            ]
+            if replace and given:
+                through.objects.filter(
+                    recipe_id__in=[recipe.id for recipe, _items in given]
+                ).delete()
+
+            items = [item for _recipe, nested in given for item in nested]
+            objs = self.child._bulk_get_or_create(model, items)
+            through.objects.bulk_create(
+                [
+                    through(recipe_id=recipe.id, **{target: obj_id})
+                    for recipe, nested in given
+                    for obj_id in dict.fromkeys(
+                        objs[item['name']].id for item in nested
+                    )
+                ],
+                ignore_conflicts=True,
+            )
+
+    def _invalidate(self, recipes):
+        # Bulk writes skip the model signals that keep caches and search
+        # vectors fresh.
+        invalidate_user(self.context['request'].user.id)
+        update_search_vectors([recipe.id for recipe in recipes])
+
+    @transaction.atomic
+    def create(self, validated_data):
+        """Create recipes with one INSERT per table"""
+        nested = {field_name for field_name, _model in self.NESTED_FIELDS}
+        recipes = [
+            models.Recipe(**{
+                k: v for k, v in data.items() if k not in nested
+            })
+            for data in validated_data
+        ]
+        if connection.features.can_return_rows_from_bulk_insert:
+            models.Recipe.objects.bulk_create(recipes)
+        else:
+            for recipe in recipes:
+                recipe.save()
+
+        self._link_nested(recipes, validated_data)
+        self._invalidate(recipes)
+        return recipes
+
+    @transaction.atomic
+    def update(self, instances, validated_data):
+        """Update recipes paired with validated_data by position"""
+        nested = {field_name for field_name, _model in self.NESTED_FIELDS}
+        now = timezone.now()
+        fields = {'updated_at'}
+        for recipe, data in zip(instances, validated_data):
+            for attr, value in data.items():
+                if attr not in nested:
+                    setattr(recipe, attr, value)
+                    fields.add(attr)
+            recipe.updated_at = now
+        models.Recipe.objects.bulk_update(instances, sorted(fields))
+
+        self._link_nested(instances, validated_data, replace=True)
+        self._invalidate(instances)
+        return instances
+
+
+class RecipeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for recipes."""
     tags = TagSerializer(many=True, required=False)
     ingredients = IngredientSerializer(many=True, required=False)
@@ -27,21 +151,61 @@ class RecipeSerializer(serializers.ModelSerializer):
         model = models.Recipe
         fields = ['id', 'title', 'time_minutes', 'price', 'link', 'description', 'tags', 'ingredients']
         read_only_fields = ['id']
+        list_serializer_class = RecipeListSerializer
+
+    def _bulk_get_or_create(self, model, items):
+        """Map each item name to the user's object, creating missing ones.
+
+        Names are matched on their shared canonical form, so names that
+        only differ in case or whitespace map to the same object.
+        """
+        auth_user = self.context['request'].user
+        names = list(dict.fromkeys(item['name'] for item in items))
+        if not names:
+            return {}
+
+        canonical = intern_names(names)
+        keys = {name: canonical[models.normalize_name(name)] for name in names}
+        found = {
+            obj.canonical_id: obj
+            for obj in model.objects.filter(
+                user=auth_user, canonical_id__in=set(keys.values()),
+            )
+        }
+        missing = {}
+        for name, key in keys.items():
+            if key not in found:
+                missing.setdefault(key, name)
+        if missing:
+            # ignore_conflicts keeps concurrent creators of the same name
+            # safe against the (user, canonical) constraint; re-read for ids.
+            model.objects.bulk_create(
+                [
+                    model(user=auth_user, name=name, canonical_id=key)
+                    for key, name in missing.items()
+                ],
+                ignore_conflicts=True,
+            )
+            found.update(
+                (obj.canonical_id, obj)
+                for obj in model.objects.filter(
+                    user=auth_user, canonical_id__in=list(missing),
+                )
+            )
+
+        return {name: found[key] for name, key in keys.items()}
 
     def _get_or_create_tags(self, tags, recipe):
         """Handle getting or creating tags as needed."""
-        auth_user = self.context['request'].user
-        for tag in tags:
-            tag_obj, created = models.Tags.objects.get_or_create(user=auth_user, **tag)
-            recipe.tags.add(tag_obj)
+        objs = self._bulk_get_or_create(models.Tags, tags)
+        recipe.tags.add(*set(objs.values()))
 
     def _get_or_create_ingredients(self, ingredients, recipe):
         """Handle getting or creating an ingredient"""
-        auth_user = self.context['request'].user
-        for ingredient in ingredients:
-            ingredient_obj, created = models.Ingredient.objects.get_or_create(user=auth_user, **ingredient)
-            recipe.ingredients.add(ingredient_obj)
+        objs = self._bulk_get_or_create(models.Ingredient, ingredients)
+        recipe.ingredients.add(*set(objs.values()))
 
+    @transaction.atomic
     def create(self, validated_data):
         """Create a recipe"""
         tags = validated_data.pop('tags', [])
@@ -52,6 +216,8 @@ class RecipeSerializer(serializers.ModelSerializer):
       
 
         return recipe
+
+    @transaction.atomic
     def update(self, instance, validated_data):
         """Update a recipe"""
         tags = validated_data.pop('tags', None)
@@ -70,19 +236,63 @@ class RecipeSerializer(serializers.ModelSerializer):
         instance.save()
         return instance
 
+
+class RecipeImageField(serializers.ImageField):
+    """Image field serving the EXIF-stripped copy of an upload once ready"""
+
+    def get_attribute(self, instance):
+        return served_image(instance)
+
+
 class RecipeDetailSerializer(RecipeSerializer):
     """Serializer for recipe detail view."""
+    image = RecipeImageField(required=False, allow_null=True)
+    image_variants = serializers.SerializerMethodField()
 
     class Meta(RecipeSerializer.Meta):
-        fields = RecipeSerializer.Meta.fields + ['description','image']
+        fields = RecipeSerializer.Meta.fields + [
+            'description', 'image', 'image_status', 'image_variants',
+        ]
+        read_only_fields = RecipeSerializer.Meta.read_only_fields + [
+            'image_status',
+        ]
 
+    def get_image_variants(self, obj):
+        """Return URLs of the derived images"""
+        return variant_urls(obj, self.context.get('request'))
 
 
-class RecipeImageSerializer(serializers.ModelSerializer):
+class RecipeImageSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for uploading images to recipes."""
+    image = RecipeImageField()
+    image_variants = serializers.SerializerMethodField()
+
     class Meta:
         model = models.Recipe
-        fields = ['id', 'image']
-        read_only_fields = ['id']
-        extra_kwargs = {'image': {'required': True}}
-    
\ No newline at end of file
+        fields = ['id', 'image', 'image_status', 'image_variants']
+        read_only_fields = ['id', 'image_status']
+
+    def get_image_variants(self, obj):
+        """Return URLs of the derived images"""
+        return variant_urls(obj, self.context.get('request'))
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        """Point the recipe at the deduplicated blob holding the upload"""
+        old_blob_id = instance.image_blob_id
+        blob = store_image_blob(validated_data['image'])
+        # Assigning the name skips the copy FieldFile.save() would make.
+        validated_data['image'] = blob.name
+        validated_data['image_blob'] = blob
+        instance = super().update(instance, validated_data)
+        if old_blob_id:
+            release_image_blob(old_blob_id)
+        return instance
+
+
+class RecipeBulkDeleteSerializer(serializers.Serializer):
+    """Serializer for deleting many recipes at once."""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+    )
@@ -0,0 +1,177 @@
+"""signal handlers invalidating cached recipe responses"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.models import Recipe, Tags, Ingredient, normalize_name
+from recipe.cache import bump_generation
+from recipe.images import release_image_blob
+from recipe.names import intern_names
+from recipe.search import (
+    TEXT_FIELDS,
+    search_supported,
+    update_search_vectors,
+)
+
+M2M_ACTIONS = ('post_add', 'post_remove', 'post_clear')
+
+
+def invalidate_user(user_id):
+    """Bump the user's generation now and again once the write commits.
+
+    The second bump stops a reader that cached the pre-commit rows under the
+    first bump from serving them after the commit.
+    """
+    bump_generation(user_id)
+    transaction.on_commit(lambda: bump_generation(user_id))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def reset_new_user_cache(sender, instance, created, **kwargs):
+    """Start a new user on a fresh generation, even if the id is reused"""
+    if created:
+        bump_generation(instance.id)
+
+
+@receiver(pre_save, sender=Tags)
+@receiver(pre_save, sender=Ingredient)
+def link_canonical_name(sender, instance, **kwargs):
+    """Point a saved tag or ingredient at the shared form of its name"""
+    key = normalize_name(instance.name)
+    instance.canonical_id = intern_names([instance.name])[key]
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tags)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tags)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_on_write(sender, instance, **kwargs):
+    """Invalidate the owner's cache when a recipe or attribute changes"""
+    invalidate_user(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_on_m2m_change(sender, instance, action, **kwargs):
+    """Invalidate the owner's cache when recipe links change"""
+    if action in M2M_ACTIONS:
+        invalidate_user(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def touch_on_m2m_change(sender, instance, action, model, pk_set, **kwargs):
+    """Bump updated_at on both sides of a changed recipe link"""
+    source = instance._meta.model_name
+    target = model._meta.model_name
+    if action == 'pre_clear':
+        # clear() does not report pk_set, so note the linked rows up front
+        instance._cleared_pks = set(
+            sender.objects.filter(**{f'{source}_id': instance.pk})
+            .values_list(f'{target}_id', flat=True)
+        )
+        return
+    if action == 'post_clear':
+        pk_set = instance.__dict__.pop('_cleared_pks', set())
+    elif action not in M2M_ACTIONS:
+        return
+
+    now = timezone.now()
+    type(instance).objects.filter(pk=instance.pk).update(updated_at=now)
+    instance.updated_at = now
+    if pk_set:
+        model.objects.filter(pk__in=pk_set).update(updated_at=now)
+
+
+@receiver(post_save, sender=Tags)
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Tags)
+@receiver(pre_delete, sender=Ingredient)
+def touch_linked_recipes(sender, instance, created=False, **kwargs):
+    """Bump updated_at on recipes that embed a renamed or deleted attribute"""
+    if created:
+        return
+    field_name = 'tags' if sender is Tags else 'ingredients'
+    Recipe.objects.filter(**{field_name: instance}).update(
+        updated_at=timezone.now(),
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+def release_recipe_image(sender, instance, **kwargs):
+    """Drop the deleted recipe's reference to its image blob"""
+    if instance.image_blob_id:
+        release_image_blob(instance.image_blob_id)
+
+
+@receiver(post_save, sender=Recipe)
+def refresh_recipe_search(sender, instance, update_fields=None, **kwargs):
+    """Rebuild the search vector when the recipe's own text may have changed"""
+    if update_fields and not TEXT_FIELDS.intersection(update_fields):
+        return
+    update_search_vectors([instance.pk])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def refresh_search_on_m2m_change(sender, instance, action, pk_set, **kwargs):
+    """Rebuild search vectors when tags or ingredients are (un)linked"""
+    if isinstance(instance, Recipe):
+        if action in M2M_ACTIONS:
+            update_search_vectors([instance.pk])
+        return
+    if action == 'pre_clear':
+        # clear() does not report pk_set, so note the linked recipes up front
+        column = f'{instance._meta.model_name}_id'
+        instance._search_cleared_pks = set(
+            sender.objects.filter(**{column: instance.pk})
+            .values_list('recipe_id', flat=True)
+        )
+        return
+    if action == 'post_clear':
+        pk_set = instance.__dict__.pop('_search_cleared_pks', set())
+    elif action not in M2M_ACTIONS:
+        return
+    update_search_vectors(pk_set or [])
+
+
+@receiver(post_save, sender=Tags)
+@receiver(post_save, sender=Ingredient)
+def refresh_search_on_rename(sender, instance, created, **kwargs):
+    """Rebuild search vectors of recipes embedding a renamed attribute"""
+    if created:
+        return
+    field_name = 'tags' if sender is Tags else 'ingredients'
+    update_search_vectors(
+        Recipe.objects.filter(**{field_name: instance}).values('pk')
+    )
+
+
+@receiver(pre_delete, sender=Tags)
+@receiver(pre_delete, sender=Ingredient)
+def note_searchable_recipes(sender, instance, **kwargs):
+    """Remember which recipes embed an attribute that is being deleted"""
+    if not search_supported():
+        return
+    field_name = 'tags' if sender is Tags else 'ingredients'
+    instance._search_recipe_ids = list(
+        Recipe.objects.filter(**{field_name: instance})
+        .values_list('pk', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Tags)
+@receiver(post_delete, sender=Ingredient)
+def refresh_search_on_delete(sender, instance, **kwargs):
+    """Drop a deleted attribute's name from the recipes that embedded it"""
+    update_search_vectors(instance.__dict__.pop('_search_recipe_ids', []))
@@ -7,9 +7,11 @@ from rest_framework.test import APIClient
 from django.test import TestCase
 
 from core import models
+from recipe import names
 from recipe.serializers import IngredientSerializer
 
 INGREDIENTS_URL = reverse('recipe:ingredient-list')
+RECIPES_URL = reverse('recipe:recipe-list')
 def detail_url(ingredient_id):
     """create and return an ingredient detail url"""
     return reverse('recipe:ingredient-detail', args=[ingredient_id])
@@ -149,4 +151,59 @@ class PrivateIngredientAPITests(TestCase):
         self.assertEqual(len(res.data), 1)
 
     
-    
\ No newline at end of file
+    
+
+class CanonicalIngredientNameTests(TestCase):
+    """test ingredient names are interned into the shared dictionary"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+
+    def test_users_share_canonical_name(self):
+        """test equivalent names of different users share one entry"""
+        other = create_user(email='other@example.com')
+        salt = models.Ingredient.objects.create(user=self.user, name='Sea Salt')
+        other_salt = models.Ingredient.objects.create(
+            user=other, name='  sea   SALT ',
+        )
+
+        self.assertEqual(salt.canonical_id, other_salt.canonical_id)
+        self.assertEqual(models.CanonicalName.objects.get().name, 'sea salt')
+
+    def test_recipe_folds_name_variants(self):
+        """test names differing in case or spacing map to one ingredient"""
+        models.Ingredient.objects.create(user=self.user, name='Salt')
+        payload = {
+            'title': 'Brine',
+            'time_minutes': 1,
+            'price': Decimal('0.50'),
+            'ingredients': [{'name': 'salt'}, {'name': ' SALT'}],
+        }
+
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        ingredients = models.Ingredient.objects.filter(user=self.user)
+        self.assertEqual(ingredients.count(), 1)
+        recipe = models.Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(list(recipe.ingredients.all()), list(ingredients))
+
+    def test_rename_to_name_variant_rejected(self):
+        """test renaming onto another spelling of an existing name fails"""
+        models.Ingredient.objects.create(user=self.user, name='Salt')
+        pepper = models.Ingredient.objects.create(user=self.user, name='Pepper')
+
+        res = self.client.patch(detail_url(pepper.id), {'name': 'SALT'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_interned_names_cached_after_commit(self):
+        """test committed names are answered without a query"""
+        self.addCleanup(names._interned.clear)
+        with self.captureOnCommitCallbacks(execute=True):
+            ids = names.intern_names(['Basil'])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(names.intern_names([' BASIL ']), ids)
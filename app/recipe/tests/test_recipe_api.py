@@ -1,18 +1,30 @@
 from decimal import Decimal
-from django.test import TestCase
+import csv
+import hashlib
+import io
+import json
+from django.db import connection
+from unittest import skipUnless
+from unittest.mock import patch
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from rest_framework.test import APIClient 
 from rest_framework import status
 import tempfile
 import os
-from PIL import Image
+from PIL import Image, features
 from user.tests.test_user_api import create_user
-from core.models import (Recipe,Tags,Ingredient)
+from core.models import (Recipe,Tags,Ingredient,ImageBlob)
 from recipe.serializers import (RecipeSerializer, RecipeDetailSerializer,)
+from recipe.views import RecipeViewSet
+from recipe.uploads import RecipeImageUploadHandler
 
 
 RECIPE_URL = reverse('recipe:recipe-list')
+BULK_URL = reverse('recipe:recipe-bulk')
+EXPORT_URL = reverse('recipe:recipe-export')
 
 def detail_url(recipe_id):
     """create and return a recipe detail URL"""
@@ -409,6 +421,31 @@ class PrivateRecipeApiTests(TestCase):
         self.assertIn(s2.data, res.data)
         self.assertNotIn(s3.data,res.data)
 
+    def test_filter_by_all_tags(self):
+        """Test filtering recipes that have every requested tag"""
+        tag1 = Tags.objects.create(user=self.user, name='Vegan')
+        tag2 = Tags.objects.create(user=self.user, name='Spicy')
+        r1 = create_recipe(user=self.user, title='Bean stew')
+        r1.tags.add(tag1, tag2)
+        r2 = create_recipe(user=self.user, title='Salad')
+        r2.tags.add(tag1)
+
+        params = {'tags': f'{tag1.id},{tag2.id}', 'tags_mode': 'all'}
+        res = self.client.get(RECIPE_URL, params)
+
+        self.assertEqual([item['id'] for item in res.data], [r1.id])
+
+    def test_filter_by_tags_no_duplicates(self):
+        """Test a recipe matching several tags is listed once"""
+        tag1 = Tags.objects.create(user=self.user, name='Vegan')
+        tag2 = Tags.objects.create(user=self.user, name='Spicy')
+        recipe = create_recipe(user=self.user, title='Bean stew')
+        recipe.tags.add(tag1, tag2)
+
+        res = self.client.get(RECIPE_URL, {'tags': f'{tag1.id},{tag2.id}'})
+
+        self.assertEqual([item['id'] for item in res.data], [recipe.id])
+
          
 class ImageUploadTests(TestCase):
 
@@ -438,10 +475,848 @@ class ImageUploadTests(TestCase):
         self.assertIn('image',res.data)
         self.assertTrue(os.path.exists(self.recipe.image.path))
 
+    def _upload(self, img):
+        """upload a PIL image to the recipe and return the response"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            img.save(image_file, format='JPEG')
+            image_file.seek(0)
+            return self.client.post(url, {'image': image_file}, format='multipart')
+
+    @override_settings(IMAGE_PROCESSING_ASYNC=True)
+    def test_upload_image_returns_pending(self):
+        """test the upload returns before the image is processed"""
+        res = self._upload(Image.new('RGB', (10, 10)))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['image_status'], Recipe.IMAGE_PENDING)
+        self.assertIsNone(res.data['image'])
+        self.assertEqual(res.data['image_variants'], {})
+
+    @override_settings(IMAGE_PROCESSING_ASYNC=False)
+    def test_upload_image_unexpected_error_marks_failed(self):
+        """test an unexpected processing error does not leave it pending"""
+        with patch('recipe.images._encode', side_effect=RuntimeError):
+            res = self._upload(Image.new('RGB', (10, 10)))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['image_status'], Recipe.IMAGE_FAILED)
+        self.assertIsNone(res.data['image'])
+        self.assertEqual(res.data['image_variants'], {})
+
+    @override_settings(IMAGE_PROCESSING_ASYNC=False)
+    def test_upload_image_derives_variants(self):
+        """test thumbnails are derived and EXIF is stripped"""
+        img = Image.new('RGB', (1000, 500))
+        exif = img.getexif()
+        exif[0x010F] = 'Test camera'
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            img.save(image_file, format='JPEG', exif=exif.tobytes())
+            image_file.seek(0)
+            res = self.client.post(
+                image_upload_url(self.recipe.id),
+                {'image': image_file},
+                format='multipart',
+            )
+
+        self.recipe.refresh_from_db()
+        self.addCleanup(
+            lambda: [self.recipe.image.storage.delete(p)
+                     for p in self.recipe.image_variants.values()]
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['image_status'], Recipe.IMAGE_READY)
+        expected = {'original', 'thumbnail', 'medium'}
+        if features.check('webp'):
+            expected |= {'thumbnail_webp', 'medium_webp'}
+        self.assertEqual(set(res.data['image_variants']), expected)
+        self.assertEqual(
+            res.data['image'], res.data['image_variants']['original'],
+        )
+        storage = self.recipe.image.storage
+        with storage.open(self.recipe.image_variants['thumbnail']) as f:
+            self.assertEqual(Image.open(f).size, (150, 75))
+        if features.check('webp'):
+            with storage.open(self.recipe.image_variants['medium_webp']) as f:
+                self.assertEqual(Image.open(f).format, 'WEBP')
+        with storage.open(self.recipe.image_variants['original']) as f:
+            self.assertEqual(len(Image.open(f).getexif()), 0)
+        # The shared blob keeps the uploaded bytes its hash was taken of.
+        with self.recipe.image.open('rb') as f:
+            self.assertEqual(
+                hashlib.sha256(f.read()).hexdigest(),
+                self.recipe.image_blob.sha256,
+            )
+
+    @override_settings(IMAGE_PROCESSING_ASYNC=False)
+    def test_upload_image_without_exif_kept_unchanged(self):
+        """test an original with nothing to strip is not re-encoded"""
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            Image.new('RGB', (300, 200)).save(image_file, format='JPEG')
+            image_file.seek(0)
+            content = image_file.read()
+            image_file.seek(0)
+            res = self.client.post(
+                image_upload_url(self.recipe.id),
+                {'image': image_file},
+                format='multipart',
+            )
+
+        self.recipe.refresh_from_db()
+        self.addCleanup(
+            lambda: [self.recipe.image.storage.delete(p)
+                     for p in self.recipe.image_variants.values()]
+        )
+        self.assertEqual(res.data['image_status'], Recipe.IMAGE_READY)
+        served = self.recipe.image_variants['original']
+        self.assertTrue(res.data['image'].endswith(served))
+        for name in (self.recipe.image.name, served):
+            with self.recipe.image.storage.open(name, 'rb') as f:
+                self.assertEqual(f.read(), content)
+
+    @override_settings(IMAGE_PROCESSING_ASYNC=True)
+    def test_upload_image_streamed_to_storage(self):
+        """test the upload is written unchanged to its final location"""
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            Image.new('RGB', (10, 10)).save(image_file, format='JPEG')
+            image_file.seek(0)
+            content = image_file.read()
+            image_file.seek(0)
+            res = self.client.post(
+                image_upload_url(self.recipe.id),
+                {'image': image_file},
+                format='multipart',
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        self.assertTrue(self.recipe.image.name.startswith('uploads/recipe/'))
+        with self.recipe.image.open('rb') as f:
+            self.assertEqual(f.read(), content)
+
+    @override_settings(RECIPE_IMAGE_MAX_UPLOAD_SIZE=100)
+    def test_upload_image_too_large(self):
+        """test uploads over the size limit are rejected and removed"""
+        storage = self.recipe.image.storage
+        os.makedirs(storage.path('uploads/recipe/'), exist_ok=True)
+        before = set(storage.listdir('uploads/recipe/')[1])
+
+        res = self._upload(Image.new('RGB', (100, 100)))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(set(storage.listdir('uploads/recipe/')[1]), before)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    def test_interrupted_upload_removed(self):
+        """test a body ending mid-upload leaves no partial file behind"""
+        handler = RecipeImageUploadHandler()
+        handler.new_file('image', 'photo.jpg', 'image/jpeg', None)
+        handler.receive_data_chunk(b'partial', 0)
+        path = handler.storage.path(handler.storage_name)
+        self.assertTrue(os.path.exists(path))
+
+        handler.upload_interrupted()
+
+        self.assertFalse(os.path.exists(path))
+
+    def test_upload_non_image_file_rejected(self):
+        """test a file that is not an image is rejected from its header"""
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            image_file.write(b'not an image at all')
+            image_file.seek(0)
+            res = self.client.post(url, {'image': image_file}, format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
     def test_upload_image_bad_request(self):
         """Testing invalid image"""
         url = image_upload_url(self.recipe.id)
         payload = {'image': 'notanimage'}
         res = self.client.post(url,payload,format='multipart')
 
-        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+class RecipeQueryCountTests(TestCase):
+    """Test the number of queries issued by the recipe API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='query@example.com', password='testpass123')
+        self.client.force_authenticate(self.user)
+
+    def _create_recipes(self, count):
+        """create recipes with tags and ingredients attached"""
+        tag = Tags.objects.create(user=self.user, name='Dinner')
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        recipes = []
+        for i in range(count):
+            recipe = create_recipe(user=self.user, title=f'Recipe {i}')
+            recipe.tags.add(tag)
+            recipe.ingredients.add(ingredient)
+            recipes.append(recipe)
+        return recipes, tag, ingredient
+
+    def test_list_query_count_constant(self):
+        """Test listing recipes does not issue a query per recipe"""
+        self._create_recipes(10)
+
+        # validators, recipes, tags, ingredients
+        with self.assertNumQueries(4):
+            res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 10)
+        self.assertEqual(res.data[0]['tags'][0]['name'], 'Dinner')
+        self.assertEqual(res.data[0]['ingredients'][0]['name'], 'Salt')
+
+    def test_retrieve_query_count(self):
+        """Test retrieving a recipe prefetches tags and ingredients"""
+        recipes, tag, ingredient = self._create_recipes(1)
+
+        # validators, recipe, tags, ingredients
+        with self.assertNumQueries(4):
+            res = self.client.get(detail_url(recipes[0].id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['tags'][0]['id'], tag.id)
+
+    def test_filtered_list_query_count_constant(self):
+        """Test filtering recipes does not issue a query per recipe"""
+        recipes, tag, ingredient = self._create_recipes(10)
+        params = {'tags': f'{tag.id}', 'ingredients': f'{ingredient.id}'}
+
+        with self.assertNumQueries(4):
+            res = self.client.get(RECIPE_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 10)
+
+    def _count_create_queries(self, size):
+        """Return the number of queries used to create a nested recipe"""
+        payload = {
+            'title': f'Recipe with {size} items',
+            'time_minutes': 10,
+            'price': Decimal('5.00'),
+            'tags': [{'name': f'Tag {size}-{i}'} for i in range(size)],
+            'ingredients': [
+                {'name': f'Ingredient {size}-{i}'} for i in range(size)
+            ],
+        }
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post(RECIPE_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return len(queries)
+
+    def test_create_nested_query_count_constant(self):
+        """Test nested tags and ingredients are written in bulk"""
+        small = self._count_create_queries(2)
+        large = self._count_create_queries(30)
+
+        self.assertEqual(small, large)
+        recipe = Recipe.objects.get(title='Recipe with 30 items')
+        self.assertEqual(recipe.tags.count(), 30)
+        self.assertEqual(recipe.ingredients.count(), 30)
+
+    def test_create_with_duplicate_names_in_payload(self):
+        """Test repeated names in a payload create a single tag"""
+        payload = {
+            'title': 'Toast',
+            'time_minutes': 5,
+            'price': Decimal('1.00'),
+            'tags': [{'name': 'Breakfast'}, {'name': 'Breakfast'}],
+        }
+        res = self.client.post(RECIPE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            Tags.objects.filter(user=self.user, name='Breakfast').count(), 1
+        )
+
+
+class RecipePaginationTests(TestCase):
+    """Test paginating the recipe list"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='page@example.com', password='testpass123')
+        self.client.force_authenticate(self.user)
+        self.recipes = [
+            create_recipe(user=self.user, title=f'Recipe {i}') for i in range(5)
+        ]
+
+    def test_unpaginated_by_default(self):
+        """Test the list is returned whole when no pagination is asked for"""
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 5)
+
+    def test_cursor_pagination_walks_all_pages(self):
+        """Test cursor mode pages through recipes newest first"""
+        ids = []
+        url = RECIPE_URL
+        params = {'pagination': 'cursor', 'page_size': 2}
+        while url:
+            res = self.client.get(url, params)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', res.data)
+            ids.extend(item['id'] for item in res.data['results'])
+            url, params = res.data['next'], None
+
+        expected = sorted((recipe.id for recipe in self.recipes), reverse=True)
+        self.assertEqual(ids, expected)
+
+    def test_cursor_pagination_skips_count(self):
+        """Test cursor mode does not count the user's recipes"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(RECIPE_URL, {'pagination': 'cursor'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        for query in queries:
+            self.assertNotIn('COUNT(', query['sql'].upper())
+
+    def test_offset_pagination(self):
+        """Test offset mode returns a count and the requested slice"""
+        res = self.client.get(RECIPE_URL, {'limit': 2, 'offset': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['count'], 5)
+        self.assertEqual(
+            [item['id'] for item in res.data['results']],
+            [self.recipes[3].id, self.recipes[2].id],
+        )
+
+
+class RecipeQueryPlanTests(TestCase):
+    """Test the recipe filters are planned against their indexes"""
+
+    def setUp(self):
+        self.user = create_user(email='plan@example.com', password='testpass123')
+        self.tag = Tags.objects.create(user=self.user, name='Vegan')
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(self.tag)
+
+    def _explain(self, queryset):
+        """Return the query plan, keeping postgres off sequential scans"""
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def test_user_recipes_use_user_id_index(self):
+        """Test listing a user's recipes uses the (user, id) index"""
+        queryset = Recipe.objects.filter(user=self.user).order_by('-id')
+
+        self.assertIn('recipe_user_id_idx', self._explain(queryset))
+
+    def test_match_all_tags_uses_reverse_index(self):
+        """Test the match-all tag filter uses the reverse through index"""
+        queryset = RecipeViewSet()._filter_related(
+            Recipe.objects.filter(user=self.user), 'tags', [self.tag.id],
+            match_all=True,
+        )
+
+        self.assertIn('recipe_tags_reverse_idx', self._explain(queryset))
+
+
+class RecipeCacheTests(TestCase):
+    """Test caching of the recipe list"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='cache@example.com', password='testpass123')
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(user=self.user)
+
+    def test_repeated_list_served_from_cache(self):
+        """Test an unchanged list is not queried twice"""
+        first = self.client.get(RECIPE_URL)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(RECIPE_URL)
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.data, second.data)
+
+    def test_equivalent_params_share_cache(self):
+        """Test id lists are normalized before building the cache key"""
+        tag1 = Tags.objects.create(user=self.user, name='Vegan')
+        tag2 = Tags.objects.create(user=self.user, name='Spicy')
+        self.client.get(RECIPE_URL, {'tags': f'{tag1.id},{tag2.id}'})
+
+        with self.assertNumQueries(0):
+            self.client.get(RECIPE_URL, {'tags': f'{tag2.id},{tag1.id}'})
+
+    def test_create_invalidates_cache(self):
+        """Test creating a recipe through the API refreshes the list"""
+        self.client.get(RECIPE_URL)
+        payload = {'title': 'Soup', 'time_minutes': 20, 'price': Decimal('3.00')}
+        self.client.post(RECIPE_URL, payload)
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(len(res.data), 2)
+
+    def test_update_invalidates_cache(self):
+        """Test updating a recipe refreshes the list"""
+        self.client.get(RECIPE_URL)
+        self.client.patch(detail_url(self.recipe.id), {'title': 'New title'})
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.data[0]['title'], 'New title')
+
+    def test_delete_invalidates_cache(self):
+        """Test deleting a recipe refreshes the list"""
+        self.client.get(RECIPE_URL)
+        self.client.delete(detail_url(self.recipe.id))
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.data, [])
+
+    def test_m2m_change_invalidates_cache(self):
+        """Test adding and removing tags refreshes the list"""
+        tag = Tags.objects.create(user=self.user, name='Vegan')
+        self.client.get(RECIPE_URL)
+        self.recipe.tags.add(tag)
+
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.data[0]['tags'], [{'id': tag.id, 'name': 'Vegan'}])
+
+        self.recipe.tags.remove(tag)
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.data[0]['tags'], [])
+
+    def test_cache_is_per_user(self):
+        """Test cached lists are never served to another user"""
+        self.client.get(RECIPE_URL)
+        other_user = create_user(email='other@example.com', password='testpass123')
+        self.client.force_authenticate(other_user)
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.data, [])
+
+    def test_cache_is_per_renderer(self):
+        """Test the browsable API's paginated list is not served as JSON"""
+        res = self.client.get(RECIPE_URL, HTTP_ACCEPT='text/html')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.data[0]['id'], self.recipe.id)
+        self.assertNotIn('results', res.data)
+
+
+class RecipeConditionalGetTests(TestCase):
+    """Test ETag and Last-Modified handling for recipes"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='etag@example.com', password='testpass123')
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(user=self.user)
+
+    def test_retrieve_not_modified_with_etag(self):
+        """Test retrieving an unchanged recipe with its ETag returns 304"""
+        url = detail_url(self.recipe.id)
+        res = self.client.get(url)
+        self.assertIn('ETag', res)
+        self.assertIn('Last-Modified', res)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(url, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_retrieve_not_modified_since(self):
+        """Test If-Modified-Since returns 304 for an unchanged recipe"""
+        url = detail_url(self.recipe.id)
+        res = self.client.get(url)
+
+        res = self.client.get(url, HTTP_IF_MODIFIED_SINCE=res['Last-Modified'])
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_retrieve_modified_after_tag_added(self):
+        """Test adding a tag changes the recipe ETag"""
+        url = detail_url(self.recipe.id)
+        etag = self.client.get(url)['ETag']
+        self.recipe.tags.add(Tags.objects.create(user=self.user, name='Vegan'))
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_retrieve_modified_after_tag_renamed(self):
+        """Test renaming an attached tag changes the recipe ETag"""
+        tag = Tags.objects.create(user=self.user, name='Vegan')
+        self.recipe.tags.add(tag)
+        url = detail_url(self.recipe.id)
+        etag = self.client.get(url)['ETag']
+        tag.name = 'Vegetarian'
+        tag.save()
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_list_not_modified(self):
+        """Test listing unchanged recipes with the list ETag returns 304"""
+        etag = self.client.get(RECIPE_URL)['ETag']
+
+        res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_modified_after_delete(self):
+        """Test deleting a recipe changes the list ETag"""
+        create_recipe(user=self.user, title='Second recipe')
+        etag = self.client.get(RECIPE_URL)['ETag']
+        self.recipe.delete()
+
+        res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 1)
+
+
+@override_settings(IMAGE_PROCESSING_ASYNC=True)
+class ImageDeduplicationTests(TestCase):
+    """Test recipe images are stored once per distinct content"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='dedupe@example.com', password='testpass123')
+        self.client.force_authenticate(self.user)
+
+    def _upload(self, recipe, color):
+        """upload a solid color image to a recipe"""
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            Image.new('RGB', (10, 10), color).save(image_file, format='JPEG')
+            image_file.seek(0)
+            res = self.client.post(
+                image_upload_url(recipe.id), {'image': image_file},
+                format='multipart',
+            )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        recipe.refresh_from_db()
+        return recipe
+
+    def test_same_image_stored_once(self):
+        """Test uploading the same image to two recipes shares one blob"""
+        r1 = self._upload(create_recipe(user=self.user), 'red')
+        r2 = self._upload(create_recipe(user=self.user), 'red')
+        self.addCleanup(r1.image.delete, save=False)
+
+        self.assertEqual(r1.image_blob_id, r2.image_blob_id)
+        self.assertEqual(r1.image.name, r2.image.name)
+        blob = ImageBlob.objects.get(pk=r1.image_blob_id)
+        self.assertEqual(blob.refcount, 2)
+        self.assertTrue(r1.image.storage.exists(blob.name))
+
+    def test_blob_collected_when_last_recipe_deleted(self):
+        """Test a blob and its file go once no recipe references them"""
+        r1 = self._upload(create_recipe(user=self.user), 'blue')
+        r2 = self._upload(create_recipe(user=self.user), 'blue')
+        storage = r1.image.storage
+        blob = ImageBlob.objects.get(pk=r1.image_blob_id)
+
+        r1.delete()
+        blob.refresh_from_db()
+        self.assertEqual(blob.refcount, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            r2.delete()
+        self.assertFalse(ImageBlob.objects.filter(pk=blob.pk).exists())
+        self.assertFalse(storage.exists(blob.name))
+
+    def test_replacing_image_releases_old_blob(self):
+        """Test uploading a new image drops the reference to the old one"""
+        recipe = self._upload(create_recipe(user=self.user), 'green')
+        old_blob_id = recipe.image_blob_id
+
+        recipe = self._upload(recipe, 'yellow')
+        self.addCleanup(recipe.image.delete, save=False)
+
+        self.assertNotEqual(recipe.image_blob_id, old_blob_id)
+        self.assertFalse(ImageBlob.objects.filter(pk=old_blob_id).exists())
+
+
+class RecipeBulkApiTests(TestCase):
+    """Test the bulk recipe endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='bulk@example.com', password='testpass123')
+        self.client.force_authenticate(self.user)
+
+    def _payload(self, count, prefix='Recipe'):
+        """return a bulk payload of recipes sharing tags and ingredients"""
+        return [
+            {
+                'title': f'{prefix} {i}',
+                'time_minutes': 10,
+                'price': '5.00',
+                'tags': [{'name': 'Dinner'}, {'name': f'Tag {i}'}],
+                'ingredients': [{'name': 'Salt'}],
+            }
+            for i in range(count)
+        ]
+
+    def test_bulk_create(self):
+        """Test creating many recipes with nested tags and ingredients"""
+        res = self.client.post(BULK_URL, self._payload(3), format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data), 3)
+        recipes = Recipe.objects.filter(user=self.user)
+        self.assertEqual(recipes.count(), 3)
+        self.assertEqual(Tags.objects.filter(user=self.user).count(), 4)
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 1)
+        for recipe in recipes:
+            self.assertEqual(recipe.tags.count(), 2)
+            self.assertEqual(recipe.ingredients.count(), 1)
+
+    @skipUnless(
+        connection.features.can_return_rows_from_bulk_insert,
+        'bulk inserts fall back to a save() per row',
+    )
+    def test_bulk_create_query_count_constant(self):
+        """Test the number of queries does not grow with the payload"""
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(BULK_URL, self._payload(2, 'Small'), format='json')
+        with CaptureQueriesContext(connection) as large:
+            self.client.post(BULK_URL, self._payload(50, 'Large'), format='json')
+
+        self.assertEqual(len(small), len(large))
+
+    def test_bulk_create_reports_item_errors(self):
+        """Test invalid items are reported by position and nothing is saved"""
+        payload = self._payload(2)
+        del payload[1]['title']
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('title', res.data[1])
+        self.assertFalse(Recipe.objects.filter(user=self.user).exists())
+
+    def test_bulk_update(self):
+        """Test updating many recipes at once"""
+        r1 = create_recipe(user=self.user, title='Old 1')
+        r2 = create_recipe(user=self.user, title='Old 2')
+        r2.tags.add(Tags.objects.create(user=self.user, name='Breakfast'))
+        payload = [
+            {'id': r1.id, 'title': 'New 1'},
+            {'id': r2.id, 'tags': [{'name': 'Lunch'}]},
+        ]
+
+        res = self.client.patch(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        r1.refresh_from_db()
+        r2.refresh_from_db()
+        self.assertEqual(r1.title, 'New 1')
+        self.assertEqual(r2.title, 'Old 2')
+        self.assertEqual([t.name for t in r2.tags.all()], ['Lunch'])
+
+    def test_bulk_update_other_users_recipe(self):
+        """Test bulk updates cannot touch another user's recipes"""
+        other = create_user(email='other@example.com', password='testpass123')
+        recipe = create_recipe(user=other, title='Theirs')
+
+        res = self.client.patch(
+            BULK_URL, [{'id': recipe.id, 'title': 'Mine'}], format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('id', res.data[0])
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'Theirs')
+
+    def test_bulk_update_rejects_boolean_id(self):
+        """Test a boolean id is not taken for the recipe with id 1"""
+        recipe = create_recipe(user=self.user, title='Old', id=1)
+
+        res = self.client.patch(
+            BULK_URL, [{'id': True, 'title': 'New'}], format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('id', res.data[0])
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, 'Old')
+
+    def test_bulk_delete(self):
+        """Test deleting many recipes, ignoring other users' ids"""
+        r1 = create_recipe(user=self.user)
+        r2 = create_recipe(user=self.user)
+        other = create_user(email='other@example.com', password='testpass123')
+        r3 = create_recipe(user=other)
+
+        res = self.client.delete(
+            BULK_URL, {'ids': [r1.id, r2.id, r3.id]}, format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Recipe.objects.filter(user=self.user).exists())
+        self.assertTrue(Recipe.objects.filter(id=r3.id).exists())
+
+    def test_bulk_create_invalidates_list_cache(self):
+        """Test the cached recipe list reflects bulk writes"""
+        self.client.get(RECIPE_URL)
+        self.client.post(BULK_URL, self._payload(2), format='json')
+
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(len(res.data), 2)
+
+
+class RecipeExportTests(TestCase):
+    """Test streaming the recipe library export"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='export@example.com', password='testpass123')
+        self.client.force_authenticate(self.user)
+        self.r1 = create_recipe(user=self.user, title='First')
+        self.r1.tags.add(Tags.objects.create(user=self.user, name='Vegan'))
+        self.r1.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Salt'),
+            Ingredient.objects.create(user=self.user, name='Pepper'),
+        )
+        self.r2 = create_recipe(user=self.user, title='Second')
+        other = create_user(email='other@example.com', password='testpass123')
+        create_recipe(user=other, title='Not mine')
+
+    def _content(self, res):
+        return b''.join(res.streaming_content).decode()
+
+    def test_export_ndjson(self):
+        """Test exporting recipes as one JSON document per line"""
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in self._content(res).splitlines()]
+        self.assertEqual([row['title'] for row in rows], ['First', 'Second'])
+        self.assertEqual(rows[0]['price'], '5.50')
+        self.assertEqual(rows[0]['tags'][0]['name'], 'Vegan')
+        self.assertEqual(
+            sorted(i['name'] for i in rows[0]['ingredients']),
+            ['Pepper', 'Salt'],
+        )
+
+    def test_export_csv(self):
+        """Test exporting recipes as CSV"""
+        res = self.client.get(EXPORT_URL, {'output': 'csv'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        rows = list(csv.DictReader(io.StringIO(self._content(res))))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['tags'], 'Vegan')
+        self.assertEqual(
+            sorted(rows[0]['ingredients'].split('|')), ['Pepper', 'Salt'],
+        )
+
+    @override_settings(RECIPE_EXPORT_CHUNK_SIZE=1)
+    def test_export_prefetches_per_chunk(self):
+        """Test nested objects are fetched once per chunk, not per recipe"""
+        with CaptureQueriesContext(connection) as queries:
+            self._content(self.client.get(EXPORT_URL))
+
+        tag_queries = [q for q in queries if 'core_tags' in q['sql']]
+        self.assertEqual(len(tag_queries), 2)
+
+    def test_export_unknown_format(self):
+        """Test an unsupported export format is rejected"""
+        res = self.client.get(EXPORT_URL, {'output': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecipeSearchTests(TestCase):
+    """Test full-text search over recipes"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='search@example.com', password='testpass123')
+        self.client.force_authenticate(self.user)
+        self.curry = create_recipe(
+            user=self.user, title='Thai green curry',
+            description='Creamy coconut sauce',
+        )
+        self.curry.tags.add(Tags.objects.create(user=self.user, name='Spicy'))
+        self.curry.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Lemongrass')
+        )
+        self.soup = create_recipe(
+            user=self.user, title='Tomato soup', description='Simple lunch',
+        )
+
+    def _search(self, term):
+        res = self.client.get(RECIPE_URL, {'search': term})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [item['id'] for item in res.data['results']]
+
+    def test_search_title_and_description(self):
+        """Test searching matches words in titles and descriptions"""
+        self.assertEqual(self._search('curry'), [self.curry.id])
+        self.assertEqual(self._search('lunch'), [self.soup.id])
+
+    def test_search_tags_and_ingredients(self):
+        """Test searching matches the names of tags and ingredients"""
+        self.assertEqual(self._search('spicy'), [self.curry.id])
+        self.assertEqual(self._search('lemongrass'), [self.curry.id])
+
+    def test_search_limited_to_user(self):
+        """Test other users' recipes are never returned"""
+        other = create_user(email='other@example.com', password='testpass123')
+        create_recipe(user=other, title='Red curry')
+
+        self.assertEqual(self._search('curry'), [self.curry.id])
+
+    def test_search_uses_offset_pagination(self):
+        """Test ranked results are offset paginated, even if cursor is asked"""
+        res = self.client.get(
+            RECIPE_URL, {'search': 'soup', 'pagination': 'cursor'},
+        )
+
+        self.assertEqual(res.data['count'], 1)
+
+    @skipUnless(connection.vendor == 'postgresql', 'needs PostgreSQL')
+    def test_search_tolerates_typos(self):
+        """Test a misspelt title still matches through trigram similarity"""
+        self.assertEqual(self._search('tomatoe soupp'), [self.soup.id])
+
+    @skipUnless(connection.vendor == 'postgresql', 'needs PostgreSQL')
+    def test_search_ranks_title_matches_first(self):
+        """Test a title match outranks a description match"""
+        coconut = create_recipe(user=self.user, title='Coconut rice')
+
+        self.assertEqual(self._search('coconut'), [coconut.id, self.curry.id])
+
+    @skipUnless(connection.vendor == 'postgresql', 'needs PostgreSQL')
+    def test_search_follows_tag_rename(self):
+        """Test renaming a tag refreshes the recipes embedding it"""
+        tag = self.curry.tags.get()
+        tag.name = 'Fiery'
+        tag.save()
+
+        self.assertEqual(self._search('fiery'), [self.curry.id])
+        self.assertEqual(self._search('spicy'), [])
+
+    @skipUnless(connection.vendor == 'postgresql', 'needs PostgreSQL')
+    def test_search_follows_reverse_clear(self):
+        """Test clearing a tag's recipes refreshes those recipes"""
+        self.curry.tags.get().recipe_set.clear()
+
+        self.assertEqual(self._search('spicy'), [])
@@ -2,7 +2,7 @@
 
 from django.contrib.auth import get_user_model
 from django.urls import reverse
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
 from rest_framework import status
 from rest_framework.test import APIClient
@@ -13,6 +13,7 @@ from core.models import Recipe, Tags
 from recipe.serializers import TagSerializer   
 
 TAGS_URL = reverse('recipe:tag-list')
+AUTOCOMPLETE_URL = reverse('recipe:tag-autocomplete')
 def create_user(**params):
     return get_user_model().objects.create_user(**params)
 
@@ -52,6 +53,19 @@ class PrivateTagsApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data)
 
+    def test_retrieve_tags_cursor_paginated(self):
+        """Test paging through tags with a cursor"""
+        for name in ['Breakfast', 'Lunch', 'Dinner']:
+            Tags.objects.create(user=self.user,name=name)
+
+        res = self.client.get(TAGS_URL, {'pagination':'cursor','page_size':2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([t['name'] for t in res.data['results']], ['Lunch', 'Dinner'])
+        res = self.client.get(res.data['next'])
+        self.assertEqual([t['name'] for t in res.data['results']], ['Breakfast'])
+        self.assertIsNone(res.data['next'])
+
     def test_tags_limited_to_user(self):
         """Test that tags returned are for the authenticated user"""
         other_user = create_user(email='other@example.com',password='testpass123')
@@ -75,6 +89,28 @@ class PrivateTagsApiTests(TestCase):
         tag.refresh_from_db()
         self.assertEqual(tag.name, payload['name'])
 
+    def test_update_tag_duplicate_name(self):
+        """Test renaming a tag to an existing name fails"""
+        Tags.objects.create(user=self.user,name='Dessert')
+        tag = Tags.objects.create(user=self.user,name='After Dinner')
+
+        url = detail_url(tag.id)
+        res = self.client.patch(url, {'name':'Dessert'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, 'After Dinner')
+
+    def test_update_tag_refreshes_cached_list(self):
+        """Test the cached tag list is invalidated by an update"""
+        tag = Tags.objects.create(user=self.user,name='After Dinner')
+        self.client.get(TAGS_URL)
+
+        self.client.patch(detail_url(tag.id), {'name':'Dessert'})
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.data[0]['name'], 'Dessert')
+
     def test_delete_tag(self):
         """test deleteing a tag"""
         tag = Tags.objects.create(user=self.user,name='Breakfast') #create tag
@@ -126,4 +162,142 @@ class PrivateTagsApiTests(TestCase):
 
         res = self.client.get(TAGS_URL, {'assigned_only':1})
 
-        self.assertEqual(len(res.data),1)
\ No newline at end of file
+        self.assertEqual(len(res.data),1)
+
+class TagAutocompleteTests(TestCase):
+    """Test autocompleting tag names"""
+
+    def setUp(self):
+        self.user = create_user(email='complete@example.com', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.dinner = Tags.objects.create(user=self.user, name='Dinner')
+        self.dessert = Tags.objects.create(user=self.user, name='Dessert')
+        Tags.objects.create(user=self.user, name='Breakfast')
+        recipe = Recipe.objects.create(
+            user=self.user, title='Pie', time_minutes=30, price=Decimal('4.00'),
+        )
+        recipe.tags.add(self.dessert)
+
+    def test_autocomplete_ranks_by_usage(self):
+        """Test prefix matches come back most used first"""
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'd'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(item['name'], item['usage']) for item in res.data],
+            [('Dessert', 1), ('Dinner', 0)],
+        )
+
+    def test_autocomplete_limit_and_case(self):
+        """Test prefixes are case-insensitive and results limited"""
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'DE', 'limit': 1})
+
+        self.assertEqual([item['id'] for item in res.data], [self.dessert.id])
+
+    def test_autocomplete_served_from_memory(self):
+        """Test repeated lookups do not hit the database"""
+        self.client.get(AUTOCOMPLETE_URL, {'q': 'd'})
+
+        with self.assertNumQueries(0):
+            res = self.client.get(AUTOCOMPLETE_URL, {'q': 'di'})
+
+        self.assertEqual([item['name'] for item in res.data], ['Dinner'])
+
+    def test_autocomplete_sees_writes(self):
+        """Test new and renamed tags show up straight away"""
+        self.client.get(AUTOCOMPLETE_URL, {'q': 'd'})
+        Tags.objects.create(user=self.user, name='Drinks')
+        self.dinner.name = 'Supper'
+        self.dinner.save()
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'd'})
+
+        self.assertEqual(
+            [item['name'] for item in res.data], ['Dessert', 'Drinks'],
+        )
+
+    @override_settings(AUTOCOMPLETE_INDEX_MAX_NAMES=1)
+    def test_autocomplete_large_vocabulary_uses_database(self):
+        """Test users with too many names are answered by a query"""
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'd'})
+
+        self.assertEqual(
+            [item['name'] for item in res.data], ['Dessert', 'Dinner'],
+        )
+
+    def test_autocomplete_limited_to_user(self):
+        """Test other users' tags are not suggested"""
+        other = create_user(email='other@example.com', password='testpass123')
+        Tags.objects.create(user=other, name='Dumplings')
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'du'})
+
+        self.assertEqual(res.data, [])
+
+
+class TagRecipeCountTests(TestCase):
+    """Test the maintained recipe counts of tags"""
+
+    def setUp(self):
+        self.user = create_user(email='count@example.com', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = Tags.objects.create(user=self.user, name='Vegan')
+        self.recipes = [
+            Recipe.objects.create(
+                user=self.user, title=f'Recipe {i}',
+                time_minutes=5, price=Decimal('3.00'),
+            )
+            for i in range(2)
+        ]
+
+    def _count(self):
+        self.tag.refresh_from_db()
+        return self.tag.recipe_count
+
+    def test_count_follows_links(self):
+        """Test linking, unlinking and deleting recipes keeps the count"""
+        for recipe in self.recipes:
+            recipe.tags.add(self.tag)
+        self.assertEqual(self._count(), 2)
+
+        self.recipes[0].tags.remove(self.tag)
+        self.assertEqual(self._count(), 1)
+
+        self.recipes[1].delete()
+        self.assertEqual(self._count(), 0)
+
+    def test_count_follows_bulk_links(self):
+        """Test links inserted without m2m signals are counted"""
+        Recipe.tags.through.objects.bulk_create([
+            Recipe.tags.through(recipe=recipe, tags=self.tag)
+            for recipe in self.recipes
+        ])
+
+        self.assertEqual(self._count(), 2)
+
+    def test_order_by_popularity(self):
+        """Test tags can be listed most used first"""
+        popular = Tags.objects.create(user=self.user, name='Quick')
+        for recipe in self.recipes:
+            recipe.tags.add(popular)
+        self.recipes[0].tags.add(self.tag)
+        Tags.objects.create(user=self.user, name='Unused')
+
+        res = self.client.get(TAGS_URL, {'ordering': 'popular'})
+
+        self.assertEqual(
+            [item['name'] for item in res.data], ['Quick', 'Vegan', 'Unused'],
+        )
+
+    def test_popular_pages_by_offset(self):
+        """Test popular ordering falls back from cursor to offset pages"""
+        self.recipes[0].tags.add(Tags.objects.create(user=self.user, name='A'))
+
+        res = self.client.get(
+            TAGS_URL, {'ordering': 'popular', 'pagination': 'cursor'},
+        )
+
+        self.assertIn('count', res.data)
+        self.assertEqual(res.data['results'][0]['name'], 'A')
@@ -0,0 +1,146 @@
+"""streaming upload handler writing recipe images straight to storage"""
+import hashlib
+import io
+import os
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from django.utils.translation import gettext as _
+from PIL import Image, UnidentifiedImageError
+
+from core.models import Recipe, recipe_image_file_path
+
+# Bytes buffered before the image header is checked
+HEADER_BYTES = 256 * 1024
+
+
+class StoredUploadedFile(UploadedFile):
+    """An upload that was already written to its final storage location"""
+
+    def __init__(self, file, storage_name, content_hash, **kwargs):
+        super().__init__(file, **kwargs)
+        self.storage_name = storage_name
+        self.content_hash = content_hash
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def supports_streaming(storage):
+    """Return whether uploads can be written straight into the storage"""
+    try:
+        storage.path('')
+    except NotImplementedError:
+        return False
+    return True
+
+
+class RecipeImageUploadHandler(FileUploadHandler):
+    """Stream the `image` field of a multipart upload into storage.
+
+    Chunks are hashed and written to the final recipe_image_file_path
+    location as they arrive, so memory use does not grow with the file.
+    Writing stops, and what was written is removed, as soon as the upload
+    exceeds the size limit or its first bytes are not an image Pillow
+    recognises; the rest of the body is still read so the client gets the
+    error response.
+    """
+    field_name = 'image'
+
+    def __init__(self, request=None, max_size=None):
+        super().__init__(request)
+        self.storage = Recipe._meta.get_field('image').storage
+        self.max_size = max_size or settings.RECIPE_IMAGE_MAX_UPLOAD_SIZE
+        self.error = None
+        self.storage_name = None
+        self.destination = None
+        self.active = False
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        # Other file fields, and repeats of this one, are dropped.
+        self.active = field_name == self.field_name and not self.storage_name
+        if not self.active:
+            return
+
+        name = recipe_image_file_path(None, self.file_name)
+        self.storage_name = self.storage.get_available_name(name)
+        path = self.storage.path(self.storage_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.destination = open(path, 'wb')
+        self.hasher = hashlib.sha256()
+        self.header = b''
+        self.header_checked = False
+        self.size = 0
+
+    def _header_valid(self):
+        """Lazily open the buffered first bytes as an image"""
+        self.header_checked = True
+        try:
+            Image.open(io.BytesIO(self.header))
+        except (UnidentifiedImageError, OSError):
+            return False
+        finally:
+            self.header = b''
+        return True
+
+    def reject(self, message):
+        """Drop the upload and remove what was written so far"""
+        self.error = message
+        self.active = False
+        self.discard()
+
+    def fail(self, message):
+        """Reject the upload and skip the rest of the request body"""
+        self.reject(message)
+        raise StopUpload(connection_reset=False)
+
+    def discard(self):
+        """Remove the partially or fully written upload"""
+        if self.destination is not None:
+            self.destination.close()
+        if self.storage_name:
+            self.storage.delete(self.storage_name)
+            self.storage_name = None
+
+    def upload_interrupted(self):
+        """Remove the partial file of a body that ended mid-upload"""
+        if self.active:
+            self.active = False
+            self.discard()
+
+    def receive_data_chunk(self, raw_data, start):
+        if not self.active:
+            return raw_data
+
+        self.size += len(raw_data)
+        if self.size > self.max_size:
+            self.fail(_('Image exceeds the maximum upload size.'))
+        if not self.header_checked:
+            self.header += raw_data
+            if len(self.header) >= HEADER_BYTES and not self._header_valid():
+                self.fail(_('Upload a valid image.'))
+        self.hasher.update(raw_data)
+        self.destination.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if not self.active:
+            return None
+
+        if not self.header_checked and not self._header_valid():
+            self.reject(_('Upload a valid image.'))
+            return None
+        self.active = False
+        self.destination.close()
+        return StoredUploadedFile(
+            open(self.storage.path(self.storage_name), 'rb'),
+            storage_name=self.storage_name,
+            content_hash=self.hasher.hexdigest(),
+            name=self.file_name,
+            content_type=self.content_type,
+            size=file_size,
+            charset=self.charset,
+            content_type_extra=self.content_type_extra,
+        )
@@ -1,5 +1,6 @@
 from django.urls import reverse, path, include
 from rest_framework.routers import DefaultRouter
+from core.async_views import async_read_patterns
 from recipe import views
 
 router = DefaultRouter()
@@ -8,8 +9,13 @@ router.register('tags', views.TagViewSet, basename='tag')
 router.register('ingredients', views.IngredientViewSet, basename='ingredient')
 app_name = 'recipe'
 
+# Served by coroutine views under ASGI
+ASYNC_READ_ROUTES = {
+    'recipe-list', 'recipe-detail', 'tag-list', 'ingredient-list',
+}
+
 
 
 urlpatterns = [
-    path('', include(router.urls)),
+    path('', include(async_read_patterns(router.urls, ASYNC_READ_ROUTES))),
 ]
\ No newline at end of file
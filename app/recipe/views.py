@@ -4,13 +4,30 @@ from drf_spectacular.utils import (
     OpenApiParameter,
     OpenApiTypes,
 )
+from django.conf import settings
+from django.db.models import Count, Exists, OuterRef, Prefetch
+from django.http import StreamingHttpResponse
+from django.utils.translation import gettext as _
 from rest_framework import (viewsets, mixins,status)
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 from core.models import Recipe, Tags, Ingredient
 from recipe import serializers
+from user.authentication import CachedTokenAuthentication
+from recipe import export as library_export
+from recipe.cache import CachedListMixin
+from recipe.conditional import ConditionalListMixin, ConditionalRetrieveMixin
+from recipe.images import delete_variants, schedule_processing
+from recipe.uploads import RecipeImageUploadHandler, supports_streaming
+from recipe.pagination import (
+    POPULAR,
+    POPULAR_ORDERING,
+    AttrPagination,
+    RecipePagination,
+)
+from recipe.search import search_recipes
+from recipe import autocomplete as name_autocomplete
 
 
 @extend_schema_view(
@@ -21,34 +38,118 @@ from recipe import serializers
                 OpenApiTypes.STR,
                 description='Comma separated list of IDs to filter',
             ),
-            OpenApiParameter('ingredients',OpenApiTypes.STR, description="Comma separated list of IDs to filter",)
+            OpenApiParameter('ingredients',OpenApiTypes.STR, description="Comma separated list of IDs to filter",),
+            OpenApiParameter(
+                'tags_mode',
+                OpenApiTypes.STR, enum=['any', 'all'],
+                description=(
+                    'Match recipes with any (default) or all of the tags'
+                ),
+            ),
+            OpenApiParameter(
+                'ingredients_mode',
+                OpenApiTypes.STR, enum=['any', 'all'],
+                description=(
+                    'Match recipes with any (default) or all of the '
+                    'ingredients'
+                ),
+            ),
+            OpenApiParameter(
+                'search',
+                OpenApiTypes.STR,
+                description='Full-text search over titles, descriptions, '
+                            'tags and ingredients, best matches first',
+            ),
         ]
     )
 )
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    CachedListMixin,
+    ConditionalListMixin,
+    ConditionalRetrieveMixin,
+    viewsets.ModelViewSet,
+):
     "view for manage recipe APIs"
     serializer_class = serializers.RecipeSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = RecipePagination
+    LIST_FIELDS = (
+        'id', 'user', 'title', 'time_minutes', 'price', 'link', 'description',
+    )
 
     def _params_to_ints(self,qs):
         """Convert a list of strings to integers"""
         return [int(str_id) for str_id in qs.split(',')]
 
+    def _get_prefetches(self):
+        """Return the prefetches for the nested tags and ingredients"""
+        return (
+            Prefetch('tags', queryset=Tags.objects.only('id', 'name')),
+            Prefetch(
+                'ingredients',
+                queryset=Ingredient.objects.only('id', 'name'),
+            ),
+        )
+
+    def _optimize_queryset(self, queryset):
+        """Load only what the serializer for the current action reads"""
+        if self.action == 'list':
+            return queryset.only(*self.LIST_FIELDS).prefetch_related(
+                *self._get_prefetches()
+            )
+        if self.action == 'retrieve':
+            return queryset.defer('search_vector').prefetch_related(
+                *self._get_prefetches()
+            )
+        return queryset
+
+    def _filter_related(self, queryset, field_name, ids, match_all=False):
+        """Filter recipes linked to any or all of the ids through field_name.
+
+        Both modes query the through table as a subquery instead of joining
+        it, so recipes are never fanned out and need no DISTINCT.
+        """
+        field = Recipe._meta.get_field(field_name)
+        target = f'{field.m2m_reverse_field_name()}_id'
+        links = field.remote_field.through.objects.filter(
+            **{f'{target}__in': ids}
+        )
+        if match_all:
+            matching = links.values('recipe_id').annotate(
+                matched=Count(target, distinct=True)
+            ).filter(matched=len(set(ids))).values('recipe_id')
+            return queryset.filter(id__in=matching)
+
+        return queryset.filter(
+            Exists(links.filter(recipe_id=OuterRef('pk')))
+        )
+
     def get_queryset(self):
         """Retrieve recipes for authenticated user"""
-        tags = self.request.query_params.get('tags')
-        ingredients = self.request.query_params.get('ingredients')
-        queryset = self.queryset
+        params = self.request.query_params
+        tags = params.get('tags')
+        ingredients = params.get('ingredients')
+        queryset = self._optimize_queryset(self.queryset)
         if tags:
             tags_id = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tags_id)
+            queryset = self._filter_related(
+                queryset, 'tags', tags_id,
+                match_all=params.get('tags_mode') == 'all',
+            )
 
         if ingredients:
             ingredients_id = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredients_id)
-        return queryset.filter(user=self.request.user).distinct().order_by('-id')
+            queryset = self._filter_related(
+                queryset, 'ingredients', ingredients_id,
+                match_all=params.get('ingredients_mode') == 'all',
+            )
+        queryset = queryset.filter(user=self.request.user)
+        term = params.get('search', '').strip()
+        if term:
+            return search_recipes(queryset, term)
+        return queryset.order_by('-id')
     
     def get_serializer_class(self): 
         """return the serializer class for request"""
@@ -56,29 +157,178 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return serializers.RecipeDetailSerializer
         elif self.action == 'upload_image':
             return serializers.RecipeImageSerializer
+        elif self.action == 'bulk' and self.request.method == 'DELETE':
+            return serializers.RecipeBulkDeleteSerializer
         
         return self.serializer_class
     def perform_create(self, serializer):
         """create a new recipe"""
         serializer.save(user=self.request.user)
 
+    def _bulk_response(self, recipes, status_code):
+        """Serialize written recipes, prefetching their nested objects"""
+        queryset = Recipe.objects.filter(
+            id__in=[recipe.id for recipe in recipes]
+        ).prefetch_related(*self._get_prefetches()).order_by('id')
+        serializer = serializers.RecipeSerializer(
+            queryset, many=True, context=self.get_serializer_context(),
+        )
+        return Response(serializer.data, status=status_code)
+
+    def _bulk_items(self, request):
+        """Return the list payload of a bulk request, or an error response"""
+        items = request.data
+        if not isinstance(items, list) or not items:
+            msg = _('Expected a non-empty list of recipes.')
+            return None, Response(
+                {'non_field_errors': [msg]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(items) > settings.RECIPE_BULK_MAX_ITEMS:
+            msg = _('At most %(max)d recipes can be written at once.') % {
+                'max': settings.RECIPE_BULK_MAX_ITEMS,
+            }
+            return None, Response(
+                {'non_field_errors': [msg]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return items, None
+
+    def _bulk_create(self, request):
+        items, error = self._bulk_items(request)
+        if error is not None:
+            return error
+
+        serializer = self.get_serializer(data=items, many=True)
+        serializer.is_valid(raise_exception=True)
+        recipes = serializer.save(user=request.user)
+        return self._bulk_response(recipes, status.HTTP_201_CREATED)
+
+    def _bulk_update(self, request):
+        items, error = self._bulk_items(request)
+        if error is not None:
+            return error
+
+        # bool is an int subclass and True == 1, so check the exact type
+        ids = [
+            item.get('id') if isinstance(item, dict) else None
+            for item in items
+        ]
+        ids = [i if type(i) is int else None for i in ids]
+        recipes = Recipe.objects.filter(
+            user=request.user,
+            id__in=[i for i in ids if i is not None],
+        ).in_bulk()
+        errors = []
+        seen = set()
+        for recipe_id in ids:
+            if recipe_id not in recipes:
+                errors.append({'id': [_('Recipe not found.')]})
+            elif recipe_id in seen:
+                errors.append({'id': [_('Recipe listed more than once.')]})
+            else:
+                errors.append({})
+            seen.add(recipe_id)
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = self.get_serializer(
+            [recipes[recipe_id] for recipe_id in ids],
+            data=items,
+            many=True,
+            partial=True,
+        )
+        serializer.is_valid(raise_exception=True)
+        recipes = serializer.save()
+        return self._bulk_response(recipes, status.HTTP_200_OK)
+
+    def _bulk_destroy(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        self.get_queryset().filter(
+            id__in=serializer.validated_data['ids'],
+        ).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(methods=['POST', 'PATCH', 'DELETE'], detail=False, url_path='bulk')
+    def bulk(self, request):
+        """create, update or delete many recipes in one transaction
+
+        POST and PATCH take a list of recipes (PATCH items carry their id);
+        errors are reported per item, aligned with the payload. DELETE takes
+        {"ids": [...]}.
+        """
+        if request.method == 'POST':
+            return self._bulk_create(request)
+        if request.method == 'PATCH':
+            return self._bulk_update(request)
+        return self._bulk_destroy(request)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'output',
+                OpenApiTypes.STR, enum=list(library_export.FORMATS),
+                description='Export format, ndjson (default) or csv',
+            ),
+        ]
+    )
+    @action(methods=['GET'], detail=False, url_path='export')
+    def export(self, request):
+        """stream the user's whole recipe library as NDJSON or CSV"""
+        output = request.query_params.get('output', library_export.NDJSON)
+        if output not in library_export.FORMATS:
+            return Response(
+                {'output': [_('Unsupported export format.')]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        rows = library_export.iter_recipe_rows(
+            request.user, chunk_size=settings.RECIPE_EXPORT_CHUNK_SIZE,
+        )
+        response = StreamingHttpResponse(
+            library_export.render(rows, output),
+            content_type=library_export.FORMATS[output],
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="recipes.{output}"'
+        )
+        return response
+
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
-        """upload an image to recipe"""
+        """upload an image to recipe, deriving its sizes in the background"""
         recipe = self.get_object()
+        handler = None
+        if supports_streaming(Recipe._meta.get_field('image').storage):
+            handler = RecipeImageUploadHandler(request._request)
+            request._request.upload_handlers = [handler]
+
         serializer = self.get_serializer(
             recipe,
             data=request.data
         )
+        if handler is not None and handler.error:
+            return Response(
+                {'image': [handler.error]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
         if serializer.is_valid():
-            serializer.save()
+            if recipe.image_variants and recipe.image_blob_id is None:
+                delete_variants(recipe)
+            serializer.save(
+                image_status=Recipe.IMAGE_PENDING,
+                image_variants={},
+            )
+            schedule_processing(serializer.instance)
             return Response(
                 serializer.data,
                 status=status.HTTP_200_OK
             )
         else:
-            print(serializer.errors)
+            if handler is not None:
+                handler.discard()
             return Response(
             serializer.errors,
             status=status.HTTP_400_BAD_REQUEST
@@ -90,14 +340,20 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 'assigned_only',
                 OpenApiTypes.INT, enum=[0, 1],
                 description='Filter by items assigned to recipes',
-            )
+            ),
+            OpenApiParameter(
+                'ordering',
+                OpenApiTypes.STR, enum=['name', POPULAR],
+                description='Order by name (default) or by number of recipes',
+            ),
         ]
     )
 )
-class BaseAttrViewSet(mixins.DestroyModelMixin,mixins.UpdateModelMixin,mixins.ListModelMixin,viewsets.GenericViewSet):
+class BaseAttrViewSet(CachedListMixin,ConditionalListMixin,mixins.DestroyModelMixin,mixins.UpdateModelMixin,mixins.ListModelMixin,viewsets.GenericViewSet):
     """base viewset for user owned recipe attributes"""
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = AttrPagination
     
     def get_queryset(self):
         """Return objects for the current authenticated user only"""
@@ -107,11 +363,49 @@ class BaseAttrViewSet(mixins.DestroyModelMixin,mixins.UpdateModelMixin,mixins.Li
         queryset = self.queryset
 
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+            queryset = queryset.filter(recipe_count__gt=0)
 
+        ordering = ('-name',)
+        if self.request.query_params.get('ordering') == POPULAR:
+            ordering = POPULAR_ORDERING
         return queryset.filter(
             user=self.request.user 
-        ).distinct().order_by('-name')
+        ).order_by(*ordering)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'q', OpenApiTypes.STR,
+                description='Case-insensitive name prefix',
+            ),
+            OpenApiParameter(
+                'limit', OpenApiTypes.INT,
+                description='Number of suggestions, at most '
+                            f'{settings.AUTOCOMPLETE_MAX_LIMIT}',
+            ),
+        ],
+        responses=serializers.AutocompleteSerializer(many=True),
+    )
+    @action(methods=['GET'], detail=False, url_path='autocomplete')
+    def autocomplete(self, request):
+        """names starting with ?q=, the most used first"""
+        params = request.query_params
+        try:
+            limit = int(
+                params.get('limit', settings.AUTOCOMPLETE_DEFAULT_LIMIT)
+            )
+        except ValueError:
+            return Response(
+                {'limit': [_('A valid integer is required.')]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        limit = max(1, min(limit, settings.AUTOCOMPLETE_MAX_LIMIT))
+        prefix = params.get('q', '').strip()
+        if not prefix:
+            return Response([])
+        return Response(name_autocomplete.autocomplete(
+            self.queryset.model, request.user.id, prefix, limit,
+        ))
 
 
 class TagViewSet(BaseAttrViewSet):
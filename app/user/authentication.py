@@ -0,0 +1,166 @@
+"""token authentication with a cached token to user lookup"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+# User fields kept in the cache; anything else is loaded lazily on access.
+USER_STATE_FIELDS = (
+    'id', 'email', 'name', 'is_active', 'is_staff', 'is_superuser',
+)
+
+
+class LRUCache:
+    """Thread-safe, size-bounded LRU mapping whose entries expire"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+local_cache = LRUCache(
+    settings.TOKEN_CACHE_LOCAL_SIZE, settings.TOKEN_CACHE_LOCAL_TTL,
+)
+stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name):
+    with _stats_lock:
+        stats[name] += 1
+
+
+def get_stats():
+    """Return a snapshot of the token cache hit/miss counters"""
+    with _stats_lock:
+        return dict(stats)
+
+
+def render():
+    """Return the token cache counters in the Prometheus text format"""
+    lines = []
+    for name, value in get_stats().items():
+        metric = f'token_cache_{name}_total'
+        lines.append(f'# HELP {metric} Token lookups counted as {name}')
+        lines.append(f'# TYPE {metric} counter')
+        lines.append(f'{metric} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def _shared_key(key):
+    return f'auth:token:{key}'
+
+
+def _version_key(key):
+    return f'auth:token:version:{key}'
+
+
+def invalidate_token(key):
+    """Drop a token from the shared and the local cache.
+
+    Shared entries are stored with the token's version, so bumping it also
+    voids state that a concurrent lookup read before the change and writes
+    back after it. Other processes keep their local copy for at most
+    TOKEN_CACHE_LOCAL_TTL.
+    """
+    # Outlives any entry written under the previous version.
+    cache.set(
+        _version_key(key), time.time_ns(), settings.TOKEN_CACHE_TIMEOUT * 2,
+    )
+    cache.delete(_shared_key(key))
+    local_cache.delete(key)
+
+
+def _user_state(user):
+    return {field: getattr(user, field) for field in USER_STATE_FIELDS}
+
+
+def _build_user(state):
+    """Return a user holding the cached fields, deferring the rest"""
+    model = get_user_model()
+    # from_db expects values in concrete field order
+    fields = [
+        f.attname for f in model._meta.concrete_fields if f.attname in state
+    ]
+    return model.from_db(
+        DEFAULT_DB_ALIAS, fields, [state[field] for field in fields],
+    )
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Drop-in TokenAuthentication that caches the token to user lookup"""
+
+    def get_user_state(self, key):
+        """Return the cached state of the token's user, loading on a miss"""
+        state = local_cache.get(key)
+        if state is not None:
+            _count('local_hits')
+            return state
+
+        shared = cache.get_many([_shared_key(key), _version_key(key)])
+        version = shared.get(_version_key(key))
+        entry = shared.get(_shared_key(key))
+        if entry is not None and entry[0] == version:
+            _count('shared_hits')
+            state = entry[1]
+        else:
+            _count('misses')
+            try:
+                token = Token.objects.select_related('user').get(key=key)
+            except Token.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            state = _user_state(token.user)
+            cache.set(
+                _shared_key(key), (version, state),
+                settings.TOKEN_CACHE_TIMEOUT,
+            )
+
+        local_cache.set(key, state)
+        return state
+
+    def authenticate_credentials(self, key):
+        state = self.get_user_state(key)
+        if not state['is_active']:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.'),
+            )
+
+        user = _build_user(state)
+        return (user, Token(key=key, user=user))
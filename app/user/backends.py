@@ -0,0 +1,35 @@
+"""authentication backend checking passwords off the request thread"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from user import passwords
+
+
+class PasswordPoolBackend(ModelBackend):
+    """ModelBackend whose password checks run on the password worker pool.
+
+    A correct password stored with an outdated hasher is upgraded on the
+    spot, like User.check_password does.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        UserModel = get_user_model()
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hash once anyway so unknown users take as long (#20760).
+            passwords.run(passwords.make, password)
+            return None
+        correct, upgraded = passwords.run(
+            passwords.check, password, user.password,
+        )
+        if upgraded:
+            user.password = upgraded
+            user.save(update_fields=['password'])
+        if correct and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,95 @@
+"""password checks run on a bounded pool of worker processes
+
+Hashing is deliberately slow CPU work that holds the GIL, so a burst of
+logins would stall every other request of a process. With
+PASSWORD_HASH_WORKERS > 0 checks run in separate processes instead; at
+most PASSWORD_HASH_QUEUE of them may be pending per process, and callers
+beyond that get PasswordCheckBusy rather than queueing without bound.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.contrib.auth import hashers
+
+_executor = None
+_slots = None
+_lock = threading.Lock()
+
+
+class PasswordCheckBusy(Exception):
+    """Too many password checks are already pending"""
+
+
+def _init_worker():
+    # Workers are spawned, not forked from a threaded server, so they
+    # load the settings and hashers themselves.
+    django.setup()
+
+
+def check(password, encoded):
+    """Return (correct, new encoded password or None).
+
+    The new hash is set when the password is correct but stored with an
+    outdated algorithm or work factor.
+    """
+    upgraded = []
+    correct = hashers.check_password(
+        password, encoded,
+        setter=lambda raw: upgraded.append(hashers.make_password(raw)),
+    )
+    return correct, upgraded[0] if upgraded else None
+
+
+def make(password):
+    """Return password hashed with the preferred hasher"""
+    return hashers.make_password(password)
+
+
+def get_executor():
+    """Return the worker pool, creating it on first use"""
+    global _executor, _slots
+    with _lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(settings.PASSWORD_HASH_QUEUE)
+        return _executor
+
+
+def _reset(executor):
+    global _executor
+    with _lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False)
+
+
+def run(func, *args):
+    """Call func(*args) on the worker pool, or inline without workers"""
+    if not settings.PASSWORD_HASH_WORKERS:
+        return func(*args)
+    get_executor()
+    slots = _slots
+    if not slots.acquire(timeout=settings.PASSWORD_HASH_TIMEOUT):
+        raise PasswordCheckBusy()
+    try:
+        for retry in (True, False):
+            executor = get_executor()
+            try:
+                return executor.submit(func, *args).result()
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); retry once on a
+                # fresh pool, then turn the login away rather than fail it.
+                _reset(executor)
+                if not retry:
+                    raise PasswordCheckBusy()
+    finally:
+        slots.release()
@@ -1,8 +1,10 @@
 from django.contrib.auth import (get_user_model, authenticate, login)
 from django.utils.translation import gettext as _
-from rest_framework import serializers
+from rest_framework import exceptions, serializers
+from core.metrics import TimedSerializerMixin
+from user.passwords import PasswordCheckBusy
 
-class UserSerializers(serializers.ModelSerializer):
+class UserSerializers(TimedSerializerMixin, serializers.ModelSerializer):
     """serializer for the user object"""
 
     class Meta:
@@ -38,11 +40,17 @@ class AuthTokenSerializer(serializers.Serializer):
         email = attrs.get('email')
         password = attrs.get('password')
 
-        user = authenticate(
-            request=self.context.get('request'),
-            username=email,
-            password=password
-        )
+        try:
+            user = authenticate(
+                request=self.context.get('request'),
+                username=email,
+                password=password
+            )
+        except PasswordCheckBusy:
+            raise exceptions.Throttled(
+                wait=1,
+                detail=_('Too many logins in progress, try again shortly.'),
+            )
         if not user:
             msg = _('Unable to authenticate with provided credentials')
             raise serializers.ValidationError(msg, code='authorization')
@@ -0,0 +1,24 @@
+"""signal handlers keeping the token cache consistent"""
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from user.authentication import invalidate_token
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Stop accepting a deleted token"""
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    """Refresh cached state, e.g. is_active, when a user changes"""
+    if created:
+        return
+    for key in Token.objects.filter(user_id=instance.id).values_list(
+        'key', flat=True
+    ):
+        invalidate_token(key)
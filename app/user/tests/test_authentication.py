@@ -0,0 +1,110 @@
+"""Test the cached token authentication"""
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user import authentication
+
+ME_URL = reverse('user:me')
+
+
+def create_user(**params):
+    """create and return a new user"""
+    return get_user_model().objects.create_user(**params)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test authenticating requests with a cached token lookup"""
+
+    def setUp(self):
+        cache.clear()
+        authentication.local_cache.clear()
+        self.user = create_user(
+            email='test@example.com', password='testpass123', name='Test Name',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_token_lookup_cached(self):
+        """Test the token is only looked up in the database once"""
+        self.client.get(ME_URL)
+        before = authentication.get_stats()
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+        after = authentication.get_stats()
+        self.assertEqual(after['local_hits'], before['local_hits'] + 1)
+        self.assertEqual(after['misses'], before['misses'])
+
+    def test_shared_cache_used_when_local_cache_empty(self):
+        """Test a process without a local entry reads the shared cache"""
+        self.client.get(ME_URL)
+        authentication.local_cache.clear()
+
+        with self.assertNumQueries(0):
+            self.client.get(ME_URL)
+
+    def test_deleted_token_rejected(self):
+        """Test a deleted token stops authenticating immediately"""
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_token_deleted_during_lookup_not_cached(self):
+        """Test a lookup racing a delete cannot cache the revoked token"""
+        user_state = authentication._user_state
+
+        def delete_then_read(user):
+            self.token.delete()
+            return user_state(user)
+
+        with patch.object(authentication, '_user_state', delete_then_read):
+            self.client.get(ME_URL)
+        authentication.local_cache.clear()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        """Test deactivating a user invalidates the cached state"""
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_update_with_cached_user_keeps_password(self):
+        """Test updating through a cached user leaves unloaded fields alone"""
+        self.client.get(ME_URL)
+
+        res = self.client.patch(ME_URL, {'name': 'Updated Name'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.name, 'Updated Name')
+        self.assertTrue(self.user.check_password('testpass123'))
+
+    def test_invalid_token_rejected(self):
+        """Test an unknown token is rejected"""
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,166 @@
+"""
+Tests for password hashing and login throughput controls
+"""
+from concurrent.futures.process import BrokenProcessPool
+from unittest.mock import MagicMock, patch
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from user import passwords
+from user.hashers import ScryptPasswordHasher
+
+TOKEN_URL = reverse('user:token')
+
+
+@override_settings(PASSWORD_SCRYPT_WORK_FACTOR=2 ** 10)
+class ScryptPasswordHasherTests(SimpleTestCase):
+    """Test the scrypt hasher"""
+
+    def setUp(self):
+        self.hasher = ScryptPasswordHasher()
+
+    def test_encode_verify(self):
+        """Test a hash verifies its own password only"""
+        encoded = self.hasher.encode('s3cret', self.hasher.salt())
+
+        self.assertTrue(encoded.startswith('scrypt$1024$'))
+        self.assertTrue(self.hasher.verify('s3cret', encoded))
+        self.assertFalse(self.hasher.verify('wrong', encoded))
+
+    def test_must_update_on_new_work_factor(self):
+        """Test hashes are flagged once the work factor changes"""
+        encoded = self.hasher.encode('s3cret', self.hasher.salt())
+        self.assertFalse(self.hasher.must_update(encoded))
+
+        with override_settings(PASSWORD_SCRYPT_WORK_FACTOR=2 ** 11):
+            self.assertTrue(self.hasher.must_update(encoded))
+
+
+@override_settings(PASSWORD_HASH_WORKERS=0)
+class PasswordCheckTests(SimpleTestCase):
+    """Test checking passwords"""
+
+    def test_check_returns_upgrade(self):
+        """Test an outdated hash comes back rehashed with the preferred one"""
+        encoded = make_password('s3cret', hasher='pbkdf2_sha256')
+
+        correct, upgraded = passwords.run(passwords.check, 's3cret', encoded)
+
+        self.assertTrue(correct)
+        self.assertTrue(upgraded.startswith('scrypt$'))
+        self.assertTrue(check_password('s3cret', upgraded))
+
+    def test_check_wrong_password(self):
+        """Test a wrong password is neither accepted nor rehashed"""
+        encoded = make_password('s3cret', hasher='pbkdf2_sha256')
+
+        self.assertEqual(
+            passwords.run(passwords.check, 'wrong', encoded), (False, None),
+        )
+
+    @override_settings(PASSWORD_HASH_WORKERS=1)
+    def test_broken_pool_retried_once(self):
+        """Test a dead worker pool is replaced and the check retried"""
+        broken = MagicMock()
+        broken.submit.side_effect = BrokenProcessPool
+        working = MagicMock()
+        working.submit.return_value.result.return_value = (True, None)
+
+        with patch.object(passwords, '_executor', broken):
+            with patch.object(passwords, 'ProcessPoolExecutor',
+                              return_value=working):
+                result = passwords.run(passwords.check, 's3cret', 'hash')
+
+        self.assertEqual(result, (True, None))
+        broken.shutdown.assert_called_once_with(wait=False)
+
+    @override_settings(PASSWORD_HASH_WORKERS=1)
+    def test_broken_pool_twice_is_busy(self):
+        """Test a pool that keeps breaking turns the login away"""
+        broken = MagicMock()
+        broken.submit.side_effect = BrokenProcessPool
+
+        with patch.object(passwords, '_executor', broken):
+            with patch.object(passwords, 'ProcessPoolExecutor',
+                              return_value=broken):
+                with self.assertRaises(passwords.PasswordCheckBusy):
+                    passwords.run(passwords.check, 's3cret', 'hash')
+
+    @override_settings(PASSWORD_HASH_WORKERS=1)
+    def test_check_on_worker_process(self):
+        """Test checks run on the worker pool"""
+        encoded = make_password('s3cret')
+
+        self.assertEqual(
+            passwords.run(passwords.check, 's3cret', encoded), (True, None),
+        )
+
+
+@override_settings(
+    PASSWORD_HASH_WORKERS=0, LOGIN_RATE_PER_IP=None, LOGIN_RATE_PER_EMAIL=None,
+)
+class LoginTests(TestCase):
+    """Test the token endpoint's password handling and limits"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.payload = {
+            'email': 'login@example.com',
+            'password': 'testpass123',
+        }
+        self.user = get_user_model().objects.create_user(**self.payload)
+
+    def test_login_upgrades_hash(self):
+        """Test logging in rehashes a password stored with an old hasher"""
+        self.user.password = make_password(
+            self.payload['password'], hasher='pbkdf2_sha256',
+        )
+        self.user.save()
+
+        res = self.client.post(TOKEN_URL, self.payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('scrypt$'))
+        self.assertTrue(self.user.check_password(self.payload['password']))
+
+    def test_busy_password_pool_throttles(self):
+        """Test logins are turned away while too many checks are pending"""
+        with patch.object(
+            passwords, 'run', side_effect=passwords.PasswordCheckBusy,
+        ):
+            res = self.client.post(TOKEN_URL, self.payload)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertNotIn('token', res.data)
+
+    @override_settings(LOGIN_RATE_PER_EMAIL='2/min')
+    def test_email_rate_limit(self):
+        """Test attempts on one account are limited across addresses"""
+        for address in ('10.0.0.1', '10.0.0.2'):
+            res = self.client.post(
+                TOKEN_URL, {**self.payload, 'password': 'wrong'},
+                REMOTE_ADDR=address,
+            )
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.post(TOKEN_URL, self.payload, REMOTE_ADDR='10.0.0.3')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(LOGIN_RATE_PER_IP='2/min')
+    def test_ip_rate_limit(self):
+        """Test attempts from one address are limited across accounts"""
+        for email in ('a@example.com', 'b@example.com'):
+            self.client.post(TOKEN_URL, {'email': email, 'password': 'x'})
+
+        res = self.client.post(TOKEN_URL, self.payload)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
@@ -0,0 +1,37 @@
+"""login rate limits backed by the cache
+
+Limits are only shared between processes when CACHE_BACKEND is a shared
+cache; with the default local-memory cache each process counts alone.
+"""
+import hashlib
+
+from django.conf import settings
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class LoginIPRateThrottle(SimpleRateThrottle):
+    """Limit login attempts per client address"""
+    scope = 'login_ip'
+
+    def get_rate(self):
+        return settings.LOGIN_RATE_PER_IP
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            'scope': self.scope, 'ident': self.get_ident(request),
+        }
+
+
+class LoginEmailRateThrottle(SimpleRateThrottle):
+    """Limit login attempts per account, from any address"""
+    scope = 'login_email'
+
+    def get_rate(self):
+        return settings.LOGIN_RATE_PER_EMAIL
+
+    def get_cache_key(self, request, view):
+        email = request.data.get('email')
+        if not isinstance(email, str) or not email.strip():
+            return None
+        ident = hashlib.sha256(email.strip().lower().encode()).hexdigest()
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
@@ -1,5 +1,7 @@
 from django.urls import path
 
+from core.async_views import async_read_view
+
 from . import views
 
 app_name = 'user'
@@ -7,5 +9,5 @@ app_name = 'user'
 urlpatterns = [
     path('create/', views.CreateUserView.as_view(), name='create'),
     path('token/', views.CreateTokenView.as_view(), name='token'),
-    path('me/', views.ManageUserView.as_view(), name='me'),
+    path('me/', async_read_view(views.ManageUserView.as_view()), name='me'),
 ]
\ No newline at end of file
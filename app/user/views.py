@@ -1,7 +1,9 @@
-from rest_framework import generics, authentication, permissions
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
 
+from .authentication import CachedTokenAuthentication
+from .throttling import LoginEmailRateThrottle, LoginIPRateThrottle
 from .serializers import UserSerializers,AuthTokenSerializer
 
 class CreateUserView(generics.CreateAPIView):
@@ -12,11 +14,12 @@ class CreateTokenView(ObtainAuthToken):
     """"create a new auth token for user"""
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_classes = [LoginIPRateThrottle, LoginEmailRateThrottle]
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """manage the authenticated user"""
     serializer_class = UserSerializers
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
     
 